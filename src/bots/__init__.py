@@ -1,2 +1,3 @@
 from .hot_codewords import (get_first_line, get_codeword, CRYPTO_EXPLORE_TASKS)
-from .hot_bot_browser import HotBotBrowser
\ No newline at end of file
+from .hot_bot_browser import HotBotBrowser
+from .async_hot_bot_browser import AsyncHotBotBrowser
\ No newline at end of file
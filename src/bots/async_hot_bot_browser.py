@@ -0,0 +1,20 @@
+from src.services.cdp_browser import CdpBrowser, CdpError
+from src.bots.hot_bot_flows import HotBotFlows
+
+
+class AsyncHotBotBrowser(HotBotFlows):
+    """Bot steps (see HotBotFlows) driven by CdpBrowser, as coroutines."""
+
+    STALE_LIST_ERRORS = (CdpError, TimeoutError)
+
+    def __init__(self, browser: CdpBrowser):
+        super().__init__(browser)
+
+    async def open_tasks_page(self, already_opened: bool = False) -> bool:
+        return await self._open_mission(already_opened)
+
+    async def run_tasks(self, already_opened: bool = False):
+        return await self._run_tasks(already_opened)
+
+    async def login(self, seed_phrase: str) -> bool:
+        return await self._login(seed_phrase)
@@ -0,0 +1,368 @@
+from datetime import datetime
+from enum import Enum
+import functools
+import time
+from typing import Any, Optional, Union
+
+from src.exceptions import HotWalletException
+from src.bots.hot_codewords import get_codeword
+from src.config import settings
+from src.utils import metrics
+
+class _StepTimer:
+    def __init__(self, bot, name: str) -> None:
+        self.bot = bot
+        self.name = name
+        self.started = time.time()
+        self.ok = False
+        self.idle_before = bot.browser.idle_seconds
+        self.commands_before = bot.browser.commands_count
+
+    def finish(self) -> None:
+        elapsed = time.time() - self.started
+        idle = self.bot.browser.idle_seconds - self.idle_before
+        commands = self.bot.browser.commands_count - self.commands_before
+        self.bot.logger.info(f"Step '{self.name}' took {elapsed:.1f}s, idle {idle:.1f}s, {commands} browser commands")
+        metrics.spans.add(self.bot.browser.session, self.name, elapsed, self.ok)
+
+
+def _step(name: str):
+    """Log the duration of a bot step, how much of it was spent idle in the browser's waits
+    and how many commands were sent to the browser. The duration is also recorded as a span (see utils.metrics).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            timer = _StepTimer(self, name)
+            try:
+                result = await func(self, *args, **kwargs)
+                timer.ok = result is not False
+                return result
+            finally:
+                timer.finish()
+        return wrapper
+    return decorator
+
+
+class NavigationState(Enum):
+    UNKNOWN = "unknown" # anything else, e.g. after an error. Recovered by a full reload
+    TASKS_LIST = "tasks_list" # 'Explore crypto' mission with the list of video tasks
+    TASK_MODAL = "task_modal" # a video task is opened on top of the list
+
+
+class HotBotFlows:
+    """Selectors and steps of the bot, shared by HotBotBrowser (Selenium) and AsyncHotBotBrowser (CDP).
+
+    Steps are coroutines which await the methods of `self.browser`. AsyncHotBotBrowser runs them on the event loop,
+    HotBotBrowser wraps SeleniumBrowser so that its calls can be awaited and runs them to the end in its own thread.
+    """
+    IFRAME_XPATH = "//iframe[@src='/']"
+    HOT_BALANCE_XPATH = "//h4[contains(text(), 'HOT Balance')]"
+    MISSIONS_XPATH = "//p[contains(text(), 'Missions')]"
+    EXPLORE_CRYPTO_XPATH = "//h3[contains(text(), 'Explore crypto')]"
+    TASKS_CONTAINER_XPATH = "//p[contains(text(), 'Watch educational videos')]/following-sibling::div[2]"
+    SHOW_ALL_VIDEOS_XPATH = "//div[p[contains(text(), 'Show all videos')]]"
+    WATCH_VIDEO_XPATH = "//button[contains(text(), 'Watch the video')]"
+    SUBMIT_PASSWORD_XPATH = "//button[contains(text(), 'Submit password')]"
+    PASSWORD_INPUT_XPATH = "//h2[contains(text(), 'Enter the password')]/following-sibling::label"
+    REWARD_XPATH = "//h3[contains(text(), 'You got')]/following-sibling::div//div"
+    TASK_MODAL_XPATH = "//button[contains(text(), 'Watch the video') or contains(text(), 'Submit password')] | //h3[contains(text(), 'You got')]"
+    CLOSE_MODAL_XPATH = "//button[@aria-label='Close' or @aria-label='close' or normalize-space(.)='Close']"
+    IMPORT_ACCOUNT_XPATH = "//button[p[contains(., 'Import account')]]"
+    SEED_PHRASE_XPATH = "//p[contains(text(), 'Seed or private key')]/ancestor-or-self::*/textarea"
+    CONTINUE_XPATH = "//button[contains(text(), 'Continue')]"
+    STORAGE_XPATH = "//h4[text()='Storage']"
+
+    # Errors of the browser when the tasks list is read while it is re-rendered. Set by the bot of each backend
+    STALE_LIST_ERRORS: tuple[type[Exception], ...] = ()
+
+    def __init__(self, browser) -> None:
+        self.is_logged_in: Optional[bool] = None
+
+        self.browser = browser
+        self.logger = browser.logger
+
+        self.tasks: list[str] = [] # names of tasks
+        self.unfinished_tasks: list[str] = []
+        self.finished_tasks: list[str] = []
+
+        self.state = NavigationState.UNKNOWN
+        self._return_in_place = True # disabled after the first failure to close a task in place
+        self._list_expanded = False # 'Show all videos' was clicked on the current tasks page
+
+    @_step("open_app")
+    async def _open_app(self):
+        if not await self.browser.select_iframe(self.IFRAME_XPATH):
+            msg = "Could not open Hot Wallet app"
+            self.logger.critical(msg)
+            raise HotWalletException(msg)
+
+    @_step("open_tasks_page")
+    async def _open_tasks_page(self) -> bool:
+        self.logger.debug("open_tasks_page")
+
+        target_element = await self.browser.move_and_click(self.HOT_BALANCE_XPATH, 10, "Click fireplace 'HOT Balance'")
+        if not target_element:
+            return False
+
+        self.is_logged_in = True # If we opened HOT Balance, that means login is successful
+        target_element = await self.browser.move_and_click(self.MISSIONS_XPATH, 10, "Click missions")
+        if not target_element:
+            return False
+
+        target_element = await self.browser.move_and_click(self.EXPLORE_CRYPTO_XPATH, 10, "Open 'Explore crypto' mission")
+        if not target_element:
+            return False
+
+        self.state = NavigationState.TASKS_LIST
+        self._list_expanded = False
+        return True
+
+    @_step("get_tasks_list")
+    async def _get_tasks_list(self, only_not_completed: bool = False) -> list[dict[str, Any]]:
+        """Snapshot of the video tasks. See SeleniumBrowser.snapshot_list for the item format."""
+        # the list stays expanded when we come back to it in place, the button is only checked without waiting
+        if not self._list_expanded or await self.browser.find_visible(self.SHOW_ALL_VIDEOS_XPATH, 0):
+            await self.browser.move_and_click(self.SHOW_ALL_VIDEOS_XPATH, 10, "Click 'Show all videos'")
+            self._list_expanded = True
+
+        tasks = await self.browser.snapshot_list(self.TASKS_CONTAINER_XPATH)
+
+        tasks = tasks[1:] # first element is not a task
+        if tasks and "Show less videos" in tasks[-1]["text"]:
+            tasks = tasks[:-1]
+
+        if only_not_completed:
+            return [t for t in tasks if not t["completed"]]
+
+        return tasks
+
+    @_step("solve_task")
+    async def _solve_task(self, task: dict[str, Any]) -> bool:
+        if not task:
+            self.logger.error("solve_task() received None instead of task.")
+            return False
+
+        video_name = task["title"]
+
+        if task["completed"]:
+            self.logger.debug(f"Task '{video_name}' is already completed. Moving to the next one.")
+            return True
+
+        self.logger.info(f"Solving task '{video_name}'")
+
+        codeword = get_codeword(video_name)
+        self.logger.debug(f"Codeword is '{codeword}'")
+        if not codeword:
+            self.logger.critical(f"STATUS: Could not find a codeword for the video task '{video_name}'")
+            return False
+
+        await self.browser.move_and_click(task["handle"], 10, f"Open task '{video_name}'")
+        self.state = NavigationState.TASK_MODAL
+
+        tabs_before = await self.browser.tabs_count()
+        await self.browser.block_new_tabs() # the YouTube video is not needed, only the click on the button
+        await self.browser.move_and_click(self.WATCH_VIDEO_XPATH, 15, f"Click 'Watch the video'")
+
+        if await self.browser.tabs_count() > tabs_before: # opened anyway, e.g. by the Telegram client
+            await self.browser.close_tab()
+            await self.browser.select_iframe(self.IFRAME_XPATH)
+
+        await self.browser.move_and_click(self.SUBMIT_PASSWORD_XPATH, 15, f"Click 'Submit password'")
+        await self.browser.type_text(self.PASSWORD_INPUT_XPATH, codeword, 15, "Enter the codeword")
+        await self.browser.move_and_click(self.SUBMIT_PASSWORD_XPATH, 15, f"Click 'Submit password after entering a codeword'")
+
+        reward = await self.browser.get_text(self.REWARD_XPATH, settings.TIMEOUT, f"Waiting {settings.TIMEOUT} seconds for the mission to complete.")
+        if not reward:
+            self.logger.warning(f"Could not complete mission {video_name}")
+            return False
+
+        self.logger.success(f"Mission watch video '{video_name}' completed. Reward: {reward}")
+        return True
+
+    async def _solve_tasks(self):
+        tasks = await self._get_tasks_list()
+
+        for task in tasks:
+            task_name = task["title"]
+            self.tasks.append(task_name)
+
+            if task["completed"]:
+                self.finished_tasks.append(task_name)
+            else:
+                self.unfinished_tasks.append(task_name)
+
+        self.logger.info(f"STATUS: total tasks available: '{len(self.tasks)}'")
+        self.logger.info(f"STATUS: unfinished tasks: '{len(self.unfinished_tasks)}'")
+
+        if len(self.tasks) == len(self.finished_tasks):
+            self.logger.success(f"STATUS: all tasks finished.")
+            return
+
+        tasks = [t for t in tasks if not t["completed"]] # leave only not completed
+        unfinished_count = len(self.unfinished_tasks)
+        for i in range(unfinished_count):
+            started = time.time()
+            try:
+                self.logger.info(f"Processing task {i+1} out of {unfinished_count}.")
+                name = tasks[0]["title"]
+
+                result = await self._solve_task(tasks[0])
+                if result:
+                    self.finished_tasks.append(name)
+                    self.unfinished_tasks.remove(name)
+
+            except Exception as e:
+                self.state = NavigationState.UNKNOWN
+
+            if len(self.finished_tasks) == len(self.tasks):
+                self.logger.info(f"Task {i+1} took {time.time() - started:.1f}s")
+                return
+
+            tasks, how = await self._return_to_tasks_list()
+            self.logger.info(f"Task {i+1} took {time.time() - started:.1f}s, returned to the list {how}")
+
+    async def _return_to_tasks_list(self) -> tuple[list[dict[str, Any]], str]:
+        """Go back to the tasks list and read unfinished tasks again.
+
+        Closes the task modal and re-reads the list in place. Falls back to a full reload
+        (refresh, open app, open tasks page) when the list does not come back or its DOM is stale.
+
+        Returns unfinished tasks and how the list was reached ('in place' or 'with full reload').
+        """
+        if self.state == NavigationState.TASK_MODAL and self._return_in_place:
+            if await self._close_task_modal():
+                try:
+                    return await self._get_tasks_list(only_not_completed=True), "in place"
+                except self.STALE_LIST_ERRORS as e:
+                    self.logger.debug(f"Tasks list is stale after closing the task. {type(e).__name__}")
+
+            self.logger.warning("Could not return to the tasks list in place. Using full reload from now on.")
+            self._return_in_place = False
+            self.state = NavigationState.UNKNOWN
+
+        await self._reload_tasks_page()
+        return await self._get_tasks_list(only_not_completed=True), "with full reload"
+
+    async def _close_task_modal(self) -> bool:
+        """Close the opened task. Returns True when the tasks list is visible again."""
+        await self.browser.select_iframe(self.IFRAME_XPATH)
+
+        attempts = [
+            None, # the modal may close by itself after the reward
+            lambda: self.browser.press_escape(),
+            lambda: self.browser.move_and_click(self.CLOSE_MODAL_XPATH, 1, "Click 'Close'"),
+        ]
+        for close in attempts:
+            try:
+                if close:
+                    await close()
+            except Exception as e:
+                self.logger.debug(f"Closing the task failed. {type(e).__name__}")
+                continue
+
+            if (not await self.browser.find_visible(self.TASK_MODAL_XPATH, 0.5)
+                    and await self.browser.find_visible(self.TASKS_CONTAINER_XPATH)):
+                self.state = NavigationState.TASKS_LIST
+                return True
+
+        return False
+
+    async def _reload_tasks_page(self) -> None:
+        self.state = NavigationState.UNKNOWN
+        self._list_expanded = False
+        await self.browser.refresh()
+        await self.browser.wait_for_page(3)
+        await self._open_app()
+        await self._open_tasks_page()
+
+    async def _open_mission(self, already_opened: bool = False) -> bool:
+        if not already_opened:
+            self.logger.info(f"Opening HOT wallet")
+            await self._open_app()
+
+        await self.browser.wait_for_page(settings.TIMEOUT) # Openning HOT Wallet for the first time takes more time
+        self.logger.info(f"Opening tasks page")
+        opened = await self._open_tasks_page()
+        if not opened:
+            self.logger.error(f"Could not open tasks page")
+        return opened
+
+    async def _run_tasks(self, already_opened: bool = False):
+        await self._open_mission(already_opened)
+        await self._solve_tasks()
+        self.logger.info(f"Idle time in browser waits: {self.browser.idle_seconds:.1f}s")
+
+        if self.browser.from_storage_state:
+            await self._save_storage_state() # the profile is discarded, keep what the app has changed
+
+    @_step("open_login_page")
+    async def _open_login_page(self) -> bool:
+        return await self.browser.select_iframe_and_wait(self.IFRAME_XPATH, self.IMPORT_ACCOUNT_XPATH)
+
+    @_step("login")
+    async def _login(self, seed_phrase: str) -> bool:
+        self.logger.info("Started login process.")
+
+        try:
+            if not await self._open_login_page():
+                msg = "Could not open Hot Wallet app or it's already logged in."
+                self.logger.critical(msg)
+                raise HotWalletException(msg)
+
+            log_level="INFO"
+            await self.browser.move_and_click(self.IMPORT_ACCOUNT_XPATH, 20, "Click Import account", log_level=log_level)
+            await self.browser.type_text(self.SEED_PHRASE_XPATH, seed_phrase, 10, "Enter seedphrase")
+            await self.browser.move_and_click(self.CONTINUE_XPATH, 30, "Click continue after seedphrase entry", log_level=log_level)
+            await self.browser.move_and_click(self.CONTINUE_XPATH, 180, "Click continue at account selection screen and wait 180s to load.")
+            await self.browser.get_element(self.STORAGE_XPATH, 30, "Find 'storage' button. Make sure login was successful", log_level=log_level)
+
+            self.is_logged_in = True
+            self.logger.success(f"STATUS: login successful")
+            await self._save_storage_state()
+            return True
+        except Exception as e:
+            self.logger.critical(f"STATUS: login failed. {str(e)}")
+            self.is_logged_in = False
+            return False
+
+    async def _save_storage_state(self) -> None:
+        try:
+            await self.browser.save_storage_state()
+        except Exception as e:
+            self.logger.warning(f"Could not save storage state. {type(e).__name__} {str(e)}")
+
+    def status(self) -> dict[str, Union[str, int]]:
+        result = {}
+        _status = {
+            self.browser.session: result
+        }
+
+        if not self.is_logged_in:
+            result["login"] = "Error"
+            return _status
+        else:
+            result["login"] = "OK"
+
+
+        tasks_count = len(self.tasks)
+        finished_count = len(self.finished_tasks)
+
+        status = None
+        if tasks_count == 0:
+            status = "Error"
+            self.logger.error(f"STATUS: Tasks count is 0. Must be error during session execution.")
+        elif tasks_count == finished_count:
+            status = "OK"
+            self.logger.success(f"STATUS: All {finished_count} tasks have been completed.")
+        else:
+            status = "Error"
+            self.logger.error(f"STATUS: {finished_count} out of {tasks_count} tasks have been completed.")
+
+        result["Explore crypto"] = {
+                "status": status,
+                "total_tasks": tasks_count,
+                "finished_tasks": finished_count,
+                "date": datetime.now().strftime("%d-%b-%Y %H:%M")
+        }
+        return _status
@@ -1,15 +1,120 @@
-from typing import Optional
+from typing import Literal, Optional
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", env_ignore_empty=True)
 
+    HOT_URL: str = Field(
+        default="https://my.herewallet.app/hot",
+        description="Page with the HOT wallet app. Changed only to run against a local mock (see 'bench-mock')"
+    )
+
     ACTIVE_SESSIONS: int = Field(
         default=1,
         description="Number of parallel running processes (Chrome session instances). Each session requires ~500 MB RAM"
     )
 
+    ADAPTIVE_CONCURRENCY: bool = Field(
+        default=False,
+        description="Start new sessions based on measured free memory and memory used by running sessions. \
+            ACTIVE_SESSIONS becomes the upper bound"
+    )
+    MIN_ACTIVE_SESSIONS: int = Field(
+        default=1,
+        description="Lower bound of running sessions with ADAPTIVE_CONCURRENCY"
+    )
+    MEMORY_CEILING_MB: int = Field(
+        default=0,
+        description="Memory (MB) all sessions together may use with ADAPTIVE_CONCURRENCY. 0 - limited only by free memory"
+    )
+    MIN_FREE_MEMORY_MB: int = Field(
+        default=1024,
+        description="Free memory (MB) left for the system with ADAPTIVE_CONCURRENCY"
+    )
+    SESSION_MAX_RSS_MB: int = Field(
+        default=0,
+        description="Kill the browser of a session which uses more memory (MB), the session fails. 0 - disabled"
+    )
+    LOGIN_ACTIVE_SESSIONS: int = Field(
+        default=0,
+        description="Sessions logging in at the same time in 'tasks --with-login'. Logged in sessions then solve tasks \
+            in a new browser, ACTIVE_SESSIONS at the same time. 0 - every session logs in and solves tasks in one browser"
+    )
+    SESSION_TIMEOUT: int = Field(
+        default=1800,
+        description="Kill the browser of a session which runs longer (seconds), the timeout is saved in the report. 0 - disabled"
+    )
+    CIRCUIT_BREAKER_THRESHOLD: float = Field(
+        default=0.8,
+        description="Share of failed sessions among the last CIRCUIT_BREAKER_WINDOW which stops new sessions \
+            until a probe session succeeds. 0 - disabled"
+    )
+    CIRCUIT_BREAKER_WINDOW: int = Field(
+        default=10,
+        description="Number of recent sessions the circuit breaker looks at"
+    )
+    RETRY_LIMITS: dict[str, int] = Field(
+        default={"driver": 2, "proxy": 2, "app_load": 1},
+        description="How many times a failed session is retried during a run, by the step it failed in: \
+            driver, proxy, app_load, login, task, timeout. Example: '{\"driver\": 2, \"proxy\": 2, \"app_load\": 1}'"
+    )
+    RETRY_BACKOFF: float = Field(
+        default=30,
+        description="Seconds before the first retry of a session, doubled for every next retry"
+    )
+
+    BROWSER_BACKEND: Literal["selenium", "cdp"] = Field(
+        default="selenium",
+        description="'selenium' - one process per session with Selenium Chrome Driver. \
+            'cdp' - all sessions run in one process, Chrome is driven over DevTools Protocol with asyncio, \
+            proxies always go through the local forwarder (PROXY_MODE is ignored)"
+    )
+
+    ACCOUNTS_PER_BROWSER: int = Field(
+        default=1,
+        description="'cdp' backend, 'tasks' module: run up to this many sessions in one Chrome, each in its own browser context \
+            restored from storage_state.json (see 'export-state'). Contexts share Chrome's memory. 1 - own Chrome per session"
+    )
+
+    PRELAUNCH_BROWSER: bool = Field(
+        default=True,
+        description="Start the browser for the next session while the current one is still running. \
+            Removes Chrome startup from the critical path, but each worker may hold one extra warm Chrome instance"
+    )
+
+    PROFILE_LAYOUT: Literal["full", "overlay"] = Field(
+        default="full",
+        description="Layout of new sessions. 'full' - every session has its own Chrome profile. \
+            'overlay' - sessions share ./profiles/base and store only wallet storage, cookies and proxy.txt, \
+            the profile is assembled in ./profiles/runtime at launch. Existing sessions: 'migrate-profiles'"
+    )
+
+    USE_STORAGE_STATE: bool = Field(
+        default=False,
+        description="Start sessions which have storage_state.json (saved after login or with 'export-state') from a fresh \
+            profile and restore the wallet's localStorage, IndexedDB and cookies into it. The snapshot is updated after tasks"
+    )
+
+    PROXY_MODE: Literal["seleniumwire", "native"] = Field(
+        default="seleniumwire",
+        description="'seleniumwire' - traffic goes through Selenium Wire, which intercepts and re-encrypts HTTPS. \
+            'native' - Chrome connects to the proxy itself via a local forwarder, no interception (less CPU)"
+    )
+
+    CAPTURE_REQUESTS: bool = Field(
+        default=False,
+        description="Store requests and responses in Selenium Wire (driver.requests), for debugging. Only in 'seleniumwire' proxy mode"
+    )
+    CAPTURE_MAX_ENTRIES: int = Field(
+        default=100,
+        description="Keep at most this many captured requests in memory. 0 - unbounded Selenium Wire disk storage"
+    )
+    CAPTURE_SCOPES: list[str] = Field(
+        default=[],
+        description="Capture only requests whose url matches one of these regular expressions. Example: '[\".*herewallet.*\"]'"
+    )
+
     VERIFY_PROXY: bool = Field(
         default=False,
         description="Visit a website to check the IP address. The IP address from the website and provided proxy IP address must be the same."
@@ -21,7 +126,19 @@ class Settings(BaseSettings):
             (First run takes more time to load)"
     )
     
-    CHROME_DRIVER_PATH: Optional[str] = None # None(=downloads and patches new binary)
+    WAIT_POLICY: Literal["condition", "fixed"] = Field(
+        default="condition",
+        description="How the browser waits between actions. 'condition' - wait only for page/element conditions. \
+            'fixed' - add random and fixed delays before each lookup and click (old behaviour)"
+    )
+
+    TRACE_COMMANDS: bool = Field(
+        default=False,
+        description="Record every command sent to the browser with its latency and the bot method which sent it. \
+            A histogram and a collapsed-stack (flamegraph) file are saved per session to ./output/traces"
+    )
+
+    CHROME_DRIVER_PATH: Optional[str] = None # None - resolved once per run with Selenium Manager, cached in ./output/browser_paths.json
     CHROME_PATH: Optional[str] = None # If not specified, make sure the executable's folder is in $PATH
     
     DISABLE_WEBRTC: bool = Field(
@@ -33,6 +150,12 @@ class Settings(BaseSettings):
         description="Mandatory if DISABLE_WEBRTC is True. Full path to the extension (unpacked) that disables webrtc. In Chrome WebRTC cannot be turned off using default options."
     )
     
+    LEAN_MODE: bool = Field(
+        default=False,
+        description="Do not load images, fonts, video and analytics, disable Chrome background networking and components \
+            and use fewer renderer processes. The bot needs only the DOM text and buttons. Compare with 'bench-mock --compare-lean'"
+    )
+
     HEADLESS: bool = True # True - start Chrome headless (without UI). False - start with UI.
     
     DEBUG_MODE: bool = False # For development purposes
@@ -4,15 +4,31 @@ from src import utils
 from src.modules import tasks_module
 from src.modules import ui_module
 from src.modules import tasks_with_login_module
+from src.modules import benchmark_module
+from src.modules import report_module
+from src.modules import mock_benchmark_module
+from src.modules import profiles_module
 
 
 action_help = \
 """Action to perform \n
-    tasks - Begin solving tasks (e.g., watching videos) for existing sessions. Sessions must already be logged in.\n
+    tasks - Begin solving tasks (e.g., watching videos) for existing sessions. Sessions must already be logged in. Sessions which have finished all tasks today are skipped, unless --all is given.\n
+
+    tasks --resume - Continue the last 'tasks' run which was interrupted (Ctrl+C or crash) with the sessions that have no result yet.\n
 
     tasks --with-login - Perform login first, then solve tasks for accounts listed in accounts.txt.\n
 
     ui - Launch a browser with a user interface. If no session exists, a new one will be created. Can be used with the --session <SESSION_NAME> argument.\n
+
+    bench <SCENARIO> - Compare CPU and memory usage of browser settings on existing sessions.\n
+
+    bench-mock - Measure sessions/hour, CPU, memory and traffic for different ACTIVE_SESSIONS against a local mock of the HOT wallet app. With --compare-lean also with LEAN_MODE.\n
+
+    report - Regenerate ./output/report.json from the report database. With --history shows all results of the sessions given with --session.\n
+
+    migrate-profiles - Convert sessions to the overlay layout: a shared base profile plus a small per-session delta. With --measure compares browser startup time.\n
+
+    export-state - Save localStorage, IndexedDB and cookies of the HOT app of every session to storage_state.json. With --prune only the snapshot and proxy.txt are kept.\n
 """
 
 logger = utils.get_logger()
@@ -24,11 +40,32 @@ def launch() -> None:
 
     tasks_parser = sub.add_parser("tasks", help="Solve tasks for existing sessions")
     tasks_parser.add_argument("--with-login", action='store_true', help="Start tasks with login module. Accounts must be placed in accounts.txt file. Ignores --session argument")
+    tasks_parser.add_argument("--resume", action='store_true', help="Continue the last interrupted run. Ignores --session argument")
+    tasks_parser.add_argument("--all", action='store_true', help="Also run sessions which have finished all tasks today")
 
     ui_parser = sub.add_parser("ui", help="Launch a browser with UI")
     ui_parser.add_argument("-p", "--proxy", help="Proxy url to be used for a new session")
     
-    for p in [tasks_parser, ui_parser]:
+    bench_parser = sub.add_parser("bench", help="Compare resource usage of browser settings")
+    bench_parser.add_argument("scenario", choices=list(benchmark_module.SCENARIOS), help="Settings to compare")
+
+    mock_parser = sub.add_parser("bench-mock", help="Benchmark throughput against a local mock of the HOT wallet app")
+    mock_parser.add_argument("-c", "--concurrency", type=int, nargs="+", default=[1, 2, 4], help="ACTIVE_SESSIONS values to compare")
+    mock_parser.add_argument("-n", "--accounts", type=int, default=4, help="Number of generated accounts")
+    mock_parser.add_argument("--latency", type=float, default=0.0, help="Delay of every http response of the mock app, seconds")
+    mock_parser.add_argument("--ui-delay", type=float, default=0.0, help="Delay of every screen change inside the mock app, seconds")
+    mock_parser.add_argument("--compare-lean", action='store_true', help="Run every ACTIVE_SESSIONS value with LEAN_MODE off and on")
+
+    report_parser = sub.add_parser("report", help="Regenerate report.json or show session history")
+    report_parser.add_argument("--history", action='store_true', help="Show all results of the sessions given with --session")
+
+    migrate_parser = sub.add_parser("migrate-profiles", help="Convert sessions to a shared base profile with per-session delta")
+    migrate_parser.add_argument("--measure", action='store_true', help="Time browser startup of the first session before and after migration")
+
+    export_parser = sub.add_parser("export-state", help="Save a compact storage state snapshot of sessions")
+    export_parser.add_argument("--prune", action='store_true', help="Delete the Chrome profile, keep only the snapshot and proxy.txt (requires USE_STORAGE_STATE)")
+
+    for p in [tasks_parser, ui_parser, bench_parser, report_parser, migrate_parser, export_parser]:
         p.add_argument("-s","--session", nargs="+", help="Session names to run, put whitespace between names")
     
 
@@ -41,13 +78,23 @@ def launch() -> None:
         if args.with_login:
             tasks_with_login_module.run()
         else:
-            tasks_module.run(sessions)
+            tasks_module.run(sessions, args.resume, args.all)
     elif action == "ui":
         proxy: str = args.proxy
         session_name = None
         if sessions:
             session_name = sessions[0]
         ui_module.run(session_name, proxy)
+    elif action == "bench":
+        benchmark_module.run(args.scenario, sessions)
+    elif action == "bench-mock":
+        mock_benchmark_module.run(args.concurrency, args.accounts, args.latency, args.ui_delay, args.compare_lean)
+    elif action == "report":
+        report_module.run(sessions, args.history)
+    elif action == "migrate-profiles":
+        profiles_module.run(sessions, args.measure)
+    elif action == "export-state":
+        profiles_module.export_states(sessions, args.prune)
     else:
         logger.error(f"Action is unknown or not provided: {action}.")
         return
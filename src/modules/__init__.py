@@ -1,3 +1,8 @@
 from .tasks_module import run
 from .ui_module import run
-from .tasks_with_login_module import run
\ No newline at end of file
+from .tasks_with_login_module import run
+from .benchmark_module import run
+from .report_module import run
+from .mock_benchmark_module import run
+from .profiles_module import run
+from .profiles_module import export_states
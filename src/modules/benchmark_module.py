@@ -0,0 +1,136 @@
+import json
+import os
+import statistics
+import time
+from datetime import datetime
+from typing import Any, Optional
+
+from src.services import SeleniumBrowser
+from src.utils import get_logger
+from src.bots import HotBotBrowser
+from src.config import settings
+from src.utils import proxy_utils
+from src.utils.process_utils import ProcessTreeSampler
+from src.utils.browser_paths import use_resolved_browser_paths
+
+logger = get_logger()
+
+"""Compare resource usage of browser settings on existing sessions.
+
+Every variant of a scenario opens each session, goes to the tasks page (nothing is solved)
+and measures CPU time and peak memory of this process with all its child processes
+(chromedriver, Chrome, Selenium Wire threads).
+Results are logged and saved to ./output/benchmarks
+"""
+
+PATH = "./output/benchmarks"
+
+SCENARIOS: dict[str, list[dict[str, Any]]] = {
+    "proxy": [
+        {"PROXY_MODE": "seleniumwire"},
+        {"PROXY_MODE": "native"},
+    ],
+    "capture": [
+        {"PROXY_MODE": "seleniumwire", "CAPTURE_REQUESTS": True, "CAPTURE_MAX_ENTRIES": 0},
+        {"PROXY_MODE": "seleniumwire", "CAPTURE_REQUESTS": True, "CAPTURE_MAX_ENTRIES": 100},
+        {"PROXY_MODE": "seleniumwire", "CAPTURE_REQUESTS": False},
+    ],
+}
+
+
+def _get_sessions(sessions_to_run: Optional[list[str]]) -> list[str]:
+    sessions = sorted(os.listdir("./sessions"))
+    if sessions_to_run:
+        sessions = [s for s in sessions if s in sessions_to_run]
+    return sessions
+
+
+_DEFAULTS = settings.model_copy()
+
+
+def _apply_settings(variant: dict[str, Any]) -> None:
+    """Reset settings changed by previous variants, then apply the variant."""
+    for key in {k for v in SCENARIOS.values() for variant_ in v for k in variant_}:
+        setattr(settings, key, getattr(_DEFAULTS, key))
+
+    for key, value in variant.items():
+        setattr(settings, key, value)
+
+
+def _measure_session(session_name: str) -> dict[str, Any]:
+    full_session_path = os.path.join(os.getcwd(), "sessions", session_name)
+    try:
+        proxy = proxy_utils.get_proxy_from_file(os.path.join(full_session_path, "proxy.txt"))
+    except FileNotFoundError:
+        proxy = None
+
+    sampler = ProcessTreeSampler(os.getpid()).start()
+    started = time.time()
+    ok = False
+    browser = None
+    try:
+        browser = SeleniumBrowser(full_session_path, settings.HOT_URL, proxy)
+        bot = HotBotBrowser(browser)
+        ok = bot.open_tasks_page()
+    except Exception as e:
+        logger.bind(session_name=session_name).error(f"Benchmark session failed. {e}")
+    finally:
+        if browser:
+            browser.quit()
+        sampler.stop()
+
+    return {
+        "session": session_name,
+        "ok": ok,
+        "wall_seconds": round(time.time() - started, 2),
+        "cpu_seconds": round(sampler.cpu_seconds, 2),
+        "peak_rss_mb": round(sampler.peak_rss_mb, 1),
+    }
+
+
+def _summarize(measurements: list[dict[str, Any]]) -> dict[str, Any]:
+    summary = {"sessions": len(measurements), "ok": sum(1 for m in measurements if m["ok"])}
+    for key in ("wall_seconds", "cpu_seconds", "peak_rss_mb"):
+        values = [m[key] for m in measurements]
+        summary[f"mean_{key}"] = round(statistics.mean(values), 2) if values else 0
+        summary[f"max_{key}"] = round(max(values), 2) if values else 0
+    return summary
+
+
+def _save(scenario: str, results: dict[str, Any]) -> str:
+    os.makedirs(PATH, exist_ok=True)
+    file_path = os.path.join(PATH, f"{scenario}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(file_path, "w") as file:
+        json.dump(results, file, indent=4)
+    return file_path
+
+
+def run(scenario: str, sessions_to_run: Optional[list[str]] = None) -> None:
+    if scenario not in SCENARIOS:
+        logger.error(f"Unknown benchmark scenario '{scenario}'. Available: {', '.join(SCENARIOS)}")
+        return
+
+    use_resolved_browser_paths()
+
+    sessions = _get_sessions(sessions_to_run)
+    if not sessions:
+        logger.error("No sessions found for the benchmark.")
+        return
+
+    logger.info(f"Benchmark '{scenario}' on {len(sessions)} sessions.")
+
+    results = {}
+    for variant in SCENARIOS[scenario]:
+        name = ", ".join(f"{k}={v}" for k, v in variant.items())
+        _apply_settings(variant)
+
+        measurements = [_measure_session(s) for s in sessions]
+        summary = _summarize(measurements)
+        results[name] = {"summary": summary, "sessions": measurements}
+
+        logger.info(f"[{name}] CPU per session: {summary['mean_cpu_seconds']}s, "
+                    f"peak RSS: {summary['mean_peak_rss_mb']} MB, wall time: {summary['mean_wall_seconds']}s, "
+                    f"ok: {summary['ok']}/{summary['sessions']}")
+
+    file_path = _save(scenario, results)
+    logger.success(f"Benchmark results saved to {file_path}")
@@ -0,0 +1,136 @@
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable
+
+from src.services import ReportStore
+from src.services.progress import is_failed
+from src.utils import get_logger
+from src.bots import CRYPTO_EXPLORE_TASKS
+from src.config import settings
+from src.modules import tasks_module
+from src.modules import tasks_with_login_module
+from src.utils.mock_wallet_server import MockWalletServer
+from src.utils.process_utils import ProcessTreeSampler
+
+logger = get_logger()
+
+"""Measure throughput against a local mock of the HOT wallet app, without network access.
+
+For every ACTIVE_SESSIONS value a fresh workspace is created in ./output/benchmarks/mock-<time>/<value>
+with generated accounts. `tasks --with-login` runs first (login and all tasks), then `tasks` runs on the sessions
+it created. Sessions/hour, CPU time, peak memory of this process with all its children and bytes served by the mock app
+are measured for both. With `compare_lean` every value runs twice, with LEAN_MODE off and on.
+"""
+
+PATH = "./output/benchmarks"
+
+ACCOUNT_SEED = "mock " * 11 + "seed"
+
+
+def _override_settings(values: dict[str, Any]) -> None:
+    """Change settings in this process and in worker processes (which may read them again from the environment)."""
+    for key, value in values.items():
+        setattr(settings, key, value)
+        os.environ[key] = value if isinstance(value, str) else json.dumps(value)
+
+
+def _write_accounts(count: int) -> None:
+    with open(tasks_with_login_module.ACCOUNTS_FILE, "w") as file:
+        for i in range(count):
+            file.write(f"mock{i + 1:03d}||{ACCOUNT_SEED}\n")
+
+
+def _measure(phase: str, run_module: Callable[[], None], server: MockWalletServer, active_sessions: int) -> dict[str, Any]:
+    bytes_before = server.bytes_sent
+    sampler = ProcessTreeSampler(os.getpid()).start()
+    started = time.time()
+    try:
+        run_module()
+    finally:
+        sampler.stop()
+    wall_seconds = time.time() - started
+    bytes_sent = server.bytes_sent - bytes_before
+
+    store = ReportStore()
+    try:
+        statuses = [{session: data} for session, data in store.latest().items()]
+    finally:
+        store.close()
+
+    ok = sum(1 for status in statuses if not is_failed(status))
+    parallel = min(active_sessions, len(statuses)) or 1
+    return {
+        "phase": phase,
+        "lean_mode": settings.LEAN_MODE,
+        "sessions": len(statuses),
+        "ok": ok,
+        "wall_seconds": round(wall_seconds, 2),
+        "sessions_per_hour": round(len(statuses) / wall_seconds * 3600, 1) if wall_seconds else 0,
+        "cpu_seconds": round(sampler.cpu_seconds, 2),
+        "cpu_seconds_per_session": round(sampler.cpu_seconds / len(statuses), 2) if statuses else 0,
+        "peak_rss_mb": round(sampler.peak_rss_mb, 1),
+        "peak_rss_mb_per_session": round(sampler.peak_rss_mb / parallel, 1),
+        "bytes": bytes_sent,
+        "kb_per_session": round(bytes_sent / 1024 / len(statuses), 1) if statuses else 0,
+    }
+
+
+def _run_level(workspace: str, active_sessions: int, accounts: int, lean_mode: bool, server: MockWalletServer) -> list[dict[str, Any]]:
+    os.makedirs(workspace, exist_ok=True)
+    _override_settings({"ACTIVE_SESSIONS": active_sessions, "LEAN_MODE": lean_mode})
+
+    cwd = os.getcwd()
+    os.chdir(workspace) # modules use ./sessions, ./output and accounts.txt
+    try:
+        _write_accounts(accounts)
+        return [
+            _measure("tasks --with-login", tasks_with_login_module.run, server, active_sessions),
+            _measure("tasks", lambda: tasks_module.run(None, run_all=True), server, active_sessions),
+        ]
+    finally:
+        os.chdir(cwd)
+
+
+def run(concurrency: list[int], accounts: int, latency: float = 0.0, ui_delay: float = 0.0, compare_lean: bool = False) -> None:
+    base_path = os.path.abspath(os.path.join(PATH, f"mock-{datetime.now().strftime('%Y%m%d-%H%M%S')}"))
+    server = MockWalletServer(CRYPTO_EXPLORE_TASKS, latency=latency, ui_delay=ui_delay).start()
+
+    logger.info(f"Mock benchmark: {accounts} accounts, ACTIVE_SESSIONS {concurrency}, "
+                f"latency {latency}s, UI delay {ui_delay}s. Mock app: {server.url}")
+
+    defaults = {key: getattr(settings, key) for key in ("HOT_URL", "ACTIVE_SESSIONS", "VERIFY_PROXY", "DISABLE_WEBRTC", "LEAN_MODE")}
+    lean_modes = [False, True] if compare_lean else [settings.LEAN_MODE]
+    environment = {key: os.environ.get(key) for key in defaults}
+    _override_settings({"HOT_URL": server.url, "VERIFY_PROXY": False, "DISABLE_WEBRTC": False})
+
+    results = {"accounts": accounts, "latency": latency, "ui_delay": ui_delay, "levels": {}}
+    try:
+        for active_sessions in concurrency:
+            results["levels"][active_sessions] = []
+            for lean_mode in lean_modes:
+                name = f"{active_sessions}-lean" if compare_lean and lean_mode else str(active_sessions)
+                measurements = _run_level(os.path.join(base_path, name), active_sessions, accounts, lean_mode, server)
+                results["levels"][active_sessions] += measurements
+
+                for m in measurements:
+                    logger.info(f"[ACTIVE_SESSIONS={active_sessions}{', LEAN_MODE' if lean_mode else ''}] {m['phase']}: "
+                                f"{m['sessions_per_hour']} sessions/hour, CPU per session {m['cpu_seconds_per_session']}s, "
+                                f"peak RSS {m['peak_rss_mb']} MB ({m['peak_rss_mb_per_session']} MB per session), "
+                                f"{m['kb_per_session']} KB per session, ok {m['ok']}/{m['sessions']}")
+    finally:
+        server.stop()
+        for key, value in defaults.items():
+            setattr(settings, key, value)
+        for key, value in environment.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    os.makedirs(base_path, exist_ok=True)
+    file_path = os.path.join(base_path, "results.json")
+    with open(file_path, "w") as file:
+        json.dump(results, file, indent=4)
+    logger.success(f"Mock benchmark results saved to {file_path}")
@@ -0,0 +1,131 @@
+import os
+import shutil
+import time
+from typing import Optional
+
+from src.config import settings
+from src.services import SeleniumBrowser, storage_state
+from src.utils import get_logger
+from src.utils import profile_utils, proxy_utils
+
+logger = get_logger()
+
+"""Convert sessions to smaller layouts.
+
+`run` moves full Chrome profiles to the overlay layout (shared base profile + per-session delta). The base profile
+is built from the first migrated session. With `measure` the browser startup of the first session is timed
+before and after the migration.
+
+`export_states` saves a storage state snapshot of every session. With `prune` the profile is deleted and only
+the snapshot and proxy.txt are kept, such sessions are started with USE_STORAGE_STATE.
+"""
+
+SESSIONS_PATH = "./sessions"
+
+_MB = 1024 * 1024
+
+
+def _measure_startup(session_path: str) -> float:
+    started = time.perf_counter()
+    browser = SeleniumBrowser(session_path, "about:blank")
+    elapsed = time.perf_counter() - started
+    browser.quit()
+    return elapsed
+
+
+def run(sessions: Optional[list[str]] = None, measure: bool = False) -> None:
+    names = sessions or sorted(os.listdir(SESSIONS_PATH))
+    paths = [os.path.join(os.getcwd(), "sessions", name) for name in names]
+    paths = [p for p in paths if os.path.isdir(p) and not profile_utils.is_overlay(p)]
+    if not paths:
+        logger.info("No sessions with a full profile to migrate.")
+        return
+
+    startup_before = _measure_startup(paths[0]) if measure else None
+
+    migrated = total_before = total_after = 0
+    for path in paths:
+        name = os.path.basename(path)
+        try:
+            size_before, size_after = profile_utils.migrate_session(path)
+        except Exception as e:
+            logger.error(f"Session {name} was not migrated: {type(e).__name__} {str(e)}")
+            continue
+
+        migrated += 1
+        total_before += size_before
+        total_after += size_after
+        logger.info(f"Session {name} migrated: {size_before / _MB:.1f} MB -> {size_after / _MB:.1f} MB")
+
+    base_size = profile_utils.dir_size(profile_utils.BASE_PROFILE_PATH)
+    total_after_with_base = total_after + base_size
+    saved = 1 - total_after_with_base / total_before if total_before else 0
+    logger.success(f"Migrated {migrated} sessions: {total_before / _MB:.1f} MB -> {total_after / _MB:.1f} MB "
+                   f"+ {base_size / _MB:.1f} MB base profile. Disk saved: {saved:.0%}")
+
+    if measure:
+        startup_after = _measure_startup(paths[0])
+        logger.info(f"Browser startup of {os.path.basename(paths[0])}: full profile {startup_before:.2f}s, "
+                    f"overlay {startup_after:.2f}s (including materializing the profile)")
+
+
+def _export_state(session_path: str) -> None:
+    proxy = None
+    proxy_file = os.path.join(session_path, "proxy.txt")
+    if os.path.exists(proxy_file):
+        proxy = proxy_utils.get_proxy_from_file(proxy_file)
+
+    browser = SeleniumBrowser(session_path, settings.HOT_URL, proxy)
+    try:
+        browser.save_storage_state()
+    finally:
+        browser.quit()
+
+
+def _prune_profile(session_path: str) -> None:
+    keep = {storage_state.STORAGE_STATE_FILE, "proxy.txt"}
+    for name in os.listdir(session_path):
+        if name in keep:
+            continue
+        path = os.path.join(session_path, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+
+
+def export_states(sessions: Optional[list[str]] = None, prune: bool = False) -> None:
+    if prune and not settings.USE_STORAGE_STATE:
+        logger.error("Set USE_STORAGE_STATE = True before pruning profiles, otherwise pruned sessions start logged out.")
+        return
+
+    names = sessions or sorted(os.listdir(SESSIONS_PATH))
+    total_before = total_after = 0
+    for name in names:
+        path = os.path.join(os.getcwd(), "sessions", name)
+        if not os.path.isdir(path):
+            logger.warning(f"Session {name} not found")
+            continue
+
+        size_before = profile_utils.dir_size(path)
+        try:
+            _export_state(path)
+        except Exception as e:
+            logger.error(f"Storage state of session {name} was not exported: {type(e).__name__} {str(e)}")
+            continue
+
+        if not storage_state.has_state(path):
+            logger.error(f"Storage state of session {name} was not exported, see the session log")
+            continue
+
+        if prune:
+            _prune_profile(path)
+
+        size_after = profile_utils.dir_size(path)
+        total_before += size_before
+        total_after += size_after
+        logger.info(f"Session {name}: storage state {os.path.getsize(storage_state.state_path(path)) / 1024:.1f} KB, "
+                    f"session {size_before / _MB:.1f} MB -> {size_after / _MB:.1f} MB")
+
+    if prune:
+        logger.success(f"Sessions pruned: {total_before / _MB:.1f} MB -> {total_after / _MB:.1f} MB")
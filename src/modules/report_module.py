@@ -0,0 +1,33 @@
+import json
+from typing import Optional
+
+from src.services import ReportStore
+from src.utils import get_logger
+
+logger = get_logger()
+
+"""Regenerate ./output/report.json from the report database or show the history of sessions."""
+
+
+def run(sessions: Optional[list[str]] = None, history: bool = False) -> None:
+    store = ReportStore()
+    try:
+        if not history:
+            file_path = store.export()
+            logger.info(f"Report contains {len(store.latest())} sessions: {file_path}")
+            return
+
+        if not sessions:
+            logger.error("Provide session names with --session to show their history.")
+            return
+
+        for session in sessions:
+            results = store.history(session)
+            if not results:
+                logger.warning(f"No results for session {session}")
+                continue
+
+            logger.info(f"History of session {session}:\n" + "\n".join(
+                f"run {r['run']} ({r['module']}) {r['date']}: {json.dumps(r['result'])}" for r in results))
+    finally:
+        store.close()
@@ -1,15 +1,22 @@
-import json
-import multiprocessing
+import functools
 import os
 import time
+from typing import Optional
 
 from src.exceptions import HotWalletException
-from src.services.report import produce_report
-from src.services import SeleniumBrowser
+from src.services.report import ReportStore, produce_metrics
+from src.services.concurrency import create_concurrency
+from src.services.circuit_breaker import create_circuit_breaker
+from src.services.retry import create_retry_policy
+from src.services import SeleniumBrowser, SessionRunner, CdpBrowser, AsyncSessionRunner, Progress
+from src.services.cdp_browser import ChromePool
 from src.utils import get_logger
-from src.bots import HotBotBrowser
+from src.bots import HotBotBrowser, AsyncHotBotBrowser
 from src.config import settings
 from src.utils import proxy_utils
+from src.utils import metrics
+from src.utils import profile_utils
+from src.utils.browser_paths import use_resolved_browser_paths
 
 logger = get_logger()
 
@@ -23,23 +30,57 @@ def _get_sessions() -> list[str]:
     logger.info(f"Found {len(dirs)} sessions.")
     return sorted(dirs)
 
-def _process_session(session_name: str):
+def _skip_not_logged_in(store: ReportStore, sessions: list[str]) -> list[str]:
+    """Sessions left by a failed 'tasks --with-login' are not logged in. They are logged in again by that module."""
+    not_logged_in = store.failed_logins("tasks --with-login")
+    skipped = {s for s in sessions
+               if s in not_logged_in or profile_utils.is_login_pending(os.path.join("./sessions", s))}
+    if skipped:
+        logger.warning(f"{len(skipped)} sessions have not logged in yet and are skipped. Run 'tasks --with-login' for them.")
+    return [s for s in sessions if s not in skipped]
+
+def _get_session_proxy(session_name: str, full_session_path: str) -> Optional[str]:
+    try:
+        return proxy_utils.get_proxy_from_file(os.path.join(full_session_path, "proxy.txt"))
+    except FileNotFoundError:
+        logger.bind(session_name=session_name).warning(f"Proxy file not found. Starting session without proxy")
+        return None
+
+def _launch_browser(session_name: str) -> Optional[SeleniumBrowser]:
     session_logger = logger.bind(session_name=session_name)
-    session_logger.info(f"Start processing session")
-    
-    bot = None
+    session_logger.info(f"Launching browser")
+
+    try:
+        full_session_path = os.path.join(os.getcwd(), "sessions", session_name)
+        proxy = _get_session_proxy(session_name, full_session_path)
+
+        return SeleniumBrowser(full_session_path, settings.HOT_URL, proxy)
+    except Exception as e:
+        session_logger.error(f"Session {session_name} has failed. Could not launch browser. {e}")
+        return None
+
+async def _launch_browser_async(session_name: str, pool: Optional[ChromePool] = None) -> Optional[CdpBrowser]:
+    session_logger = logger.bind(session_name=session_name)
+    session_logger.info(f"Launching browser")
+
     try:
         full_session_path = os.path.join(os.getcwd(), "sessions", session_name)
+        proxy = _get_session_proxy(session_name, full_session_path)
 
-        proxy = None
+        return await CdpBrowser.start(full_session_path, settings.HOT_URL, proxy, pool)
+    except Exception as e:
+        session_logger.error(f"Session {session_name} has failed. Could not launch browser. {e}")
+        return None
 
-        try:
-            proxy = proxy_utils.get_proxy_from_file(os.path.join(full_session_path, "proxy.txt"))
-        except FileNotFoundError:
-            session_logger.warning(f"Proxy file not found. Starting session without proxy")
-            pass
+def _process_session(session_name: str, browser: Optional[SeleniumBrowser]):
+    session_logger = logger.bind(session_name=session_name)
+    session_logger.info(f"Start processing session")
+    
+    bot = None
+    try:
+        if not browser:
+            return None
 
-        browser = SeleniumBrowser(full_session_path, HotBotBrowser.HOT_URL, proxy)
         bot = HotBotBrowser(browser)
         bot.run_tasks()
     except HotWalletException as e:
@@ -56,33 +97,92 @@ def _process_session(session_name: str):
             return _status
 
 
-def run(sessions_to_run) -> None:
+async def _process_session_async(session_name: str, browser: Optional[CdpBrowser]):
+    session_logger = logger.bind(session_name=session_name)
+    session_logger.info(f"Start processing session")
+
+    if not browser:
+        return None
+
+    bot = AsyncHotBotBrowser(browser)
+    try:
+        await bot.run_tasks()
+    except Exception as e:
+        session_logger.error(f"Session {session_name} has failed. {e}")
+    finally:
+        await browser.quit()
+
+    return bot.status()
+
+def _create_runner():
+    if settings.BROWSER_BACKEND == "cdp":
+        # Several sessions per Chrome, each in its own browser context
+        pool = ChromePool(settings.ACCOUNTS_PER_BROWSER) if settings.ACCOUNTS_PER_BROWSER > 1 else None
+        return AsyncSessionRunner(functools.partial(_launch_browser_async, pool=pool), _process_session_async,
+                                  settings.ACTIVE_SESSIONS, create_concurrency(), settings.SESSION_MAX_RSS_MB,
+                                  settings.SESSION_TIMEOUT, create_circuit_breaker(), create_retry_policy())
+
+    return SessionRunner(_launch_browser, _process_session, settings.ACTIVE_SESSIONS, settings.PRELAUNCH_BROWSER,
+                         create_concurrency(), settings.SESSION_MAX_RSS_MB, settings.SESSION_TIMEOUT,
+                         create_circuit_breaker(), create_retry_policy())
+
+def _skip_finished(store: ReportStore, sessions: list[str]) -> list[str]:
+    """Sessions which have not finished all tasks today. Others are not launched at all."""
+    finished = store.finished_today()
+    skipped = [session for session in sessions if session in finished]
+    if skipped:
+        logger.info(f"Skipping {len(skipped)} sessions which have finished all tasks today (use --all to run them).")
+    return [session for session in sessions if session not in finished]
+
+def run(sessions_to_run, resume: bool = False, run_all: bool = False) -> None:
     start_time = time.time()
     logger.info("Starting tasks module")
-
-    sessions = _get_sessions()
-    
-    if not sessions_to_run:
-         sessions_to_run = sessions
+    use_resolved_browser_paths() # once here instead of in every worker
+
+    store = ReportStore()
+    resumed = store.interrupted_run("tasks") if resume else None
+    if resume and not resumed:
+        logger.info("The last 'tasks' run was finished, nothing to resume.")
+        store.close()
+        return
+
+    if resumed:
+        run_id, sessions_to_run = resumed
+        logger.info(f"Resuming run {run_id}: {len(sessions_to_run)} sessions have no result yet.")
     else:
-         sessions_to_run = list(set(sessions) & set(sessions_to_run)) # run only specified sessions (if they exist in the ./sesions path)
+        sessions = _get_sessions()
 
-    logger.info(f"{len(sessions_to_run)} will be processed.")
+        if not sessions_to_run:
+            sessions_to_run = sessions
+        else:
+            sessions_to_run = sorted(set(sessions) & set(sessions_to_run)) # run only specified sessions (if they exist in the ./sesions path)
+        sessions_to_run = _skip_not_logged_in(store, sessions_to_run)
 
-    tasks = []
-    with multiprocessing.Pool(processes=settings.ACTIVE_SESSIONS) as pool:
-        for s in sessions_to_run:
-            r = pool.apply_async(_process_session, args=(s,))
-            tasks.append(r)
+    if not run_all:
+        sessions_to_run = _skip_finished(store, sessions_to_run)
 
-        pool.close()
-        pool.join()
+    logger.info(f"{len(sessions_to_run)} will be processed.")
 
-    result_list = [t.get() for t in tasks]
-    produce_report(result_list)
+    if not resumed:
+        run_id = store.start_run("tasks", sessions_to_run)
+    try:
+        progress = Progress(len(sessions_to_run))
+        runner = _create_runner()
+        for status in runner.iter_results(sessions_to_run):
+            store.record(run_id, status)
+            progress.update(status)
+
+        if runner.breaker and runner.breaker.aborted:
+            logger.warning(f"Run {run_id} was aborted by the circuit breaker. Continue it with 'tasks --resume'.")
+        else:
+            store.finish_run(run_id)
+    except KeyboardInterrupt:
+        logger.warning(f"Run {run_id} was interrupted. Continue it with 'tasks --resume'.")
+    finally:
+        store.export()
+        store.close()
+        produce_metrics(run_id, "tasks", metrics.spans.snapshot())
 
     elapsed_seconds = int(time.time() - start_time)
     logger.info(f"Tasks module finished. Elapsed time: {elapsed_seconds} seconds")
     return
-
-
@@ -1,24 +1,35 @@
-import json
-import multiprocessing
 import os
 import shutil
 import sys
 import time
-from typing import Any
+from typing import Any, Optional
 
 from src.exceptions import HotWalletException
-from src.services.report import produce_report
-from src.services import SeleniumBrowser
+from src.services.report import ReportStore, produce_metrics
+from src.services.concurrency import create_concurrency
+from src.services.circuit_breaker import create_circuit_breaker
+from src.services.retry import create_retry_policy
+from src.services import failures
+from src.services import SeleniumBrowser, SessionRunner, CdpBrowser, AsyncSessionRunner, Progress, Pipeline
+from src.modules import tasks_module
 from src.utils import get_logger
-from src.bots import HotBotBrowser
+from src.bots import HotBotBrowser, AsyncHotBotBrowser
 from src.config import settings
 from src.utils import proxy_utils
+from src.utils import metrics
+from src.utils import profile_utils
+from src.utils.browser_paths import use_resolved_browser_paths
 
 logger = get_logger()
 
 ACCOUNTS_FILE = "accounts.txt"
 SESSIONS_PATH = "./sessions"
 
+# Stages of the pipeline (LOGIN_ACTIVE_SESSIONS): accounts are logged in, then logged in sessions solve tasks
+# in a new browser, like in the tasks module.
+LOGIN_STAGE = "login"
+TASKS_STAGE = "tasks"
+
 def _delete_session(full_path: str):
     try:
         logger.warning(f"Deleting failed session: {full_path}")
@@ -34,21 +45,71 @@ def _get_existing_sessions() -> list[str]:
     logger.info(f"Found {len(dirs)} existing sessions.")
     return sorted(dirs)
 
-def _process_session(account: tuple[str, str, str]) -> dict[str, Any]:
+def _is_new_session(full_session_path: str) -> bool:
+    return not os.path.isdir(full_session_path) or not os.listdir(full_session_path)
+
+def _is_logged_in(full_session_path: str) -> bool:
+    """Whether an earlier attempt has logged in to the session, e.g. before it failed to open the tasks page.
+    New sessions are marked login_pending when their browser is launched."""
+    return os.path.isdir(full_session_path) and not profile_utils.is_login_pending(full_session_path)
+
+def _launch_browser(account: tuple[str, str, str]) -> Optional[SeleniumBrowser]:
+    session_name, proxy, _ = account
+
+    session_logger = logger.bind(session_name=session_name)
+    session_logger.info(f"Launching browser")
+
+    full_session_path = os.path.join(os.getcwd(), "sessions", session_name)
+    is_new = _is_new_session(full_session_path)
+    try:
+        return SeleniumBrowser(full_session_path, settings.HOT_URL, proxy)
+    except Exception as e:
+        session_logger.error(f"Session {session_name} has failed. Could not launch browser. {e}")
+        return None
+    finally:
+        if is_new: # marked after the profile is created, see profile_utils.open_profile
+            profile_utils.mark_login_pending(full_session_path)
+
+async def _launch_browser_async(account: tuple[str, str, str]) -> Optional[CdpBrowser]:
+    session_name, proxy, _ = account
+
+    session_logger = logger.bind(session_name=session_name)
+    session_logger.info(f"Launching browser")
+
+    full_session_path = os.path.join(os.getcwd(), "sessions", session_name)
+    is_new = _is_new_session(full_session_path)
+    try:
+        return await CdpBrowser.start(full_session_path, settings.HOT_URL, proxy)
+    except Exception as e:
+        session_logger.error(f"Session {session_name} has failed. Could not launch browser. {e}")
+        return None
+    finally:
+        if is_new: # marked after the profile is created, see profile_utils.open_profile
+            profile_utils.mark_login_pending(full_session_path)
+
+def _process_session(account: tuple[str, str, str], browser: Optional[SeleniumBrowser], solve_tasks: bool = True) -> dict[str, Any]:
     session_name, proxy, seed = account
 
     session_logger = logger.bind(session_name=session_name)
     session_logger.info(f"Start processing session")
     
     bot = None
-    logged_in = False
     full_session_path = os.path.join(os.getcwd(), "sessions", session_name)
+    mark = metrics.spans.mark()
     try:
-        browser = SeleniumBrowser(full_session_path, HotBotBrowser.HOT_URL, proxy)
+        if not browser:
+            return None
+
         bot = HotBotBrowser(browser)
-        logged_in = bot.login(seed)
-        if logged_in:
-            bot.run_tasks(already_opened=True)
+        if _is_logged_in(full_session_path): # a retry, logging in again would fail
+            session_logger.info("Session has already logged in. Solving tasks.")
+            bot.is_logged_in = True
+            if solve_tasks:
+                bot.run_tasks()
+        elif bot.login(seed):
+            profile_utils.clear_login_pending(full_session_path)
+            if solve_tasks:
+                bot.run_tasks(already_opened=True)
 
     except HotWalletException as e:
         session_logger.error(f"Session {session_name} has failed. {e}")
@@ -60,13 +121,110 @@ def _process_session(account: tuple[str, str, str]) -> dict[str, Any]:
 
         _status = None
         if bot:
-            _status = bot.status()
-        if not logged_in:
-            _delete_session(full_session_path)
+            _status = bot.status() if solve_tasks else _login_status(bot)
+        if failures.classify(_status, metrics.spans.since(mark, session_name)) == failures.LOGIN:
+            _delete_session(full_session_path) # other failures keep the profile for a retry
         
         return _status
 
 
+async def _process_session_async(account: tuple[str, str, str], browser: Optional[CdpBrowser], solve_tasks: bool = True) -> dict[str, Any]:
+    session_name, proxy, seed = account
+
+    session_logger = logger.bind(session_name=session_name)
+    session_logger.info(f"Start processing session")
+
+    bot = None
+    full_session_path = os.path.join(os.getcwd(), "sessions", session_name)
+    mark = metrics.spans.mark()
+    try:
+        if browser:
+            bot = AsyncHotBotBrowser(browser)
+            if _is_logged_in(full_session_path): # a retry, logging in again would fail
+                session_logger.info("Session has already logged in. Solving tasks.")
+                bot.is_logged_in = True
+                if solve_tasks:
+                    await bot.run_tasks()
+            elif await bot.login(seed):
+                profile_utils.clear_login_pending(full_session_path)
+                if solve_tasks:
+                    await bot.run_tasks(already_opened=True)
+    except Exception as e:
+        session_logger.error(f"Session {session_name} has failed. {e}")
+    finally:
+        if browser:
+            await browser.quit()
+
+    _status = None
+    if bot:
+        _status = bot.status() if solve_tasks else _login_status(bot)
+    if failures.classify(_status, metrics.spans.since(mark, session_name)) == failures.LOGIN:
+        _delete_session(full_session_path) # other failures keep the profile for a retry
+    return _status
+
+def _login_status(bot: HotBotBrowser) -> dict[str, Any]:
+    """Status of the login stage. Sessions with login 'OK' go on to the tasks stage."""
+    return {bot.browser.session: {"login": "OK" if bot.is_logged_in else "Error"}}
+
+def _stage(job) -> str:
+    """Jobs of the login stage are accounts, jobs of the tasks stage are session names."""
+    return TASKS_STAGE if isinstance(job, str) else LOGIN_STAGE
+
+def _hand_off(job, status: Optional[dict[str, Any]]) -> Optional[str]:
+    """Session name of a logged in account, None after the tasks stage, a failed login
+    or a retry which has solved tasks right away (see _process_stage)."""
+    if _stage(job) == TASKS_STAGE or not _is_handed_off(status):
+        return None
+    return job[0]
+
+def _is_handed_off(status: Optional[dict[str, Any]]) -> bool:
+    """Whether a status is the result of the login stage of a session which goes on to the tasks stage."""
+    return bool(status) and all(data.get("login") == "OK" and "Explore crypto" not in data for data in status.values())
+
+def _launch_stage_browser(job) -> Optional[SeleniumBrowser]:
+    return tasks_module._launch_browser(job) if _stage(job) == TASKS_STAGE else _launch_browser(job)
+
+def _process_stage(job, browser: Optional[SeleniumBrowser]) -> dict[str, Any]:
+    if _stage(job) == TASKS_STAGE:
+        return tasks_module._process_session(job, browser)
+    if _is_logged_in(os.path.join(os.getcwd(), "sessions", job[0])): # a retry after the login has succeeded
+        return tasks_module._process_session(job[0], browser)
+    return _process_session(job, browser, solve_tasks=False)
+
+async def _launch_stage_browser_async(job) -> Optional[CdpBrowser]:
+    if _stage(job) == TASKS_STAGE:
+        return await tasks_module._launch_browser_async(job)
+    return await _launch_browser_async(job)
+
+async def _process_stage_async(job, browser: Optional[CdpBrowser]) -> dict[str, Any]:
+    if _stage(job) == TASKS_STAGE:
+        return await tasks_module._process_session_async(job, browser)
+    if _is_logged_in(os.path.join(os.getcwd(), "sessions", job[0])): # a retry after the login has succeeded
+        return await tasks_module._process_session_async(job[0], browser)
+    return await _process_session_async(job, browser, solve_tasks=False)
+
+def _create_runner():
+    """With LOGIN_ACTIVE_SESSIONS logins and tasks run as a pipeline with separate concurrency,
+    otherwise every session logs in and solves tasks in one browser."""
+    pipeline = None
+    workers = settings.ACTIVE_SESSIONS
+    if settings.LOGIN_ACTIVE_SESSIONS:
+        limits = {LOGIN_STAGE: settings.LOGIN_ACTIVE_SESSIONS, TASKS_STAGE: settings.ACTIVE_SESSIONS}
+        pipeline = Pipeline(limits, _stage, _hand_off)
+        workers = pipeline.size
+        logger.info(f"Login and tasks run as a pipeline. Concurrency: {limits}")
+
+    if settings.BROWSER_BACKEND == "cdp":
+        launch, process = (_launch_stage_browser_async, _process_stage_async) if pipeline else (_launch_browser_async, _process_session_async)
+        return AsyncSessionRunner(launch, process, workers,
+                                  create_concurrency(), settings.SESSION_MAX_RSS_MB,
+                                  settings.SESSION_TIMEOUT, create_circuit_breaker(), create_retry_policy(), pipeline)
+
+    launch, process = (_launch_stage_browser, _process_stage) if pipeline else (_launch_browser, _process_session)
+    return SessionRunner(launch, process, workers, settings.PRELAUNCH_BROWSER,
+                         create_concurrency(), settings.SESSION_MAX_RSS_MB, settings.SESSION_TIMEOUT,
+                         create_circuit_breaker(), create_retry_policy(), pipeline)
+
 def _parse_accounts_file() -> list[tuple[str, str, str]]:
     if not os.path.exists(ACCOUNTS_FILE):
         logger.error(f"File {ACCOUNTS_FILE} not found")
@@ -133,23 +291,31 @@ def _remove_existing_sessions(accounts, existing_sessions) -> list[tuple[str, st
 def run() -> None:
     start_time = time.time()
     logger.info("Starting tasks with login module")
+    use_resolved_browser_paths() # once here instead of in every worker
 
+    store = ReportStore()
     accounts = _parse_accounts_file()
     accounts = _filter_invalid_accounts(accounts)
     existing_sessions = _get_existing_sessions()
-    accounts = _remove_existing_sessions(accounts, existing_sessions)
+    for session in store.failed_logins("tasks --with-login") & set(existing_sessions):
+        profile_utils.mark_login_pending(os.path.join(SESSIONS_PATH, session)) # left by runs before the marker existed
+    not_logged_in = {s for s in existing_sessions if profile_utils.is_login_pending(os.path.join(SESSIONS_PATH, s))}
+    if not_logged_in:
+        logger.info(f"{len(not_logged_in)} sessions have never logged in. Login is retried for them.")
+    accounts = _remove_existing_sessions(accounts, [s for s in existing_sessions if s not in not_logged_in])
     
-    tasks = []
-    with multiprocessing.Pool(processes=settings.ACTIVE_SESSIONS) as pool:
-        for acc in accounts:
-            r = pool.apply_async(_process_session, args=(acc,))
-            tasks.append(r)
-
-        pool.close()
-        pool.join()
-
-    result_list = [t.get() for t in tasks]
-    produce_report(result_list)
+    run_id = store.start_run("tasks --with-login")
+    try:
+        progress = Progress(len(accounts))
+        for status in _create_runner().iter_results(accounts):
+            store.record(run_id, status)
+            if not _is_handed_off(status): # counted when the session has finished its tasks
+                progress.update(status)
+    finally:
+        store.finish_run(run_id)
+        store.export()
+        store.close()
+        produce_metrics(run_id, "tasks --with-login", metrics.spans.snapshot())
 
     elapsed_seconds = int(time.time() - start_time)
     logger.info(f"Tasks --with-login module finished. Elapsed time: {elapsed_seconds} seconds")
@@ -21,7 +21,7 @@ def _create_session(session_name: str):
             pass
 
         settings.HEADLESS = False
-        browser = SeleniumBrowser(full_session_path, HotBotBrowser.HOT_URL, proxy)
+        browser = SeleniumBrowser(full_session_path, settings.HOT_URL, proxy)
         input("Waiting for the user... Press enter to close browser")
     except KeyboardInterrupt:
         pass
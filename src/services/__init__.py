@@ -1,2 +1,6 @@
-from .report import produce_report
-from .selenium_browser import SeleniumBrowser
\ No newline at end of file
+from .report import produce_metrics, ReportStore
+from .selenium_browser import SeleniumBrowser
+from .cdp_browser import CdpBrowser
+from .session_runner import SessionRunner, AsyncSessionRunner, Pipeline
+from .progress import Progress
+from . import storage_state
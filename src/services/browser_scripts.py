@@ -0,0 +1,102 @@
+"""JavaScript used by SeleniumBrowser and CdpBrowser.
+
+Every constant is a function declaration. Call it with the document (or element) it should work on,
+so both browsers can run it in the current frame.
+"""
+
+# Snapshot of the container's child divs in one round-trip.
+# Every item gets a data attribute, so it can be located again by `handle` after re-renders.
+SNAPSHOT_LIST_JS = """
+function(container, completedText, includeElement) {
+    return Array.from(container.children).filter(c => c.tagName === 'DIV').map((element, index) => {
+        const text = element.innerText || '';
+        element.setAttribute('data-hotbot-item', String(index));
+        const item = {
+            index: index,
+            title: text.split('\\n')[0],
+            text: text,
+            completed: text.includes(completedText),
+            handle: "//*[@data-hotbot-item='" + index + "']",
+        };
+        if (includeElement) item.element = element;
+        return item;
+    });
+}
+"""
+
+# Locate and scroll into view in one call, the caller clicks the returned element.
+# Returns null while the element is missing, invisible, disabled or covered by another element.
+FIND_CLICKABLE_JS = """
+function(root, xpath) {
+    const element = root.evaluate(xpath, root, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    if (!element || element.disabled) return null;
+
+    const view = element.ownerDocument.defaultView;
+    let box = element.getBoundingClientRect();
+    if (box.width === 0 || box.height === 0 || view.getComputedStyle(element).visibility === 'hidden') return null;
+
+    if (!(box.top >= 0 && box.left >= 0 && box.bottom <= view.innerHeight && box.right <= view.innerWidth)) {
+        element.scrollIntoView({block: 'center'});
+        box = element.getBoundingClientRect();
+    }
+
+    const x = box.left + box.width / 2, y = box.top + box.height / 2;
+    const hit = element.ownerDocument.elementFromPoint(x, y);
+    if (hit && !element.contains(hit) && !hit.contains(element)) return null;
+    return element;
+}
+"""
+
+# Locate an input (or a label/wrapper of one) and set its value the way React expects.
+# Returns {element, typed}: typed is false when the located element has no input inside. Null if not found.
+TYPE_TEXT_JS = """
+function(root, xpath, text) {
+    const element = root.evaluate(xpath, root, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    if (!element) return null;
+
+    const editable = 'input, textarea';
+    const target = element.matches(editable) ? element : (element.control || element.querySelector(editable));
+    if (!target) return {element: element, typed: false};
+
+    const view = target.ownerDocument.defaultView;
+    const prototype = target.tagName === 'TEXTAREA' ? view.HTMLTextAreaElement.prototype : view.HTMLInputElement.prototype;
+    target.focus();
+    Object.getOwnPropertyDescriptor(prototype, 'value').set.call(target, text);
+    target.dispatchEvent(new view.Event('input', {bubbles: true}));
+    target.dispatchEvent(new view.Event('change', {bubbles: true}));
+    return {element: target, typed: true};
+}
+"""
+
+
+# Replaces window.open and target=_blank links of the window (and of its top window, if same-origin),
+# so a tab the app opens (the YouTube video) is never created. The app gets a window-like object back.
+BLOCK_NEW_TABS_JS = """
+function(win) {
+    for (const w of [win, win.top]) {
+        try {
+            if (w.__hotbotNoTabs) continue;
+            w.__hotbotNoTabs = true;
+            w.open = function(url) {
+                return {closed: false, close() { this.closed = true; }, focus() {}, blur() {}, postMessage() {},
+                        location: {href: String(url || '')}};
+            };
+            w.document.addEventListener('click', (event) => {
+                const link = event.target.closest && event.target.closest('a[target="_blank"]');
+                if (link) event.preventDefault();
+            }, true);
+        } catch (e) {} // cross-origin top window
+    }
+}
+"""
+
+
+def call_in_document(function: str) -> str:
+    """Wrap a function declaration for Selenium's execute_script: it gets the current frame's document
+    followed by the script arguments."""
+    return f"return ({function})(document, ...arguments);"
+
+
+def call_with_arguments(function: str) -> str:
+    """Wrap a function declaration for Selenium's execute_script: it gets the script arguments."""
+    return f"return ({function})(...arguments);"
@@ -0,0 +1,822 @@
+import asyncio
+import itertools
+import json
+import os
+import shutil
+import time
+from typing import Any, Callable, Optional
+
+import websockets
+
+from src.exceptions import HotWalletException
+from src.utils import proxy_utils, profile_utils
+from src.config import settings
+from src import utils
+from src.utils.user_agents import get_random_chrome_user_agent
+from src.utils import browser_paths
+from src.utils.metrics import timed
+from src.utils.command_tracer import CommandTracer, caller_frame
+from src.services.browser_scripts import SNAPSHOT_LIST_JS, BLOCK_NEW_TABS_JS
+from src.services import storage_state
+
+logger = utils.get_logger()
+
+
+class CdpError(Exception):
+    """Chrome DevTools Protocol command failed or the connection was lost."""
+
+
+# Resolves the document elements are looked up in: the top document or the selected iframe's document.
+_ROOT_DOCUMENT_JS = """
+function __hotbotRoot(frameXpath) {
+    if (!frameXpath) return document;
+    const frame = document.evaluate(frameXpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    return frame && frame.contentDocument;
+}
+"""
+
+_FIND_ELEMENT_JS = _ROOT_DOCUMENT_JS + """
+(function(frameXpath, xpath, visibleOnly) {
+    const root = __hotbotRoot(frameXpath);
+    if (!root) return null;
+    const element = root.evaluate(xpath, root, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    if (!element || !visibleOnly) return element;
+    const box = element.getBoundingClientRect();
+    const style = element.ownerDocument.defaultView.getComputedStyle(element);
+    return (box.width > 0 && box.height > 0 && style.visibility !== 'hidden') ? element : null;
+})(%s, %s, %s)
+"""
+
+_SCROLL_INTO_VIEW_JS = """
+function() {
+    const box = this.getBoundingClientRect(), view = this.ownerDocument.defaultView;
+    if (!(box.top >= 0 && box.left >= 0 &&
+        box.bottom <= (view.innerHeight || this.ownerDocument.documentElement.clientHeight) &&
+        box.right <= (view.innerWidth || this.ownerDocument.documentElement.clientWidth))) {
+        this.scrollIntoView({block: 'center'});
+        return false;
+    }
+    return true;
+}
+"""
+
+# Center of the element in top-level viewport coordinates (iframe offset included).
+_CLICK_POINT_JS = """
+function() {
+    const box = this.getBoundingClientRect();
+    const frame = this.ownerDocument.defaultView.frameElement;
+    const offset = frame ? frame.getBoundingClientRect() : {left: 0, top: 0};
+    return [offset.left + box.left + box.width / 2, offset.top + box.top + box.height / 2];
+}
+"""
+
+_FOCUS_JS = """
+function() {
+    const editable = 'input, textarea, [contenteditable]';
+    const target = this.matches(editable) ? this : (this.control || this.querySelector(editable) || this);
+    target.focus();
+}
+"""
+
+
+class CdpConnection:
+    """Websocket connection to Chrome's browser endpoint.
+
+    Page commands are sent over the same connection using flat target sessions.
+    """
+
+    def __init__(self, ws) -> None:
+        self._ws = ws
+        self._ids = itertools.count(1)
+        self._pending: dict[int, asyncio.Future] = {}
+        self._listeners: dict[str, list[Callable[[dict, Optional[str]], None]]] = {}
+        self._reader = asyncio.create_task(self._read_loop())
+
+    @classmethod
+    async def connect(cls, url: str) -> "CdpConnection":
+        ws = await websockets.connect(url, max_size=None)
+        return cls(ws)
+
+    async def send(self, method: str, params: Optional[dict] = None, session_id: Optional[str] = None, timeout: float = 60) -> dict:
+        message_id = next(self._ids)
+        message = {"id": message_id, "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        try:
+            await self._ws.send(json.dumps(message))
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(message_id, None)
+
+    def on(self, event: str, callback: Callable[[dict, Optional[str]], None]) -> None:
+        """Subscribe to a CDP event. Callback receives event params and the session id."""
+        self._listeners.setdefault(event, []).append(callback)
+
+    async def close(self) -> None:
+        self._reader.cancel()
+        await self._ws.close()
+
+    async def _read_loop(self) -> None:
+        try:
+            async for raw in self._ws:
+                message = json.loads(raw)
+
+                if "id" in message:
+                    future = self._pending.get(message["id"])
+                    if not future or future.done():
+                        continue
+                    if "error" in message:
+                        future.set_exception(CdpError(message["error"].get("message")))
+                    else:
+                        future.set_result(message.get("result", {}))
+                    continue
+
+                for callback in self._listeners.get(message.get("method"), []):
+                    callback(message.get("params", {}), message.get("sessionId"))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(CdpError("Connection to the browser was closed"))
+
+
+class CdpElement:
+    """Handle to a DOM element living in the page (a CDP remote object)."""
+
+    def __init__(self, browser: "CdpBrowser", object_id: str) -> None:
+        self.browser = browser
+        self.object_id = object_id
+
+    async def call(self, function: str, *args, return_by_value: bool = True) -> dict:
+        result = await self.browser.send("Runtime.callFunctionOn", {
+            "objectId": self.object_id,
+            "functionDeclaration": function,
+            "arguments": [{"value": a} for a in args],
+            "returnByValue": return_by_value,
+            "awaitPromise": True,
+        })
+        if "exceptionDetails" in result:
+            raise CdpError(result["exceptionDetails"].get("text"))
+        return result["result"]
+
+    async def text(self) -> str:
+        result = await self.call("function() { return this.innerText; }")
+        return result.get("value") or ""
+
+    async def click(self) -> None:
+        await self.call(_SCROLL_INTO_VIEW_JS)
+        x, y = (await self.call(_CLICK_POINT_JS))["value"]
+
+        await self.browser.send("Input.dispatchMouseEvent", {"type": "mouseMoved", "x": x, "y": y})
+        for event_type in ("mousePressed", "mouseReleased"):
+            await self.browser.send("Input.dispatchMouseEvent",
+                                    {"type": event_type, "x": x, "y": y, "button": "left", "clickCount": 1})
+
+    async def send_keys(self, text: str) -> None:
+        await self.call(_FOCUS_JS)
+        await self.browser.send("Input.insertText", {"text": text})
+
+    async def find_elements(self, xpath: str) -> list["CdpElement"]:
+        result = await self.call("""
+            function(xpath) {
+                const found = this.ownerDocument.evaluate(xpath, this, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+                return Array.from({length: found.snapshotLength}, (_, i) => found.snapshotItem(i));
+            }
+        """, xpath, return_by_value=False)
+        return await self.browser._array_to_elements(result)
+
+
+class SharedChrome:
+    """Chrome process which hosts several sessions, each in its own browser context.
+
+    Browser contexts are like separate incognito windows: cookies, storage and cache are not shared
+    and kept only in memory, so sessions are restored from their storage state snapshots.
+    """
+
+    def __init__(self, process: asyncio.subprocess.Process, connection: CdpConnection, user_data_dir: str) -> None:
+        self.process = process
+        self.connection = connection
+        self.user_data_dir = user_data_dir
+        self.contexts = 0
+
+    @classmethod
+    async def launch(cls) -> "SharedChrome":
+        user_data_dir = os.path.abspath(os.path.join(profile_utils.RUNTIME_PATH, f"shared-{os.getpid()}-{next(_shared_ids)}"))
+        args = []
+        if settings.DISABLE_WEBRTC:
+            # Extensions are not enabled in browser contexts
+            args.append("--force-webrtc-ip-handling-policy=disable_non_proxied_udp")
+
+        process, connection = await _start_chrome(user_data_dir, args)
+        return cls(process, connection, user_data_dir)
+
+    @property
+    def is_alive(self) -> bool:
+        return self.process.returncode is None
+
+    async def close(self) -> None:
+        try:
+            await self.connection.send("Browser.close", timeout=5)
+        except Exception:
+            pass
+        await self.connection.close()
+
+        try:
+            await asyncio.wait_for(self.process.wait(), 10)
+        except asyncio.TimeoutError:
+            self.process.kill()
+            await self.process.wait()
+
+        await asyncio.to_thread(shutil.rmtree, self.user_data_dir, True)
+
+
+class ChromePool:
+    """Shares Chrome processes between sessions, at most `accounts_per_browser` sessions in each.
+
+    A Chrome is started when all running ones are full and closed when its last session has finished.
+    """
+
+    def __init__(self, accounts_per_browser: int) -> None:
+        self.accounts_per_browser = max(1, accounts_per_browser)
+        self._browsers: list[SharedChrome] = []
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> SharedChrome:
+        async with self._lock:
+            for chrome in self._browsers:
+                if chrome.is_alive and chrome.contexts < self.accounts_per_browser:
+                    break
+            else:
+                chrome = await SharedChrome.launch()
+                self._browsers.append(chrome)
+                logger.info(f"Started shared Chrome (pid {chrome.process.pid}), {len(self._browsers)} running")
+
+            chrome.contexts += 1
+            return chrome
+
+    async def release(self, chrome: SharedChrome) -> None:
+        async with self._lock:
+            chrome.contexts -= 1
+            if chrome.contexts > 0 and chrome.is_alive:
+                return
+
+            if chrome in self._browsers:
+                self._browsers.remove(chrome)
+        await chrome.close()
+
+
+class CdpBrowser:
+    """Async counterpart of SeleniumBrowser which drives Chrome directly over the DevTools Protocol.
+
+    Many instances can share one event loop, so a single process can run dozens of sessions.
+    Use `await CdpBrowser.start(...)` to create an instance. With a ChromePool the session runs
+    in a browser context of a shared Chrome and is restored from its storage state snapshot.
+    """
+
+    def __init__(self, session_path: str, url: str, proxy_url: str = None, pool: Optional[ChromePool] = None) -> None:
+        self.session_path = session_path
+        self.session = session_path.split("/")[-1]
+
+        self.start_url = url
+
+        if proxy_url:
+            proxy_utils.ensure_valid_proxy(proxy_url)
+        self.proxy_url = proxy_url
+
+        self.logger = utils.get_logger(self.session)
+        self.idle_seconds = 0.0
+
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._connection: Optional[CdpConnection] = None
+        self._target_id: Optional[str] = None
+        self._session_id: Optional[str] = None
+        self._frame_xpath: Optional[str] = None
+        self._proxy_forwarder: Optional[utils.ProxyForwarder] = None
+        self._commands_count = 0
+        self._tracer = CommandTracer(self.session) if settings.TRACE_COMMANDS else None
+
+        self._pool = pool
+        self._shared: Optional[SharedChrome] = None
+        self._context_id: Optional[str] = None
+
+        self.from_storage_state = bool(pool) or storage_state.should_restore(session_path)
+        self._profile = None if pool else profile_utils.open_profile(session_path, fresh=self.from_storage_state)
+        self.user_data_dir = session_path
+
+    @classmethod
+    async def start(cls, session_path: str, url: str, proxy_url: str = None, pool: Optional[ChromePool] = None) -> "CdpBrowser":
+        browser = cls(session_path, url, proxy_url, pool)
+        try:
+            await browser._setup()
+        except Exception:
+            await browser.quit()
+            raise
+        return browser
+
+    def success(self, log):
+        self.logger.success(log)
+
+    def info(self, log):
+        self.logger.info(log)
+
+    def error(self, log):
+        self.logger.error(log)
+
+    def debug(self, log):
+        self.logger.debug(log)
+
+    def warning(self, log):
+        self.logger.warning(log)
+
+    def critical(self, log):
+        self.logger.critical(log)
+
+    @property
+    def pid(self) -> Optional[int]:
+        """Chrome process id. None in a shared Chrome, its memory can not be attributed to one session."""
+        return self._process.pid if self._process else None
+
+    @property
+    def commands_count(self) -> int:
+        """DevTools commands sent since the browser was started."""
+        return self._commands_count
+
+    async def send(self, method: str, params: Optional[dict] = None) -> dict:
+        """Send a command to the controlled page."""
+        return await self._send(method, params, session_id=self._session_id)
+
+    async def _send(self, method: str, params: Optional[dict] = None, session_id: Optional[str] = None, timeout: float = 60) -> dict:
+        """Send a command over the connection (to the browser without `session_id`), counted and traced for this session."""
+        self._commands_count += 1
+        site = self._tracer.call_site(caller_frame()) if self._tracer else None
+        started = time.perf_counter()
+        try:
+            return await self._connection.send(method, params, session_id=session_id, timeout=timeout)
+        finally:
+            if site:
+                self._tracer.record(method, time.perf_counter() - started, site)
+
+    async def quit(self) -> None:
+        if self._shared:
+            await self._close_context()
+        elif self._connection:
+            try:
+                await self._send("Browser.close", timeout=5)
+            except Exception:
+                pass
+            await self._connection.close()
+        self._connection = None
+
+        if self._tracer:
+            self._tracer.dump()
+
+        if self._process and self._process.returncode is None:
+            try:
+                await asyncio.wait_for(self._process.wait(), 10)
+            except asyncio.TimeoutError:
+                self._process.kill()
+                await self._process.wait()
+
+        if self._proxy_forwarder:
+            self._proxy_forwarder.stop()
+
+        if self._profile:
+            await asyncio.to_thread(self._profile.persist)
+            await asyncio.to_thread(self._profile.cleanup)
+
+    async def refresh(self) -> None:
+        await self.send("Page.reload")
+
+    async def get(self, url: str) -> None:
+        await self.send("Page.navigate", {"url": url})
+        await self.wait_for_page(settings.TIMEOUT)
+
+    async def move_and_click(self, xpath: str,
+                             wait_time: int = 10,
+                             action_description: str = None,
+                             log_level: str = "DEBUG") -> Optional[CdpElement]:
+        return await self.get_element(xpath, wait_time=wait_time, action_description=action_description, click=True, log_level=log_level)
+
+    async def get_element(self, xpath: str,
+                          wait_time: int = 10,
+                          action_description: str = None,
+                          click: bool = False,
+                          log_level="DEBUG") -> Optional[CdpElement]:
+        if not action_description:
+            action_description = xpath
+
+        self.logger.log(log_level, action_description)
+        if not await self.page_has_loaded():
+            await self._wait_until(self.page_has_loaded, 5)
+
+        element = await self._wait_for_element(xpath, wait_time, visible_only=True)
+        if element is None:
+            self.debug(f"TimeoutError occured during {action_description}")
+            raise TimeoutError(f"Element was not found: {action_description}")
+
+        if click:
+            self.debug(f"click element {xpath}.")
+            await element.click()
+            self.debug(f"Clicked successfully {action_description}")
+
+        return element
+
+    async def find_visible(self, xpath: str, wait_time: float = 2) -> Optional[CdpElement]:
+        """See SeleniumBrowser.find_visible"""
+        return await self._wait_for_element(xpath, wait_time, visible_only=True)
+
+    async def press_escape(self) -> None:
+        for event_type in ("keyDown", "keyUp"):
+            await self.send("Input.dispatchKeyEvent",
+                            {"type": event_type, "key": "Escape", "code": "Escape", "windowsVirtualKeyCode": 27})
+
+    async def get_text(self, xpath: str,
+                       wait_time: int = 10,
+                       action_description: str = None,
+                       log_level="DEBUG") -> str:
+        """See SeleniumBrowser.get_text"""
+        element = await self.get_element(xpath, wait_time, action_description, log_level=log_level)
+        return await element.text()
+
+    async def type_text(self, xpath: str, text: str,
+                        wait_time: int = 10,
+                        action_description: str = None,
+                        log_level: str = "DEBUG") -> CdpElement:
+        """Focus the input (or the one inside a located label) and insert the text."""
+        element = await self.get_element(xpath, wait_time, action_description, log_level=log_level)
+        await element.send_keys(text)
+        return element
+
+    async def find_elements(self, xpath: str) -> list[CdpElement]:
+        result = await self._evaluate(_ROOT_DOCUMENT_JS + """
+            (function(frameXpath, xpath) {
+                const root = __hotbotRoot(frameXpath);
+                if (!root) return [];
+                const found = root.evaluate(xpath, root, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+                return Array.from({length: found.snapshotLength}, (_, i) => found.snapshotItem(i));
+            })(%s, %s)
+        """ % (json.dumps(self._frame_xpath), json.dumps(xpath)), return_by_value=False)
+        return await self._array_to_elements(result)
+
+    async def snapshot_list(self, container_xpath: str, completed_text: str = "Completed", wait_time: int = 10) -> list[dict[str, Any]]:
+        """Read all child divs of a container with a single call. See SeleniumBrowser.snapshot_list"""
+        container = await self.get_element(container_xpath, wait_time, f"Snapshot of {container_xpath}")
+        result = await container.call(f"function(completedText) {{ return ({SNAPSHOT_LIST_JS})(this, completedText, false); }}", completed_text)
+        return result.get("value") or []
+
+    async def select_iframe(self, xpath, wait_time=20) -> bool:
+        self._frame_xpath = None
+        frame = await self._wait_for_element(xpath, wait_time)
+        if frame is None:
+            self.error(f"Could not switch to app's iFrame '{xpath}'.")
+            return False
+
+        self._frame_xpath = xpath
+        self.debug(f"Successfully switched to iframe '{xpath}'.")
+        return True
+
+    async def select_iframe_and_wait(self, xpath, element_inside_iframe_xpath, wait_time=30) -> bool:
+        if not await self.select_iframe(xpath, wait_time):
+            return False
+
+        if await self._wait_for_element(element_inside_iframe_xpath, wait_time, visible_only=True) is None:
+            self.error(f"Could not wait for element '{element_inside_iframe_xpath}' inside iframe.")
+            return False
+
+        self.debug(f"Successfully switched to iframe and waited for element within '{xpath}'.")
+        return True
+
+    async def tabs_count(self) -> int:
+        return len(await self._page_targets())
+
+    async def block_new_tabs(self) -> None:
+        """See SeleniumBrowser.block_new_tabs"""
+        root = _ROOT_DOCUMENT_JS + "(function(root) { if (root) (%s)(root.defaultView); })(__hotbotRoot(%s))"
+        await self._evaluate(root % (BLOCK_NEW_TABS_JS, json.dumps(self._frame_xpath)))
+
+    async def close_tab(self, action_description = None) -> None:
+        if not action_description:
+            action_description = "Trying to close tab"
+
+        tabs = await self._page_targets()
+        self.debug(f"{action_description}. {len(tabs)} tabs are currently open.")
+
+        for tab in tabs:
+            if tab["targetId"] != self._target_id:
+                self.debug(f"Closing tab {tab.get('url')}")
+                await self._send("Target.closeTarget", {"targetId": tab["targetId"]})
+
+    async def page_has_loaded(self) -> bool:
+        try:
+            return await self._evaluate("document.readyState") == "complete"
+        except CdpError:
+            return False
+
+    async def wait_for_page(self, wait_time = 30) -> bool:
+        self.info(f"Wait {wait_time} seconds for the page to load.")
+        if await self._wait_until(self.page_has_loaded, wait_time, count_idle=False):
+            return True
+
+        self.error(f"Page was not loaded after {wait_time} seconds")
+        return False
+
+    @timed("setup_driver")
+    async def _setup(self) -> None:
+        try:
+            self.info(f"Setting up Chrome (CDP). Proxy url: {self.proxy_url}")
+            if self._pool:
+                await self._open_context()
+            else:
+                if self._profile:
+                    await self._materialize_profile()
+                await self._launch_chrome()
+            await self._attach_to_page()
+
+            if self.proxy_url:
+                proxy_utils.save_proxy_to_file(f"{self.session_path}/proxy.txt", self.proxy_url)
+
+            # TODO: add timezones
+            await self.send("Emulation.setTimezoneOverride", {"timezoneId": "Europe/Amsterdam"}) # Browser timezone
+
+            ua = await self._evaluate("navigator.userAgent")
+            self.info(f"Browser started. User-Agent: {ua}")
+
+            if settings.DISABLE_WEBRTC and not self._pool: # shared Chrome disables non-proxied UDP itself
+                await self._disable_webrtc()
+
+            if settings.VERIFY_PROXY:
+                await self._verify_proxy()
+
+            if self.from_storage_state:
+                await self._restore_storage_state()
+
+            await self.send("Page.navigate", {"url": self.start_url})
+        except HotWalletException:
+            raise
+        except Exception as e:
+            self.error(f"Chrome (CDP) setup failed: {type(e).__name__} {str(e)}")
+            raise HotWalletException()
+
+    @timed("materialize_profile")
+    async def _materialize_profile(self) -> None:
+        self.user_data_dir = await asyncio.to_thread(self._profile.materialize)
+
+    async def _launch_chrome(self) -> None:
+        args = [f"--user-agent={get_random_chrome_user_agent()}"]
+
+        if self.proxy_url:
+            self._proxy_forwarder = utils.ProxyForwarder(self.proxy_url).start()
+            args.append(f"--proxy-server={self._proxy_forwarder.url}")
+
+        if settings.DISABLE_WEBRTC:
+            args.append(f"--load-extension={settings.WEBRTC_EXTENSION_PATH}")
+
+        self._process, self._connection = await _start_chrome(self.user_data_dir, args)
+
+    async def _open_context(self) -> None:
+        """Create a browser context for this session in a shared Chrome. Its proxy is set per context."""
+        if not storage_state.has_state(self.session_path):
+            raise HotWalletException(f"Session has no {storage_state.STORAGE_STATE_FILE}. "
+                                     f"Create it with 'export-state' to run it in a shared Chrome")
+
+        self._shared = await self._pool.acquire()
+        self._connection = self._shared.connection
+
+        params = {}
+        if self.proxy_url:
+            self._proxy_forwarder = utils.ProxyForwarder(self.proxy_url).start()
+            params["proxyServer"] = self._proxy_forwarder.url
+
+        result = await self._send("Target.createBrowserContext", params)
+        self._context_id = result["browserContextId"]
+
+    async def _close_context(self) -> None:
+        if self._context_id:
+            try:
+                await self._send("Target.disposeBrowserContext", {"browserContextId": self._context_id}, timeout=10)
+            except Exception as e:
+                self.debug(f"Could not dispose browser context. {e}")
+
+        await self._pool.release(self._shared)
+        self._shared = None
+
+    async def _attach_to_page(self) -> None:
+        pages = await self._page_targets()
+        if pages:
+            self._target_id = pages[0]["targetId"]
+        else:
+            params = {"url": "about:blank"}
+            if self._context_id:
+                params["browserContextId"] = self._context_id
+            result = await self._send("Target.createTarget", params)
+            self._target_id = result["targetId"]
+
+        result = await self._send("Target.attachToTarget", {"targetId": self._target_id, "flatten": True})
+        self._session_id = result["sessionId"]
+        await self.send("Page.enable")
+
+        if settings.LEAN_MODE:
+            await self.send("Network.enable")
+            await self.send("Network.setBlockedURLs", {"urls": utils.LEAN_BLOCKED_URLS})
+
+        if self._context_id: # the command line user agent is shared by all contexts
+            await self.send("Emulation.setUserAgentOverride", {"userAgent": get_random_chrome_user_agent()})
+
+    async def _page_targets(self) -> list[dict[str, Any]]:
+        """Pages of this session: all pages of its own Chrome or the pages of its browser context."""
+        result = await self._send("Target.getTargets")
+        return [t for t in result["targetInfos"] if t["type"] == "page"
+                and (not self._context_id or t.get("browserContextId") == self._context_id)]
+
+    @timed("verify_proxy")
+    async def _verify_proxy(self) -> bool:
+        try:
+            if not self.proxy_url:
+                msg = f"Proxy url was not provided."
+                self.critical(msg)
+                raise HotWalletException(msg)
+
+            await self.get("https://httpbin.io/ip")
+            content = await self._evaluate("document.querySelector('pre').innerText")
+            origin = json.loads(content).get("origin")
+
+            real_ip_addr = proxy_utils.extract_ip(origin)
+            my_ip = proxy_utils.extract_ip(self.proxy_url)
+
+            if real_ip_addr != my_ip:
+                msg = f"Proxy did not work. Expected IP address: '{my_ip}'. Real IP address: '{real_ip_addr}' (from ifconfig.me)."
+                self.critical(msg)
+                raise HotWalletException(msg)
+
+            self.info(f"Proxy check was successful. Your IP: {real_ip_addr}")
+            return True
+        except Exception as e:
+            msg = f"IP check failed. {str(e)}"
+            self.critical(msg)
+            raise HotWalletException(msg)
+
+    async def _disable_webrtc(self):
+        """Prevent real IP address leak when using Proxy. See SeleniumBrowser._disable_webrtc"""
+        try:
+            await self.get("chrome-extension://npeicpdbkakmehahjeeohfdhnlpdklia/options.html")
+
+            label_id = "for_disable_non_proxied_udp"
+            target_element = await self.get_element(f"//*[@id='{label_id}']", click=True)
+            self.info(f"WebRTC disabled.")
+        except Exception as e:
+            msg = f"Could not disable web rtc. {str(e)}"
+            self.critical(msg)
+            raise HotWalletException(msg)
+
+    async def save_storage_state(self) -> None:
+        """Save localStorage, IndexedDB and cookies of the app. See SeleniumBrowser.save_storage_state"""
+        response = await self.send("Runtime.evaluate", storage_state.evaluate_params(
+            storage_state.export_expression(), await self._app_isolated_world()))
+        cookies = (await self.send("Network.getAllCookies"))["cookies"]
+
+        state = storage_state.build_state(storage_state.evaluate_result(response), cookies)
+        await asyncio.to_thread(storage_state.save, self.session_path, state)
+        self.debug(f"Storage state saved: {len(state['localStorage'])} localStorage items, "
+                   f"{len(state['indexedDB'])} databases, {len(state['cookies'])} cookies")
+
+    @timed("restore_storage_state")
+    async def _restore_storage_state(self) -> None:
+        state = await asyncio.to_thread(storage_state.load, self.session_path)
+        script = await self.send("Page.addScriptToEvaluateOnNewDocument", {"source": storage_state.STOP_RESTORE_PAGE_JS})
+        try:
+            # Page.navigate returns when the new document is committed, the stopped page never finishes loading
+            result = await self.send("Page.navigate", {"url": storage_state.restore_url()})
+            if result.get("errorText"):
+                raise HotWalletException(f"Could not open the app origin: {result['errorText']}")
+
+            response = await self.send("Runtime.evaluate", storage_state.evaluate_params(
+                storage_state.import_expression(state), await self._app_isolated_world()))
+            storage_state.evaluate_result(response)
+        finally:
+            await self.send("Page.removeScriptToEvaluateOnNewDocument", {"identifier": script["identifier"]})
+
+        if state["cookies"]:
+            await self.send("Network.setCookies", {"cookies": state["cookies"]})
+        self.info(f"Storage state from {state['saved']} restored into a fresh profile")
+
+    async def _app_isolated_world(self) -> int:
+        """Execution context with the app origin's storage, separate from the page scripts."""
+        frame = (await self.send("Page.getFrameTree"))["frameTree"]["frame"]
+        if frame.get("securityOrigin") != storage_state.app_origin():
+            raise HotWalletException(f"Page is not on the app origin {storage_state.app_origin()}")
+
+        world = await self.send("Page.createIsolatedWorld", {"frameId": frame["id"], "worldName": storage_state.ISOLATED_WORLD})
+        return world["executionContextId"]
+
+    async def _evaluate(self, expression: str, return_by_value: bool = True) -> Any:
+        result = await self.send("Runtime.evaluate", {
+            "expression": expression,
+            "returnByValue": return_by_value,
+            "awaitPromise": True,
+        })
+        if "exceptionDetails" in result:
+            raise CdpError(result["exceptionDetails"].get("text"))
+
+        if return_by_value:
+            return result["result"].get("value")
+        return result["result"]
+
+    async def _find_element(self, xpath: str, visible_only: bool) -> Optional[CdpElement]:
+        expression = _FIND_ELEMENT_JS % (json.dumps(self._frame_xpath), json.dumps(xpath), json.dumps(visible_only))
+        try:
+            result = await self._evaluate(expression, return_by_value=False)
+        except CdpError:
+            return None # page is navigating
+
+        object_id = result.get("objectId")
+        return CdpElement(self, object_id) if object_id else None
+
+    async def _wait_for_element(self, xpath: str, wait_time: float, visible_only: bool = False) -> Optional[CdpElement]:
+        deadline = time.time() + wait_time
+        while True:
+            element = await self._find_element(xpath, visible_only)
+            if element or time.time() > deadline:
+                return element
+            await asyncio.sleep(0.2)
+
+    async def _wait_until(self, condition: Callable[[], Any], wait_time: float, count_idle: bool = True) -> bool:
+        """Poll an async condition. Time spent here is added to `idle_seconds` unless `count_idle` is False."""
+        started = time.time()
+        try:
+            while time.time() - started < wait_time:
+                if await condition():
+                    return True
+                await asyncio.sleep(0.2)
+            return False
+        finally:
+            if count_idle:
+                self.idle_seconds += time.time() - started
+
+    async def _array_to_elements(self, array_object: dict) -> list[CdpElement]:
+        object_id = array_object.get("objectId")
+        if not object_id:
+            return []
+
+        result = await self.send("Runtime.getProperties", {"objectId": object_id, "ownProperties": True})
+        items = [(int(p["name"]), p["value"]["objectId"]) for p in result["result"]
+                 if p["name"].isdigit() and p.get("value", {}).get("objectId")]
+        return [CdpElement(self, oid) for _, oid in sorted(items)]
+
+
+_shared_ids = itertools.count(1)
+
+
+async def _start_chrome(user_data_dir: str, args: list[str]) -> tuple[asyncio.subprocess.Process, CdpConnection]:
+    """Start Chrome with a DevTools port and connect to it."""
+    os.makedirs(user_data_dir, exist_ok=True)
+    port_file = os.path.join(user_data_dir, "DevToolsActivePort")
+    if os.path.exists(port_file):
+        os.remove(port_file)
+
+    args = list(utils.DEFAULT_CHROME_ARGUMENTS) + [
+        "--remote-debugging-port=0",
+        f"--user-data-dir={user_data_dir}",
+        "--window-size=1920,1080",
+        "--no-first-run",
+        "--no-default-browser-check",
+    ] + args
+
+    if settings.HEADLESS:
+        args.append("--headless")
+
+    if settings.LEAN_MODE:
+        args += utils.LEAN_CHROME_ARGUMENTS
+
+    process = await asyncio.create_subprocess_exec(
+        _find_chrome(), *args, "about:blank",
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL)
+
+    try:
+        deadline = time.time() + settings.TIMEOUT
+        while not os.path.exists(port_file):
+            if process.returncode is not None or time.time() > deadline:
+                raise HotWalletException("Chrome did not open DevTools port")
+            await asyncio.sleep(0.1)
+
+        await asyncio.sleep(0.1) # let Chrome finish writing the file
+        with open(port_file, "r") as f:
+            port, path = f.read().split()[:2]
+
+        return process, await CdpConnection.connect(f"ws://127.0.0.1:{port}{path}")
+    except BaseException:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+
+
+def _find_chrome() -> str:
+    path = settings.CHROME_PATH or browser_paths.find_chrome()
+    if not path:
+        raise HotWalletException("Chrome executable not found. Set CHROME_PATH.")
+    return path
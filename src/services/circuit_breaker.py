@@ -0,0 +1,89 @@
+from collections import Counter, deque
+from typing import Any, Optional
+
+from src.config import settings
+from src.services import failures
+from src.utils import get_logger
+
+logger = get_logger()
+
+
+class CircuitBreaker:
+    """Stops starting new sessions when most of the recent sessions fail, e.g. when the wallet app is down.
+
+    Failures are classified by the step they happened in (see services.failures). Sessions which have
+    failed only some tasks count as successful: the app works for them. When at least `threshold` of the
+    last `window` sessions have failed, the breaker opens: no new sessions are admitted, sessions already
+    running go on, and a single probe session is started. If the probe succeeds the breaker closes and the
+    run goes on, otherwise the run is aborted and the sessions which have not started are skipped.
+    """
+
+    CLOSED = "closed"
+    PROBING = "probing"
+    ABORTED = "aborted"
+
+    def __init__(self, threshold: float, window: int) -> None:
+        self.threshold = threshold
+        self.window = max(1, window)
+        self.state = self.CLOSED
+        self.recent: deque[Optional[str]] = deque(maxlen=self.window)  # failure class of recent sessions, None - success
+        self.probe: Optional[str] = None  # session name of the probe, once it is admitted
+
+    @classmethod
+    def from_settings(cls) -> "CircuitBreaker":
+        return cls(settings.CIRCUIT_BREAKER_THRESHOLD, settings.CIRCUIT_BREAKER_WINDOW)
+
+    @property
+    def aborted(self) -> bool:
+        return self.state == self.ABORTED
+
+    def allow(self) -> bool:
+        """Whether a new session may be started now."""
+        if self.state == self.CLOSED:
+            return True
+        return self.state == self.PROBING and self.probe is None
+
+    def admitted(self, session: str) -> None:
+        """A new session was started."""
+        if self.state == self.PROBING and self.probe is None:
+            self.probe = session
+            logger.info(f"Circuit breaker: session {session} is the probe.")
+
+    def record(self, session: str, status: Optional[dict[str, Any]], spans: list[dict[str, Any]]) -> None:
+        """Result of a finished session with the step spans it has recorded."""
+        failure = failures.classify(status, spans)
+        if failure == failures.TASK:
+            failure = None
+
+        if self.state == self.PROBING and session == self.probe:
+            self._decide(session, failure)
+            return
+        if self.state != self.CLOSED:
+            return
+
+        self.recent.append(failure)
+        failed = [f for f in self.recent if f]
+        if len(self.recent) == self.window and len(failed) >= self.threshold * self.window:
+            self.state = self.PROBING
+            logger.error(f"Circuit breaker opened: {len(failed)} of the last {self.window} sessions have failed "
+                         f"({_describe(failed)}). No new sessions are started until a probe session succeeds.")
+
+    def _decide(self, session: str, failure: Optional[str]) -> None:
+        if failure:
+            self.state = self.ABORTED
+            logger.error(f"Circuit breaker: probe session {session} has failed ({failure}). "
+                         f"Aborting the run, sessions which have not started are skipped.")
+        else:
+            self.state = self.CLOSED
+            self.recent.clear()
+            logger.success(f"Circuit breaker closed: probe session {session} has succeeded. Resuming the run.")
+        self.probe = None
+
+
+def _describe(failed: list[str]) -> str:
+    return ", ".join(f"{name}: {count}" for name, count in Counter(failed).most_common())
+
+
+def create_circuit_breaker() -> Optional[CircuitBreaker]:
+    """Circuit breaker if enabled in settings, otherwise None."""
+    return CircuitBreaker.from_settings() if settings.CIRCUIT_BREAKER_THRESHOLD > 0 else None
@@ -0,0 +1,97 @@
+import math
+import os
+import time
+from typing import Optional
+
+import psutil
+
+from src.config import settings
+from src.utils import get_logger
+from src.utils.process_utils import get_tree_rss
+
+logger = get_logger()
+
+_MB = 1024 * 1024
+
+
+class AdaptiveConcurrency:
+    """Chooses how many sessions may run at the same time from measured memory.
+
+    Memory of a session is estimated from the RSS of this process tree (workers, chromedriver, Chrome)
+    divided by the number of running sessions. New sessions are admitted while both the free system memory
+    (minus `min_free_memory_mb`) and the memory ceiling leave room for them.
+
+    The limit drops immediately when memory gets short, but grows by at most one session every
+    `ramp_interval` seconds, because a new Chrome needs some time to reach its usual size.
+    """
+
+    def __init__(self,
+                 min_sessions: int,
+                 max_sessions: int,
+                 memory_ceiling_mb: int = 0,
+                 min_free_memory_mb: int = 1024,
+                 initial_session_mb: float = 500,
+                 ramp_interval: float = 5) -> None:
+        self.min_sessions = max(1, min_sessions)
+        self.max_sessions = max(self.min_sessions, max_sessions)
+        self.memory_ceiling_mb = memory_ceiling_mb
+        self.min_free_memory_mb = min_free_memory_mb
+        self.session_mb = initial_session_mb
+        self.ramp_interval = ramp_interval
+
+        self.pid = os.getpid()
+        self.base_mb = get_tree_rss(self.pid) / _MB # this process before any session has started
+        self.current = self.min_sessions
+        self._ramped_at = 0.0
+
+    @classmethod
+    def from_settings(cls) -> "AdaptiveConcurrency":
+        return cls(settings.MIN_ACTIVE_SESSIONS, settings.ACTIVE_SESSIONS, settings.MEMORY_CEILING_MB, settings.MIN_FREE_MEMORY_MB)
+
+    def limit(self, running: int) -> int:
+        """How many sessions may run now, given the number of sessions running (or starting) at the moment."""
+        used_mb = get_tree_rss(self.pid) / _MB
+        available_mb = psutil.virtual_memory().available / _MB
+
+        if running:
+            self.session_mb = max(self.session_mb * 0.5, (used_mb - self.base_mb) / running)
+
+        headroom_mb = available_mb - self.min_free_memory_mb
+        if self.memory_ceiling_mb:
+            headroom_mb = min(headroom_mb, self.memory_ceiling_mb - used_mb)
+
+        target = running + math.floor(headroom_mb / self.session_mb)
+        target = min(self.max_sessions, max(self.min_sessions, target))
+
+        now = time.time()
+        if target > self.current:
+            if now - self._ramped_at < self.ramp_interval:
+                target = self.current
+            else:
+                target = self.current + 1
+                self._ramped_at = now
+
+        if target != self.current:
+            logger.info(f"Concurrency {self.current} -> {target}. Running {running}, memory used {used_mb:.0f} MB, "
+                        f"available {available_mb:.0f} MB, ~{self.session_mb:.0f} MB per session")
+            self.current = target
+
+        return self.current
+
+
+def find_runaway_browsers(browsers: dict[int, int], max_rss_mb: int) -> list[tuple[int, float]]:
+    """Browsers ({key: browser process id}) whose process tree uses more than `max_rss_mb`. Returns (key, MB) pairs."""
+    if not max_rss_mb:
+        return []
+
+    runaway = []
+    for key, pid in browsers.items():
+        rss_mb = get_tree_rss(pid) / _MB
+        if rss_mb > max_rss_mb:
+            runaway.append((key, rss_mb))
+    return runaway
+
+
+def create_concurrency() -> Optional[AdaptiveConcurrency]:
+    """Adaptive concurrency if enabled in settings, otherwise None (fixed ACTIVE_SESSIONS)."""
+    return AdaptiveConcurrency.from_settings() if settings.ADAPTIVE_CONCURRENCY else None
@@ -0,0 +1,46 @@
+from typing import Any, Optional
+
+"""Classes of session failures, by the step a session has failed in.
+
+A failure is classified from the session status (see HotBotBrowser.status) and the step spans
+the session has recorded (see utils.metrics).
+"""
+
+DRIVER = "driver"  # the browser could not be started
+PROXY = "proxy"
+APP_LOAD = "app_load"  # the wallet app or its iframe did not open
+LOGIN = "login"
+TASK = "task"  # the app works, some tasks were not finished
+TIMEOUT = "timeout"  # killed by SESSION_TIMEOUT
+
+_STEP_CLASSES = {
+    "materialize_profile": DRIVER,
+    "setup_driver": DRIVER,
+    "restore_storage_state": DRIVER,
+    "verify_proxy": PROXY,
+    "open_app": APP_LOAD,
+    "open_login_page": APP_LOAD,
+    "open_tasks_page": APP_LOAD,
+}
+
+
+def classify(status: Optional[dict[str, Any]], spans: list[dict[str, Any]]) -> Optional[str]:
+    """Failure class of a finished session, None if it has not failed."""
+    data = next(iter(status.values()), {}) if status else {}
+    if data.get("timeout"):
+        return TIMEOUT
+
+    mission = data.get("Explore crypto") or {}
+    if data.get("login") == "OK":
+        if not mission or mission.get("status") == "OK": # without tasks it is the login stage of a pipeline
+            return None
+        if mission.get("total_tasks"):
+            return TASK
+
+    for span in spans:
+        if not span["ok"] and span["step"] in _STEP_CLASSES:
+            return _STEP_CLASSES[span["step"]]
+
+    if not status:
+        return DRIVER
+    return LOGIN if data.get("login") != "OK" else TASK
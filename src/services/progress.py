@@ -0,0 +1,65 @@
+import time
+from datetime import timedelta
+from typing import Any, Optional
+
+from src.utils import get_logger
+
+logger = get_logger()
+
+
+def is_failed(status: Optional[dict[str, Any]]) -> bool:
+    """Whether a session status (see HotBotBrowser.status) reports an error. None means the session did not run."""
+    if not status:
+        return True
+
+    for result in status.values():
+        if result.get("timeout") or result.get("login") != "OK":
+            return True
+        tasks = result.get("Explore crypto")
+        if tasks and tasks.get("status") != "OK":
+            return True
+
+    return False
+
+
+class Progress:
+    """Counts finished sessions of a run and logs a progress line after each of them."""
+
+    def __init__(self, total: int) -> None:
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.started = time.time()
+
+    @property
+    def finished(self) -> int:
+        return self.done + self.failed
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.total - self.finished)
+
+    @property
+    def sessions_per_hour(self) -> float:
+        elapsed = time.time() - self.started
+        return self.finished / elapsed * 3600 if elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> Optional[timedelta]:
+        if not self.finished:
+            return None
+        seconds_per_session = (time.time() - self.started) / self.finished
+        return timedelta(seconds=int(seconds_per_session * self.remaining))
+
+    def update(self, status: Optional[dict[str, Any]]) -> None:
+        if is_failed(status):
+            self.failed += 1
+        else:
+            self.done += 1
+
+        logger.info(self.line())
+
+    def line(self) -> str:
+        eta = self.eta
+        return (f"Progress: {self.done} done, {self.failed} failed, {self.remaining} remaining out of {self.total}. "
+                f"{self.sessions_per_hour:.1f} sessions/hour, ETA {eta if eta is not None else 'unknown'}")
@@ -2,54 +2,268 @@ from datetime import datetime
 import os
 import json
 import shutil
-from typing import Any
+import sqlite3
+from typing import Any, Optional
 
 from src.utils import get_logger
+from src.utils import metrics
 
 
 PATH = "./output"
+REPORT_FILE = "report.json"
+DATABASE_FILE = "reports.db"
+METRICS_FILE = "metrics.prom"
+METRICS_SUMMARY_FILE = "metrics.json"
 
 logger = get_logger()
 
-def produce_report(data: list[dict[str, Any]]):
-    file_name = f"report.json"
-    file_path = os.path.join(PATH, file_name)
 
-    converted_data = {}
-    for item in data:
-        converted_data.update(item)
+class ReportStore:
+    """Session results stored in SQLite, one row per session per run.
 
-    if not os.path.exists(file_path):
-        logger.info(f"Creating a new report file: {file_path}")
-        _save_to_file(file_path, converted_data)
-        return
+    Every result is committed as soon as it is recorded, so nothing is lost if the process dies
+    before the end of the run. `report.json` is a view of the latest result of every session,
+    regenerated by `export()`.
 
-    _update_existing(file_path, converted_data)
+    A checkpoint per session (last success time, finished and total tasks, mission status) is updated
+    with every result. Runs keep the list of sessions they were started with, so an interrupted run
+    (stopped with Ctrl+C or crashed) can be resumed.
 
+    An existing `report.json` is imported once, when the database is created.
+    """
 
-def _update_existing(file_path: str, new_data: dict[str, Any]):
-    logger.info(f"Updating an existing report file: {file_path}")
+    def __init__(self, path: str = PATH) -> None:
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.database_path = os.path.join(path, DATABASE_FILE)
 
-    with open(file_path, "r") as file:
-        try:
-            existing_data: dict[str, Any] = json.load(file)
-        except json.JSONDecodeError as e:
-            logger.error(f"Reports file {file_path} corrupted. str{e}.")
-            logger.error(f"Copying its content to a new file.")
-            shutil.copy(file_path, f"{file_path}.corrupted")
-            
-            _save_to_file(file_path, new_data)
+        is_new = not os.path.exists(self.database_path)
+        self._connection = sqlite3.connect(self.database_path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        has_checkpoints = self._has_table("checkpoints")
+        self._create_tables()
+
+        if is_new:
+            self._import_report_file()
+        elif not has_checkpoints:
+            self._backfill_checkpoints()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def start_run(self, module: str, sessions: Optional[list[str]] = None) -> int:
+        with self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO runs (module, started_at, sessions) VALUES (?, ?, ?)",
+                (module, _now(), json.dumps(sessions) if sessions is not None else None))
+        return cursor.lastrowid
+
+    def finish_run(self, run_id: int) -> None:
+        with self._connection:
+            self._connection.execute("UPDATE runs SET finished_at = ? WHERE id = ?", (_now(), run_id))
+
+    def record(self, run_id: int, status: Optional[dict[str, Any]]) -> None:
+        """Save a session status ({session_name: data}, as returned by HotBotBrowser.status) in one transaction."""
+        if not status:
             return
 
-        for session_name, session_data in new_data.items():
-            existing_data[session_name] = session_data
-    
-    _save_to_file(file_path, existing_data)
+        recorded_at = _now()
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO results (run_id, session, recorded_at, data) VALUES (?, ?, ?, ?)",
+                [(run_id, session, recorded_at, json.dumps(data)) for session, data in status.items()])
+            for session, data in status.items():
+                self._update_checkpoint(run_id, session, recorded_at, data)
+
+    def checkpoints(self) -> dict[str, dict[str, Any]]:
+        rows = self._connection.execute("""
+            SELECT session, updated_at, last_success_at, mission_status, finished_tasks, total_tasks, run_id
+            FROM checkpoints ORDER BY session
+        """)
+        columns = ["updated_at", "last_success_at", "mission_status", "finished_tasks", "total_tasks", "run"]
+        return {row[0]: dict(zip(columns, row[1:])) for row in rows}
+
+    def finished_today(self) -> set[str]:
+        """Sessions which have finished all tasks since midnight."""
+        today = datetime.now().strftime("%Y-%m-%d")
+        rows = self._connection.execute("SELECT session FROM checkpoints WHERE last_success_at >= ?", (today,))
+        return {session for session, in rows}
+
+    def interrupted_run(self, module: str) -> Optional[tuple[int, list[str]]]:
+        """Latest run of the module if it was not finished: its id and the sessions without a result in it."""
+        row = self._connection.execute(
+            "SELECT id, finished_at, sessions FROM runs WHERE module = ? ORDER BY id DESC LIMIT 1", (module,)).fetchone()
+        if not row or row[1] is not None or row[2] is None:
+            return None
+
+        run_id, _, sessions = row
+        done = {session for session, in self._connection.execute(
+            "SELECT DISTINCT session FROM results WHERE run_id = ?", (run_id,))}
+        return run_id, [session for session in json.loads(sessions) if session not in done]
+
+    def failed_logins(self, module: str) -> set[str]:
+        """Sessions which were run by the module and have never logged in (in any run)."""
+        rows = self._connection.execute("""
+            SELECT session FROM results
+            GROUP BY session
+            HAVING SUM(json_extract(data, '$.login') = 'OK') = 0
+                AND SUM(run_id IN (SELECT id FROM runs WHERE module = ?)) > 0
+        """, (module,))
+        return {session for session, in rows}
+
+    def latest(self) -> dict[str, Any]:
+        """Latest result of every session, sorted by session name."""
+        rows = self._connection.execute("""
+            SELECT session, data FROM results
+            WHERE id IN (SELECT MAX(id) FROM results GROUP BY session)
+            ORDER BY session
+        """)
+        return {session: json.loads(data) for session, data in rows}
+
+    def history(self, session: str) -> list[dict[str, Any]]:
+        """All results of a session, oldest first."""
+        rows = self._connection.execute("""
+            SELECT results.run_id, runs.module, results.recorded_at, results.data FROM results
+            JOIN runs ON runs.id = results.run_id
+            WHERE results.session = ?
+            ORDER BY results.id
+        """, (session,))
+        return [{"run": run_id, "module": module, "date": recorded_at, "result": json.loads(data)}
+                for run_id, module, recorded_at, data in rows]
+
+    def export(self, file_path: Optional[str] = None) -> str:
+        """Write the latest results to report.json. The file is replaced atomically."""
+        file_path = file_path or os.path.join(self.path, REPORT_FILE)
+        _save_to_file(file_path, self.latest())
+        return file_path
+
+    def _create_tables(self) -> None:
+        with self._connection:
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    module TEXT NOT NULL,
+                    started_at TEXT NOT NULL,
+                    finished_at TEXT
+                );
+                CREATE TABLE IF NOT EXISTS results (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    run_id INTEGER NOT NULL REFERENCES runs(id),
+                    session TEXT NOT NULL,
+                    recorded_at TEXT NOT NULL,
+                    data TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS results_session ON results (session, id);
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    session TEXT PRIMARY KEY,
+                    updated_at TEXT NOT NULL,
+                    last_success_at TEXT,
+                    mission_status TEXT,
+                    finished_tasks INTEGER,
+                    total_tasks INTEGER,
+                    run_id INTEGER
+                );
+            """)
+
+            columns = {row[1] for row in self._connection.execute("PRAGMA table_info(runs)")}
+            if "sessions" not in columns: # databases created before runs could be resumed
+                self._connection.execute("ALTER TABLE runs ADD COLUMN sessions TEXT")
+
+    def _has_table(self, name: str) -> bool:
+        row = self._connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone()
+        return row is not None
+
+    def _update_checkpoint(self, run_id: int, session: str, recorded_at: str, data: dict[str, Any]) -> None:
+        mission = data.get("Explore crypto") or {}
+        success = data.get("login") == "OK" and mission.get("status") == "OK" and not data.get("timeout")
+        self._connection.execute("""
+            INSERT INTO checkpoints (session, updated_at, last_success_at, mission_status, finished_tasks, total_tasks, run_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (session) DO UPDATE SET
+                updated_at = excluded.updated_at,
+                last_success_at = COALESCE(excluded.last_success_at, checkpoints.last_success_at),
+                mission_status = excluded.mission_status,
+                finished_tasks = excluded.finished_tasks,
+                total_tasks = excluded.total_tasks,
+                run_id = excluded.run_id
+        """, (session, recorded_at, _mission_date(mission, recorded_at) if success else None,
+              mission.get("status"), mission.get("finished_tasks"), mission.get("total_tasks"), run_id))
+
+    def _backfill_checkpoints(self) -> None:
+        rows = self._connection.execute("SELECT run_id, session, recorded_at, data FROM results ORDER BY id").fetchall()
+        with self._connection:
+            for run_id, session, recorded_at, data in rows:
+                self._update_checkpoint(run_id, session, recorded_at, json.loads(data))
+
+    def _import_report_file(self) -> None:
+        file_path = os.path.join(self.path, REPORT_FILE)
+        if not os.path.exists(file_path):
+            return
+
+        with open(file_path, "r") as file:
+            try:
+                existing_data: dict[str, Any] = json.load(file)
+            except json.JSONDecodeError as e:
+                logger.error(f"Reports file {file_path} corrupted. {e}.")
+                logger.error(f"Copying its content to a new file.")
+                shutil.copy(file_path, f"{file_path}.corrupted")
+                return
+
+        run_id = self.start_run(f"import {REPORT_FILE}")
+        self.record(run_id, existing_data)
+        self.finish_run(run_id)
+        logger.info(f"Imported {len(existing_data)} sessions from {file_path}")
+
+
+def produce_metrics(run_id: int, module: str, spans: list[dict[str, Any]]) -> None:
+    """Write step durations of a run as Prometheus text format and as a JSON summary."""
+    os.makedirs(PATH, exist_ok=True)
+    summary = metrics.summarize(spans)
+
+    sessions: dict[str, dict[str, float]] = {}
+    for span in spans:
+        steps = sessions.setdefault(span["session"], {})
+        steps[span["step"]] = round(steps.get(span["step"], 0) + span["seconds"], 3)
+
+    _write_atomically(os.path.join(PATH, METRICS_FILE), metrics.to_prometheus(summary))
+    _write_atomically(os.path.join(PATH, METRICS_SUMMARY_FILE), json.dumps({
+        "run": run_id,
+        "module": module,
+        "date": _now(),
+        "steps": summary,
+        "sessions": dict(sorted(sessions.items())),
+    }, indent=4))
+
+    for step, s in summary.items():
+        logger.info(f"Step '{step}': count {s['count']}, errors {s['errors']}, p50 {s['p50']}s, p95 {s['p95']}s, max {s['max']}s")
+    logger.success(f"Step metrics saved to {os.path.join(PATH, METRICS_FILE)} and {os.path.join(PATH, METRICS_SUMMARY_FILE)}")
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _mission_date(mission: dict[str, Any], default: str) -> str:
+    """Date of a mission status ('%d-%b-%Y %H:%M', see HotBotBrowser.status) in the database format.
+    Results imported from report.json are recorded long after the mission."""
+    try:
+        return datetime.strptime(mission["date"], "%d-%b-%Y %H:%M").strftime("%Y-%m-%d %H:%M:%S")
+    except (KeyError, TypeError, ValueError):
+        return default
 
 
 def _save_to_file(file_path: str, data: dict[str, Any]):
     sorted_data = dict(sorted(data.items()))
-    
-    with open(file_path, "w") as file:
-        json.dump(sorted_data, file, indent=4)
-        logger.success(f"Report '{file_path}' generated.")
+    _write_atomically(file_path, json.dumps(sorted_data, indent=4))
+    logger.success(f"Report '{file_path}' generated.")
+
+
+def _write_atomically(file_path: str, content: str) -> None:
+    """Readers see either the old or the new file, never a partially written one."""
+    temp_path = f"{file_path}.tmp"
+    with open(temp_path, "w") as file:
+        file.write(content)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, file_path)
@@ -0,0 +1,90 @@
+import time
+from collections import deque
+from typing import Any, Callable, Optional
+
+from src.config import settings
+from src.utils import get_logger
+
+logger = get_logger()
+
+
+class RetryPolicy:
+    """How many times a failed session is retried, by failure class (see services.failures),
+    and how long it waits: `backoff` seconds before the first retry, twice as long before every next one."""
+
+    def __init__(self, limits: dict[str, int], backoff: float) -> None:
+        self.limits = limits
+        self.backoff = backoff
+
+    @classmethod
+    def from_settings(cls) -> "RetryPolicy":
+        return cls(settings.RETRY_LIMITS, settings.RETRY_BACKOFF)
+
+    def delay(self, failure: Optional[str], retries: int) -> Optional[float]:
+        """Seconds to wait before the next attempt, None if the session is not retried."""
+        if not failure or retries >= self.limits.get(failure, 0):
+            return None
+        return self.backoff * 2 ** retries
+
+
+class RetryQueue:
+    """Jobs of failed sessions waiting for their next attempt during a run.
+
+    The final status of a retried session gets `retries` (number of retries) and `failures`
+    (failure class of every failed attempt).
+    """
+
+    def __init__(self, policy: Optional[RetryPolicy], job_name: Callable[[Any], str]) -> None:
+        self.policy = policy
+        self.job_name = job_name
+        self.failures: dict[str, list[str]] = {}  # session name -> failure classes of its failed attempts
+        self.retries: dict[str, int] = {}  # session name -> number of retries
+        self._waiting: deque[tuple[float, Any]] = deque()  # (time of the next attempt, job)
+
+    def __len__(self) -> int:
+        return len(self._waiting)
+
+    def clear(self) -> None:
+        self._waiting.clear()
+
+    def retry(self, job: Any, failure: Optional[str]) -> bool:
+        """Schedule the next attempt of a finished session if it has failed and may be retried.
+        Returns False if it is not retried."""
+        if not failure:
+            return False
+
+        session_name = self.job_name(job)
+        self.failures.setdefault(session_name, []).append(failure)
+        retries = self.retries.get(session_name, 0)
+        delay = self.policy.delay(failure, retries) if self.policy else None
+        if delay is None:
+            return False
+
+        self.retries[session_name] = retries + 1
+        logger.bind(session_name=session_name).warning(
+            f"Session has failed ({failure}). Retry {retries + 1} of {self.policy.limits[failure]} in {delay:.0f} seconds.")
+        self._waiting.append((time.time() + delay, job))
+        return True
+
+    def ready(self) -> list[Any]:
+        """Jobs whose next attempt is due, removed from the queue."""
+        now = time.time()
+        due = [job for ready_at, job in self._waiting if ready_at <= now]
+        self._waiting = deque((ready_at, job) for ready_at, job in self._waiting if ready_at > now)
+        return due
+
+    def annotate(self, job: Any, result: Optional[dict[str, Any]]) -> Optional[dict[str, Any]]:
+        """Final status of a session, with its retries if it was retried."""
+        session_name = self.job_name(job)
+        if not self.retries.get(session_name):
+            return result
+
+        data = dict((result or {}).get(session_name) or {})
+        data["retries"] = self.retries[session_name]
+        data["failures"] = self.failures.get(session_name, [])
+        return {session_name: data}
+
+
+def create_retry_policy() -> Optional[RetryPolicy]:
+    """Retry policy if any failure class may be retried, otherwise None."""
+    return RetryPolicy.from_settings() if any(settings.RETRY_LIMITS.values()) else None
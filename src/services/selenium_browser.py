@@ -1,12 +1,13 @@
-import random
 import json
 import time
-from typing import Optional
+from typing import Any, Callable, Optional
 
 from seleniumwire import webdriver
+from selenium import webdriver as selenium_webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver import ActionChains
 from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.remote.webelement import WebElement
@@ -14,14 +15,22 @@ from selenium.common.exceptions import (
     NoSuchElementException, 
     TimeoutException, 
     StaleElementReferenceException, 
-    ElementClickInterceptedException)
+    ElementClickInterceptedException,
+    JavascriptException)
 from selenium.webdriver.chrome.options import Options
 
 from src.exceptions import HotWalletException
-from src.utils import proxy_utils
+from src.utils import proxy_utils, profile_utils
 from src.config import settings
 from src import utils
 from src.utils.user_agents import get_random_chrome_user_agent
+from src.utils.metrics import timed
+from src.utils.command_tracer import CommandTracer, caller_frame
+from src.services.wait_policy import get_wait_policy
+from src.services import storage_state
+from src.services.browser_scripts import (
+    SNAPSHOT_LIST_JS, FIND_CLICKABLE_JS, TYPE_TEXT_JS, BLOCK_NEW_TABS_JS, call_in_document, call_with_arguments)
+
 
 class SeleniumBrowser:
     def __init__(self, session_path: str, url: str, proxy_url: str = None) -> None:
@@ -35,7 +44,15 @@ class SeleniumBrowser:
         self.proxy_url = proxy_url
 
         self.logger = utils.get_logger(self.session)
-
+        self.wait_policy = get_wait_policy(settings.WAIT_POLICY)
+
+        self._driver = None
+        self._commands_count = 0
+        self._tracer = CommandTracer(self.session) if settings.TRACE_COMMANDS else None
+        self._proxy_forwarder: Optional[utils.ProxyForwarder] = None
+        self.from_storage_state = storage_state.should_restore(session_path)
+        self._profile = profile_utils.open_profile(session_path, fresh=self.from_storage_state)
+        self.user_data_dir = self._materialize_profile() if self._profile else session_path
         self._driver = self._setup_driver()
 
     def success(self, log):
@@ -56,60 +73,115 @@ class SeleniumBrowser:
     def critical(self, log):
         self.logger.critical(log)
 
+    @property
+    def idle_seconds(self) -> float:
+        """Total time spent in waits that are not required by the app itself."""
+        return self.wait_policy.idle_seconds
+
+    @property
+    def pid(self) -> Optional[int]:
+        """Chromedriver process id. Chrome and its helpers are its descendants."""
+        service = getattr(self._driver, "service", None)
+        process = getattr(service, "process", None)
+        return process.pid if process else None
+
+    @property
+    def commands_count(self) -> int:
+        """WebDriver commands sent since the driver was started."""
+        return self._commands_count
+
     def quit(self) -> None:
         if self._driver:
             self._driver.quit()
 
+        if self._tracer:
+            self._tracer.dump()
+
+        if self._proxy_forwarder:
+            self._proxy_forwarder.stop()
+
+        if self._profile:
+            self._profile.persist()
+            self._profile.cleanup()
+
     def refresh(self):
         self._driver.refresh()
 
-    def wait_until_disappears(self, xpath, wait_time = 10, action_description = "") -> bool:
-        if not action_description:
-             action_description = xpath
-
-        wait = WebDriverWait(self._driver, wait_time)
-        target_element = wait.until(EC.invisibility_of_element_located((By.XPATH, xpath)))
-        if target_element:
-            self.debug(f"Element {xpath} is still present.")
-            return False
-        
-        return True
+    def find_visible(self, xpath: str, wait_time: float = 2) -> Optional[WebElement]:
+        """Wait for a visible element without logging or wait policy delays. Returns None if it did not appear.
+        With `wait_time` 0 the page is checked once."""
+        if not wait_time:
+            try:
+                return next((e for e in self._driver.find_elements(By.XPATH, xpath) if e.is_displayed()), None)
+            except StaleElementReferenceException:
+                return None
 
-    def click_element(self, xpath, timeout=30, action_description="") -> bool:
         try:
-            wait = WebDriverWait(self._driver, timeout)
-            element = wait.until(EC.presence_of_element_located((By.XPATH, xpath)))
+            return WebDriverWait(self._driver, wait_time, poll_frequency=0.2).until(
+                EC.visibility_of_element_located((By.XPATH, xpath)))
+        except TimeoutException:
+            return None
+
+    def press_escape(self) -> None:
+        ActionChains(self._driver).send_keys(Keys.ESCAPE).perform()
 
-            action = ActionChains(self._driver)
-            action.move_to_element(element).perform()
-            time.sleep(random.uniform(0.5, 1.5))  # Small delay before clicking
-            element.click()
-            
-            return True
-        
-        except (TimeoutException, NoSuchElementException, ElementClickInterceptedException) as e:
-            self.error(f"'{type(e).__name__}' occured during {action_description}. {str(e)}")
-            return False
-    
     def move_and_click(self, xpath: str, 
                        wait_time: int = 10, 
                        action_description: str = None,
                        log_level: str = "DEBUG") -> Optional[WebElement]:
-        return self.get_element(xpath, wait_time=wait_time, action_description=action_description, click=True, log_level=log_level)
+        """Locate and scroll into view the element with a single script call per attempt, then click it.
 
-    def get_element(self, xpath: str, 
-                    wait_time: int = 10, 
-                    action_description: str = None, 
-                    click: bool = False, 
+        The click is a native WebDriver click, i.e. a trusted mouse event like the Input events of CdpBrowser:
+        the app may ignore synthetic events dispatched by a script.
+        Attempts are repeated until the element is visible, enabled, not covered by another element and clicked.
+        Raises TimeoutException when it does not happen within `wait_time`.
+        """
+        def locate_and_click(driver) -> Optional[WebElement]:
+            element = driver.execute_script(call_in_document(FIND_CLICKABLE_JS), xpath)
+            if element:
+                element.click()
+            return element
+
+        return self._wait_for(locate_and_click, wait_time, action_description or xpath, log_level)
+
+    def type_text(self, xpath: str, text: str,
+                  wait_time: int = 10,
+                  action_description: str = None,
+                  log_level: str = "DEBUG") -> WebElement:
+        """Set the value of an input or textarea (or of the one inside a located label) with a single script call.
+
+        Falls back to send_keys when the located element has no input inside.
+        Raises TimeoutException when the element does not appear within `wait_time`.
+        """
+        result = self._wait_for(lambda d: d.execute_script(call_in_document(TYPE_TEXT_JS), xpath, text),
+                                wait_time, action_description or xpath, log_level)
+        if not result["typed"]:
+            result["element"].send_keys(text)
+        return result["element"]
+
+    def _wait_for(self, attempt: Callable[[Any], Any], wait_time: int, action_description: str, log_level: str) -> Any:
+        """Repeat a script action until it returns a result. Attempts whose element was re-rendered
+        or covered at the moment of the click are repeated too."""
+        self.logger.log(log_level, action_description)
+        self.wait_policy.before_script_action(self._driver)
+
+        ignored = (JavascriptException, StaleElementReferenceException, ElementClickInterceptedException)
+        wait = WebDriverWait(self._driver, wait_time, poll_frequency=0.2, ignored_exceptions=ignored)
+        try:
+            return wait.until(attempt)
+        except TimeoutException:
+            self.debug(f"TimeoutException occured during {action_description}")
+            raise
+
+    def get_element(self, xpath: str,
+                    wait_time: int = 10,
+                    action_description: str = None,
                     log_level="DEBUG") -> Optional[WebElement]:
-        if not self.page_has_loaded():
-            time.sleep(5) # extra delay
-        
         if not action_description:
             action_description = xpath
 
         self.logger.log(log_level, action_description)
-        time.sleep(random.uniform(1, 3)) # random delay
+        self.wait_policy.before_lookup(self._driver)
 
         wait = WebDriverWait(self._driver, wait_time)
         try:
@@ -119,17 +191,7 @@ class SeleniumBrowser:
                 self.debug(f"Element not found for action: {action_description}")
                 return None
 
-            self.scroll_to_element(target_element)
-
-            if click:
-                self.debug(f"click element {xpath}.")
-                if self.click_element(xpath, action_description=action_description):
-                    self.debug(f"Clicked successfully {action_description}")
-                    return target_element
-            else:
-                return target_element
-
-        
+            return target_element
         except (TimeoutException, NoSuchElementException, StaleElementReferenceException) as e:
             self.debug(f"{type(e).__name__} occured during {action_description}")
             raise
@@ -137,6 +199,22 @@ class SeleniumBrowser:
             self.debug(f"{type(e).__name__} occured during {action_description}. {str(e)}")
             raise
 
+    def get_text(self, xpath: str,
+                 wait_time: int = 10,
+                 action_description: str = None,
+                 log_level="DEBUG") -> str:
+        """Text of a visible element. Raises TimeoutException when it does not appear within `wait_time`."""
+        return self.get_element(xpath, wait_time, action_description, log_level=log_level).text
+
+    def snapshot_list(self, container_xpath: str, completed_text: str = "Completed", wait_time: int = 10) -> list[dict[str, Any]]:
+        """Read all child divs of a container with a single script call.
+
+        Returns a list of dicts: index, title (first line of text), text, completed (text contains `completed_text`),
+        handle (xpath which locates the item again) and element (WebElement).
+        """
+        container = self.get_element(container_xpath, wait_time, f"Snapshot of {container_xpath}")
+        return self._driver.execute_script(call_with_arguments(SNAPSHOT_LIST_JS), container, completed_text, True)
+
     def select_iframe(self, xpath) -> bool:
         try:
             wait = WebDriverWait(self._driver, 20)
@@ -165,27 +243,6 @@ class SeleniumBrowser:
             self.error(f"Could not switch to iframe or wait for element. {e}")
             return False
 
-    def scroll_to_element(self, element: WebElement) -> bool:
-        """
-            Scroll element into view if it's not visible. Telegram mini apps have limited size windows.
-            Clicking/selecting an element when it's not in a viewport will not work.
-
-            @returns whether the element is in a viewport or not.
-        """
-
-        is_in_viewport = self._driver.execute_script("""
-            var elem = arguments[0], box = elem.getBoundingClientRect();
-            if (!(box.top >= 0 && box.left >= 0 &&
-                box.bottom <= (window.innerHeight || document.documentElement.clientHeight) &&
-                box.right <= (window.innerWidth || document.documentElement.clientWidth))) {
-                elem.scrollIntoView({block: 'center'});
-                return false;
-            }
-            return true;
-        """, element)
-
-        return is_in_viewport
-    
     def close_tab(self, action_description = None) -> None:
         if not action_description:
             action_description = "Trying to close tab"
@@ -202,6 +259,13 @@ class SeleniumBrowser:
         self._driver.close()
         self._driver.switch_to.window(current_tab)
     
+    def tabs_count(self) -> int:
+        return len(self._driver.window_handles)
+
+    def block_new_tabs(self) -> None:
+        """Links the app opens in a new tab are not loaded at all. Applies to the current frame until it is reloaded."""
+        self._driver.execute_script(f"({BLOCK_NEW_TABS_JS})(window);")
+
     def page_has_loaded(self) -> bool:
         return self._driver.execute_script("return document.readyState;") == "complete"
 
@@ -214,10 +278,17 @@ class SeleniumBrowser:
             self.error(f"Page was not loaded after {wait_time} seconds")
             return False
 
-    def _setup_driver(self) -> webdriver.Chrome:
+    @timed("materialize_profile")
+    def _materialize_profile(self) -> str:
+        return self._profile.materialize()
+
+    @timed("setup_driver")
+    def _setup_driver(self) -> selenium_webdriver.Chrome:
+        native_proxy = settings.PROXY_MODE == "native"
+
         chrome_options = Options()
-        chrome_options = utils.add_default_chrome_options(chrome_options)        
-        chrome_options.add_argument(f"--user-data-dir={self.session_path}")  # Use a specific user data directory
+        chrome_options = utils.add_default_chrome_options(chrome_options, ignore_certificate_errors=not native_proxy)
+        chrome_options.add_argument(f"--user-data-dir={self.user_data_dir}")  # Use a specific user data directory
         chrome_options.add_argument(f"--user-agent={get_random_chrome_user_agent()}")
         chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
         chrome_options.add_experimental_option('useAutomationExtension', False)
@@ -229,22 +300,42 @@ class SeleniumBrowser:
         if settings.HEADLESS:
             chrome_options.add_argument("--headless")  # no UI mode
 
+        if settings.LEAN_MODE:
+            chrome_options = utils.add_lean_chrome_options(chrome_options)
+
         try:
-            self.info(f"Setting up Selenium Chrome Driver. Proxy url: {self.proxy_url}")
-            selenium_wire_options = None if not self.proxy_url else utils.get_selenium_wire_proxy_options(self.proxy_url)
+            self.info(f"Setting up Selenium Chrome Driver. Proxy mode: {settings.PROXY_MODE}. Proxy url: {self.proxy_url}")
       
             if settings.DISABLE_WEBRTC:
                 chrome_options.add_argument(f"--load-extension={settings.WEBRTC_EXTENSION_PATH}")
 
-            if settings.CHROME_DRIVER_PATH:
-                service = Service(settings.CHROME_DRIVER_PATH)
+            service = Service(settings.CHROME_DRIVER_PATH) if settings.CHROME_DRIVER_PATH else None
+
+            if native_proxy:
+                # Chrome connects to the proxy itself, traffic is not intercepted
+                if self.proxy_url:
+                    self._proxy_forwarder = utils.ProxyForwarder(self.proxy_url).start()
+                    chrome_options.add_argument(f"--proxy-server={self._proxy_forwarder.url}")
+
+                self._driver = selenium_webdriver.Chrome(service=service, options=chrome_options)
+            else:
+                selenium_wire_options = {} if not self.proxy_url else utils.get_selenium_wire_proxy_options(self.proxy_url)
+                selenium_wire_options.update(
+                    utils.get_selenium_wire_capture_options(settings.CAPTURE_REQUESTS, settings.CAPTURE_MAX_ENTRIES))
 
                 self._driver = webdriver.Chrome(
                     service=service,
                     seleniumwire_options=selenium_wire_options,
                     options=chrome_options)
-            else:
-                self._driver = webdriver.Chrome(seleniumwire_options=selenium_wire_options, options=chrome_options)
+
+                if settings.CAPTURE_REQUESTS and settings.CAPTURE_SCOPES:
+                    self._driver.scopes = settings.CAPTURE_SCOPES
+
+            self._count_commands()
+
+            if settings.LEAN_MODE:
+                self._driver.execute_cdp_cmd("Network.enable", {})
+                self._driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": utils.LEAN_BLOCKED_URLS})
             
             # Save proxy url to file
             if self.proxy_url:
@@ -263,13 +354,77 @@ class SeleniumBrowser:
             if settings.VERIFY_PROXY:
                 self._verify_proxy()
 
+            if self.from_storage_state:
+                self._restore_storage_state()
+
             self._driver.get(self.start_url)
             return self._driver
         
         except Exception as e:
             self.error(f"ChromeDriver setup failed: {str(e)}")
+            self.quit()
             raise HotWalletException()
 
+    def save_storage_state(self) -> None:
+        """Save localStorage, IndexedDB and cookies of the app to the session's storage_state.json.
+        The page must be on the app origin.
+        """
+        response = self._driver.execute_cdp_cmd("Runtime.evaluate", storage_state.evaluate_params(
+            storage_state.export_expression(), self._app_isolated_world()))
+        cookies = self._driver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]
+
+        state = storage_state.build_state(storage_state.evaluate_result(response), cookies)
+        storage_state.save(self.session_path, state)
+        self.debug(f"Storage state saved: {len(state['localStorage'])} localStorage items, "
+                   f"{len(state['indexedDB'])} databases, {len(state['cookies'])} cookies")
+
+    @timed("restore_storage_state")
+    def _restore_storage_state(self) -> None:
+        state = storage_state.load(self.session_path)
+        script = self._driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument",
+                                              {"source": storage_state.STOP_RESTORE_PAGE_JS})
+        try:
+            self._driver.get(storage_state.restore_url())
+            response = self._driver.execute_cdp_cmd("Runtime.evaluate", storage_state.evaluate_params(
+                storage_state.import_expression(state), self._app_isolated_world()))
+            storage_state.evaluate_result(response)
+        finally:
+            self._driver.execute_cdp_cmd("Page.removeScriptToEvaluateOnNewDocument", {"identifier": script["identifier"]})
+
+        if state["cookies"]:
+            self._driver.execute_cdp_cmd("Network.setCookies", {"cookies": state["cookies"]})
+        self.info(f"Storage state from {state['saved']} restored into a fresh profile")
+
+    def _app_isolated_world(self) -> int:
+        """Execution context with the app origin's storage, separate from the page scripts."""
+        frame = self._driver.execute_cdp_cmd("Page.getFrameTree", {})["frameTree"]["frame"]
+        if frame.get("securityOrigin") != storage_state.app_origin():
+            raise HotWalletException(f"Page is not on the app origin {storage_state.app_origin()}")
+
+        world = self._driver.execute_cdp_cmd("Page.createIsolatedWorld",
+                                             {"frameId": frame["id"], "worldName": storage_state.ISOLATED_WORLD})
+        return world["executionContextId"]
+
+    def _count_commands(self) -> None:
+        """Count every command sent to chromedriver, including the ones sent by WebElements.
+        With TRACE_COMMANDS enabled, every command is also recorded by the tracer."""
+        execute = self._driver.execute
+
+        def counted_execute(driver_command, params=None):
+            self._commands_count += 1
+            if not self._tracer:
+                return execute(driver_command, params)
+
+            site = self._tracer.call_site(caller_frame())
+            started = time.perf_counter()
+            try:
+                return execute(driver_command, params)
+            finally:
+                self._tracer.record(_command_name(driver_command, params), time.perf_counter() - started, site)
+
+        self._driver.execute = counted_execute
+
+    @timed("verify_proxy")
     def _verify_proxy(self) -> bool:
         try:
             if not self.proxy_url:
@@ -316,4 +471,9 @@ class SeleniumBrowser:
             msg = f"Could not disable web rtc. {str(e)}"
             self.critical(msg)
             raise HotWalletException(msg)
-        
\ No newline at end of file
+
+
+def _command_name(driver_command: str, params: Optional[dict]) -> str:
+    if driver_command == "executeCdpCommand" and params:
+        return f"{driver_command}:{params.get('cmd')}"
+    return driver_command
@@ -0,0 +1,577 @@
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+import itertools
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from src.utils import get_logger
+from src.utils import metrics
+from src.utils.process_utils import kill_process_tree, reap_orphaned_browsers
+from src.utils.profile_utils import RUNTIME_PATH
+from src.services.concurrency import AdaptiveConcurrency, find_runaway_browsers
+from src.services.circuit_breaker import CircuitBreaker
+from src.services.retry import RetryPolicy, RetryQueue
+from src.services import failures
+
+logger = get_logger()
+
+_STOP = None  # Sentinel put into the jobs queue to stop a worker
+_DONE = object()  # Sentinel put into the results queue when the event loop has finished
+
+# Messages sent by workers to the parent
+_STARTED = "started"  # (_STARTED, worker pid, session name, browser pid)
+_FINISHED = "finished"  # (_FINISHED, worker pid, result, step spans)
+
+_CHECK_INTERVAL = 1  # seconds between concurrency, memory and deadline checks
+_TIMEOUT_GRACE = 30  # seconds a session has to return after its browser was killed by the deadline
+
+
+class Pipeline:
+    """Sessions which go through stages, each stage with its own limit of sessions in flight.
+
+    `limits` lists the stages in order. `stage(job)` is the name of the stage of a job, `hand_off(job, result)`
+    returns the job of the next stage for a finished session, or None if the session ends there.
+    """
+
+    def __init__(self,
+                 limits: dict[str, int],
+                 stage: Callable[[Any], str],
+                 hand_off: Callable[[Any, Any], Optional[Any]]) -> None:
+        self.limits = limits
+        self.stage = stage
+        self.hand_off = hand_off
+
+    @property
+    def size(self) -> int:
+        return sum(self.limits.values())
+
+    def is_last(self, job: Any) -> bool:
+        return self.stage(job) == list(self.limits)[-1]
+
+
+class _Worker:
+    """Worker process with its own jobs queue. The parent knows which jobs every worker holds."""
+
+    def __init__(self, process: multiprocessing.Process, jobs_queue) -> None:
+        self.process = process
+        self.jobs_queue = jobs_queue
+        self.held: deque = deque()  # jobs given to the worker, the first one is being processed
+        self.current_since = 0.0  # when the first held job became current
+        self.browser: Optional[tuple[str, int]] = None  # (session name, browser pid) of the current job
+        self.expired_at: Optional[float] = None  # when the browser of the current job was killed by the deadline
+        self.stopped = False
+
+    def give(self, job: Any) -> None:
+        if not self.held:
+            self.current_since = time.time()
+        self.held.append(job)
+        self.jobs_queue.put(job)
+
+    def finish(self) -> Any:
+        """Remove the current job. Returns it."""
+        job = self.held.popleft()
+        self.current_since = time.time()
+        self.browser = None
+        self.expired_at = None
+        return job
+
+    def stop(self) -> None:
+        self.jobs_queue.put(_STOP)
+        self.stopped = True
+
+
+class SessionRunner:
+    """Runs sessions in worker processes.
+
+    Every worker takes jobs from its own queue. `launch(job)` starts a browser for the job
+    and `process(job, browser)` does the work and returns the session status.
+    Step spans recorded in workers (see utils.metrics) are sent to this process with the results.
+
+    With `prelaunch` enabled, a worker starts the browser for its next job while the current
+    job is still being processed, so Chrome startup is taken off the critical path.
+    Each worker holds at most one warm browser, so the number of extra Chrome instances
+    is bounded by the number of workers (ACTIVE_SESSIONS).
+
+    Jobs are given to workers by this process. With `concurrency` (AdaptiveConcurrency) the number of
+    sessions in flight (running or prelaunched) follows the measured memory, up to `workers`.
+    Browsers whose process tree grows above `session_max_rss_mb` are killed, so their session fails
+    and the worker moves on to the next one.
+
+    A session which runs longer than `session_timeout` seconds has its browser killed. If the worker
+    does not return within _TIMEOUT_GRACE seconds after that, the worker is killed too and replaced:
+    its prelaunched job goes back to the queue. Either way the session is reported with a timeout.
+
+    With a `breaker` (CircuitBreaker) new sessions are not admitted while it is open. If it aborts the run,
+    jobs which have not been given to workers are skipped and yield no result.
+
+    With a `retry` policy (RetryPolicy) failed sessions are queued again after a backoff, depending on
+    the step they failed in. Only the result of the last attempt is yielded, with the number of retries.
+
+    With a `pipeline` (Pipeline) jobs are admitted only while their stage is under its limit, and every result
+    is followed by the job of the next stage (if any), which goes ahead of the jobs not started yet.
+    Both results are yielded. `workers` should be the size of the pipeline.
+    """
+
+    def __init__(self,
+                 launch: Callable[[Any], Any],
+                 process: Callable[[Any, Any], Any],
+                 workers: int,
+                 prelaunch: bool = True,
+                 concurrency: Optional[AdaptiveConcurrency] = None,
+                 session_max_rss_mb: int = 0,
+                 session_timeout: int = 0,
+                 breaker: Optional[CircuitBreaker] = None,
+                 retry: Optional[RetryPolicy] = None,
+                 pipeline: Optional[Pipeline] = None) -> None:
+        self.launch = launch
+        self.process = process
+        self.workers = max(1, workers)
+        self.prelaunch = prelaunch
+        self.concurrency = concurrency
+        self.session_max_rss_mb = session_max_rss_mb
+        self.session_timeout = session_timeout
+        self.breaker = breaker
+        self.retry = retry
+        self.pipeline = pipeline
+
+    def run(self, jobs: Iterable[Any], on_result: Optional[Callable[[Any], None]] = None) -> list[Any]:
+        """Run all jobs. `on_result` is called in this process with every result as soon as it arrives."""
+        return _collect(self.iter_results(jobs), on_result)
+
+    def iter_results(self, jobs: Iterable[Any]) -> Iterator[Any]:
+        """Run all jobs and yield results in the order sessions finish."""
+        jobs = list(jobs)
+        if not jobs:
+            return
+
+        _reap_orphaned_browsers()
+        pending = deque(jobs)
+        retries = RetryQueue(self.retry, _job_name)
+        results_queue = multiprocessing.Queue()
+
+        mode = "adaptive" if self.concurrency else "fixed"
+        logger.info(f"Starting up to {min(self.workers, len(jobs))} workers ({mode} concurrency). Prelaunch next browser: {self.prelaunch}")
+        workers: dict[int, _Worker] = {}  # worker pid -> worker
+        expected = len(jobs)
+        received = 0
+        checked_at = 0.0
+        try:
+            while received < expected:
+                if time.time() - checked_at >= _CHECK_INTERVAL:
+                    checked_at = time.time()
+                    expected -= _skip_if_aborted(self.breaker, pending, retries)
+                    pending.extend(retries.ready())
+                    self._start_workers(workers, pending, results_queue)
+                    self._admit(pending, workers, more_coming=len(retries) > 0)
+                    _recycle_runaway({pid: w.browser for pid, w in workers.items() if w.browser}, self.session_max_rss_mb)
+                    for job, result in self._enforce_deadline(workers, pending):
+                        if not _retried(self.breaker, retries, job, result, []):
+                            received += 1
+                            expected += _hand_off(self.pipeline, job, result, pending)
+                            yield retries.annotate(job, result)
+
+                try:
+                    kind, pid, *payload = results_queue.get(timeout=_CHECK_INTERVAL)
+                except queue.Empty:
+                    for job, result in _drop_exited(workers, pending):
+                        if not _retried(self.breaker, retries, job, result, []):
+                            received += 1
+                            expected += _hand_off(self.pipeline, job, result, pending)
+                            yield retries.annotate(job, result)
+                    if not workers and not pending and not retries:
+                        if received < expected:
+                            logger.error(f"All workers have exited. {expected - received} sessions did not return a result.")
+                        break
+                    continue
+
+                worker = workers.get(pid)
+                if not worker or not worker.held:
+                    continue  # the worker was killed, its session was already reported
+
+                if kind == _STARTED:
+                    session_name, browser_pid = payload
+                    if browser_pid:
+                        worker.browser = (session_name, browser_pid)
+                    continue
+
+                result, spans = payload
+                if worker.expired_at:
+                    result = _timeout_status(worker.held[0], result, self.session_timeout)
+                job = worker.finish()
+                checked_at = 0.0  # a slot was freed
+                metrics.spans.extend(spans)
+                session_spans = [span for span in spans if span["session"] == _job_name(job)]
+                if not _retried(self.breaker, retries, job, result, session_spans):
+                    received += 1
+                    expected += _hand_off(self.pipeline, job, result, pending)
+                    yield retries.annotate(job, result)
+        finally:
+            for worker in workers.values():
+                worker.process.join(_TIMEOUT_GRACE)
+                if worker.process.is_alive():
+                    kill_process_tree(worker.process.pid)
+            _reap_orphaned_browsers(finished=True)
+
+    def _admit(self, pending: deque, workers: dict[int, "_Worker"], more_coming: bool = False) -> None:
+        capacity = 2 if self.prelaunch else 1  # every worker may hold a warm browser
+        available = [w for w in workers.values() if not w.stopped]
+        held = [job for w in workers.values() for job in w.held]
+        in_flight = len(held)
+        in_stage = Counter(self.pipeline.stage(job) for job in held) if self.pipeline else Counter()
+        if self.pipeline:
+            more_coming = more_coming or not all(self.pipeline.is_last(job) for job in held)
+
+        if self.concurrency:
+            limit = self.concurrency.limit(in_flight)  # every prelaunched browser counts
+        else:
+            limit = self.workers * capacity
+
+        while pending and in_flight < limit and (not self.breaker or self.breaker.allow()):
+            worker = min(available, key=lambda w: len(w.held), default=None)
+            if not worker or len(worker.held) >= capacity:
+                break
+            job = _take(pending, self.pipeline, in_stage)
+            if job is None:
+                break
+            worker.give(job)
+            in_flight += 1
+            if self.breaker:
+                self.breaker.admitted(_job_name(job))
+
+        if not pending and not more_coming:
+            for worker in available:
+                worker.stop()  # after the jobs it holds
+
+    def _start_workers(self, workers: dict[int, "_Worker"], pending: deque, results_queue) -> None:
+        if not pending:
+            return
+
+        busy = [w for w in workers.values() if not w.stopped or w.held]
+        remaining = len(pending) + sum(len(w.held) for w in busy)
+        wanted = min(self.concurrency.current if self.concurrency else self.workers, self.workers, remaining)
+        for _ in range(wanted - len(busy)):
+            jobs_queue = multiprocessing.Queue()
+            p = multiprocessing.Process(
+                target=_worker_loop,
+                args=(jobs_queue, results_queue, self.launch, self.process, self.prelaunch))
+            p.start()
+            workers[p.pid] = _Worker(p, jobs_queue)
+
+    def _enforce_deadline(self, workers: dict[int, "_Worker"], pending: deque) -> list[tuple[Any, Any]]:
+        """Kill browsers of sessions over the deadline, then workers which still do not return.
+        Returns jobs of the killed workers with their timeout results."""
+        if not self.session_timeout:
+            return []
+
+        results = []
+        now = time.time()
+        for pid, worker in list(workers.items()):
+            if not worker.held:
+                continue
+
+            session_name = _job_name(worker.held[0])
+            if worker.expired_at is None and now - worker.current_since > self.session_timeout:
+                logger.bind(session_name=session_name).warning(
+                    f"Session has run for more than {self.session_timeout} seconds (SESSION_TIMEOUT). Killing its browser.")
+                worker.expired_at = now
+                if worker.browser:
+                    kill_process_tree(worker.browser[1])
+                    continue
+
+            if worker.expired_at is not None and (not worker.browser or now - worker.expired_at > _TIMEOUT_GRACE):
+                logger.bind(session_name=session_name).error(f"Worker {pid} is stuck. Killing it and starting a new one.")
+                kill_process_tree(pid)
+                del workers[pid]
+                job = worker.held.popleft()
+                results.append((job, _timeout_status(job, None, self.session_timeout)))
+                pending.extendleft(reversed(worker.held))  # prelaunched jobs are run by another worker
+        return results
+
+
+class AsyncSessionRunner:
+    """Runs sessions as coroutines in a single event loop (CDP backend).
+
+    `launch(job)` and `process(job, browser)` are coroutine functions with the same meaning
+    as in SessionRunner. At most `concurrency` sessions run at the same time,
+    or as many as `adaptive` (AdaptiveConcurrency) allows.
+
+    A session which runs longer than `session_timeout` seconds has its browser killed and is cancelled.
+    If it does not stop within _TIMEOUT_GRACE seconds it is left behind, so it does not hold a slot.
+
+    A `breaker` (CircuitBreaker), a `retry` policy (RetryPolicy) and a `pipeline` (Pipeline) are used
+    as in SessionRunner. With a pipeline `concurrency` should be its size.
+    """
+
+    def __init__(self,
+                 launch: Callable[[Any], Any],
+                 process: Callable[[Any, Any], Any],
+                 concurrency: int,
+                 adaptive: Optional[AdaptiveConcurrency] = None,
+                 session_max_rss_mb: int = 0,
+                 session_timeout: int = 0,
+                 breaker: Optional[CircuitBreaker] = None,
+                 retry: Optional[RetryPolicy] = None,
+                 pipeline: Optional[Pipeline] = None) -> None:
+        self.launch = launch
+        self.process = process
+        self.concurrency = max(1, concurrency)
+        self.adaptive = adaptive
+        self.session_max_rss_mb = session_max_rss_mb
+        self.session_timeout = session_timeout
+        self.breaker = breaker
+        self.retry = retry
+        self.pipeline = pipeline
+
+    def run(self, jobs: Iterable[Any], on_result: Optional[Callable[[Any], None]] = None) -> list[Any]:
+        """Run all jobs. `on_result` is called with every result as soon as its session finishes."""
+        return _collect(self.iter_results(jobs), on_result)
+
+    def iter_results(self, jobs: Iterable[Any]) -> Iterator[Any]:
+        """Run all jobs and yield results in the order sessions finish. Failed sessions yield None.
+
+        The event loop runs in a background thread, so results can be consumed by regular code.
+        """
+        jobs = list(jobs)
+        if not jobs:
+            return
+
+        concurrency = "adaptive" if self.adaptive else self.concurrency
+        logger.info(f"Starting {len(jobs)} sessions in one event loop. Concurrency: {concurrency}")
+        _reap_orphaned_browsers()
+        results_queue = queue.Queue()
+
+        def run_loop():
+            try:
+                asyncio.run(self._run(jobs, results_queue.put))
+            except Exception as e:
+                logger.error(f"Event loop has failed. {type(e).__name__} {e}")
+            finally:
+                results_queue.put(_DONE)
+
+        thread = threading.Thread(target=run_loop, daemon=True)
+        thread.start()
+
+        while (result := results_queue.get()) is not _DONE:
+            yield result
+
+        thread.join()
+        _reap_orphaned_browsers(finished=True)
+
+    async def _run(self, jobs: list[Any], put_result: Callable[[Any], None]) -> None:
+        pending = deque(enumerate(jobs))
+        indexes = itertools.count(len(jobs))  # for jobs of the next pipeline stage
+        retries = RetryQueue(self.retry, lambda entry: _job_name(entry[1]))  # entries are (index, job)
+        in_stage = Counter()  # pipeline stage -> sessions running in it
+        running: set[asyncio.Task] = set()
+        browsers: dict[int, tuple[str, int]] = {}  # job index -> (session name, browser pid)
+
+        async def run_session(index, job):
+            try:
+                browser = await self.launch(job)
+                if getattr(browser, "pid", None):
+                    browsers[index] = (_job_name(job), browser.pid)
+                return await self.process(job, browser)
+            except Exception as e:
+                logger.error(f"Session {_job_name(job)} has failed. {type(e).__name__} {e}")
+                return None
+            finally:
+                browsers.pop(index, None)
+
+        async def run_one(index, job):
+            mark = metrics.spans.mark()
+            session = asyncio.create_task(run_session(index, job))
+            done, _ = await asyncio.wait({session}, timeout=self.session_timeout or None)
+            result = session.result() if done else await self._expire(session, job, browsers.pop(index, None))
+            if not _retried(self.breaker, retries, (index, job), result, metrics.spans.since(mark, _job_name(job))):
+                next_jobs = deque()
+                _hand_off(self.pipeline, job, result, next_jobs)
+                pending.extendleft((next(indexes), next_job) for next_job in next_jobs)
+                put_result(retries.annotate((index, job), result))
+            if self.pipeline:
+                in_stage[self.pipeline.stage(job)] -= 1
+
+        while pending or running or retries:
+            _skip_if_aborted(self.breaker, pending, retries)
+            pending.extend(retries.ready())
+            limit = self.adaptive.limit(len(running)) if self.adaptive else self.concurrency
+            while pending and len(running) < limit and (not self.breaker or self.breaker.allow()):
+                entry = _take(pending, self.pipeline, in_stage, job_of=lambda e: e[1])
+                if entry is None:
+                    break
+                index, job = entry
+                if self.breaker:
+                    self.breaker.admitted(_job_name(job))
+                running.add(asyncio.create_task(run_one(index, job)))
+
+            if not running:
+                await asyncio.sleep(_CHECK_INTERVAL)
+                continue
+            _, running = await asyncio.wait(running, timeout=_CHECK_INTERVAL, return_when=asyncio.FIRST_COMPLETED)
+            _recycle_runaway(browsers, self.session_max_rss_mb)
+
+    async def _expire(self, session: asyncio.Task, job: Any, browser: Optional[tuple[str, int]]) -> dict[str, Any]:
+        """Kill the browser of a session over the deadline and cancel it. Returns its timeout status."""
+        session_logger = logger.bind(session_name=_job_name(job))
+        session_logger.warning(f"Session has run for more than {self.session_timeout} seconds (SESSION_TIMEOUT). Killing its browser.")
+        if browser:
+            kill_process_tree(browser[1])
+
+        session.cancel()
+        done, _ = await asyncio.wait({session}, timeout=_TIMEOUT_GRACE)
+        if not done:
+            session_logger.error(f"Session did not stop in {_TIMEOUT_GRACE} seconds after it was cancelled. Leaving it behind.")
+        return _timeout_status(job, None, self.session_timeout)
+
+
+def _collect(results: Iterator[Any], on_result: Optional[Callable[[Any], None]]) -> list[Any]:
+    collected = []
+    for result in results:
+        collected.append(result)
+        _notify(on_result, result)
+    return collected
+
+
+def _notify(on_result: Optional[Callable[[Any], None]], result: Any) -> None:
+    """Pass a result to the callback. A failing callback must not stop the run."""
+    if not on_result:
+        return
+
+    try:
+        on_result(result)
+    except Exception as e:
+        logger.error(f"Could not handle a session result. {type(e).__name__} {e}")
+
+
+def _job_name(job: Any) -> str:
+    """Jobs are session names or tuples starting with the session name (which may contain secrets)."""
+    return job[0] if isinstance(job, tuple) else str(job)
+
+
+def _recycle_runaway(browsers: dict[Any, tuple[str, int]], max_rss_mb: int) -> None:
+    """Kill browsers which use more memory than allowed. Their sessions fail and are reported as usual."""
+    pids = {key: browser_pid for key, (_, browser_pid) in browsers.items()}
+    for key, rss_mb in find_runaway_browsers(pids, max_rss_mb):
+        session_name, browser_pid = browsers.pop(key)
+        logger.bind(session_name=session_name).warning(
+            f"Browser uses {rss_mb:.0f} MB, more than {max_rss_mb} MB. Recycling it.")
+        kill_process_tree(browser_pid)
+
+
+def _take(pending: deque, pipeline: Optional[Pipeline], in_stage: Counter,
+          job_of: Callable[[Any], Any] = lambda entry: entry) -> Optional[Any]:
+    """Remove and return the next entry to admit: with a pipeline, the first one whose stage is under its limit.
+    `in_stage` counts sessions in flight per stage and is updated."""
+    if not pipeline:
+        return pending.popleft()
+
+    for i, entry in enumerate(pending):
+        stage = pipeline.stage(job_of(entry))
+        if in_stage[stage] < pipeline.limits[stage]:
+            del pending[i]
+            in_stage[stage] += 1
+            return entry
+    return None
+
+
+def _hand_off(pipeline: Optional[Pipeline], job: Any, result: Any, pending: deque) -> int:
+    """Put the job of the next pipeline stage of a finished session ahead of the pending jobs. Returns the number of jobs added."""
+    next_job = pipeline.hand_off(job, result) if pipeline else None
+    if next_job is None:
+        return 0
+
+    pending.appendleft(next_job)
+    return 1
+
+
+def _skip_if_aborted(breaker: Optional[CircuitBreaker], pending: deque, retries: RetryQueue) -> int:
+    """Drop the jobs which have not started (or wait for a retry) if the circuit breaker has aborted the run.
+    Returns their number."""
+    skipped = len(pending) + len(retries)
+    if not breaker or not breaker.aborted or not skipped:
+        return 0
+
+    logger.warning(f"{skipped} sessions are skipped.")
+    pending.clear()
+    retries.clear()
+    return skipped
+
+
+def _retried(breaker: Optional[CircuitBreaker], retries: RetryQueue, job: Any, result: Any, spans: list[dict[str, Any]]) -> bool:
+    """Pass the result of a finished session to the circuit breaker and queue it for a retry if it has failed
+    in a step which is retried. `spans` are the step spans of this session only. Returns True if the result is not final."""
+    session_name = retries.job_name(job)
+    if breaker:
+        breaker.record(session_name, result, spans)
+        if breaker.aborted:
+            return False
+    return retries.retry(job, failures.classify(result, spans))
+
+
+def _timeout_status(job: Any, result: Any, session_timeout: int) -> dict[str, Any]:
+    """Session status with the timeout recorded. Keeps what the session has reported, if anything."""
+    session_name = _job_name(job)
+    data = dict((result or {}).get(session_name) or {})
+    data["timeout"] = session_timeout
+    return {session_name: data}
+
+
+def _drop_exited(workers: dict[int, _Worker], pending: deque) -> list[tuple[Any, Any]]:
+    """Forget workers which have exited. A worker which has crashed fails its current session,
+    its prelaunched jobs go back to the queue."""
+    results = []
+    for pid, worker in list(workers.items()):
+        if worker.process.is_alive():
+            continue
+
+        del workers[pid]
+        if worker.held:
+            job = worker.held.popleft()
+            logger.bind(session_name=_job_name(job)).error(f"Worker {pid} has exited with code {worker.process.exitcode}.")
+            results.append((job, None))
+            pending.extendleft(reversed(worker.held))
+    return results
+
+
+def _reap_orphaned_browsers(finished: bool = False) -> None:
+    """Kill Chrome left behind by killed workers or a previous run (profiles under ./sessions or the runtime path).
+    When the run has `finished`, browsers still owned by this process are left behind too."""
+    owners = (os.getpid(),) if finished else ()
+    killed = reap_orphaned_browsers([os.path.join(os.getcwd(), "sessions"), RUNTIME_PATH], owners)
+    if killed:
+        logger.warning(f"Killed {killed} orphaned browser processes.")
+
+
+def _launch_next(jobs_queue, launch: Callable[[Any], Any]) -> tuple[Any, Any]:
+    job = jobs_queue.get()
+    if job is _STOP:
+        return _STOP, None
+
+    return job, launch(job)
+
+
+def _worker_loop(jobs_queue, results_queue, launch, process, prelaunch: bool) -> None:
+    executor = ThreadPoolExecutor(max_workers=1) if prelaunch else None
+    worker = os.getpid()
+
+    try:
+        job, browser = _launch_next(jobs_queue, launch)
+        while job is not _STOP:
+            next_launch = executor.submit(_launch_next, jobs_queue, launch) if executor else None
+
+            results_queue.put((_STARTED, worker, _job_name(job), getattr(browser, "pid", None)))
+            result = process(job, browser)
+            # step spans of this session go to the parent with the result, those of the prelaunched one stay
+            results_queue.put((_FINISHED, worker, result, metrics.spans.drain(_job_name(job))))
+
+            if next_launch:
+                job, browser = next_launch.result()
+            else:
+                job, browser = _launch_next(jobs_queue, launch)
+    finally:
+        if executor:
+            executor.shutdown(wait=True)
@@ -0,0 +1,208 @@
+import json
+import os
+from datetime import datetime
+from typing import Any, Optional
+from urllib.parse import urlsplit
+
+from src.config import settings
+from src.utils.profile_utils import STORAGE_STATE_FILE
+
+"""Compact snapshot of the wallet's storage: localStorage, IndexedDB and cookies of the HOT app origin.
+
+The app runs in a same-origin iframe of HOT_URL, so everything the wallet keeps is stored for one origin.
+A snapshot is a few KB instead of a whole Chrome profile. Both browser backends read and write it through CDP
+in an isolated world of the top frame, which shares storage with the page but not its scripts.
+"""
+
+# Path which is loaded to get a document of the app origin before the storage is restored
+RESTORE_PATH = "/__hotbot_restore"
+
+ISOLATED_WORLD = "hotbot"
+
+# Added with Page.addScriptToEvaluateOnNewDocument while restoring: the app must not start and write
+# its own state on the restore page.
+STOP_RESTORE_PAGE_JS = """
+if (location.pathname === '%s') window.stop();
+""" % RESTORE_PATH
+
+_ENCODING_JS = """
+const encode = (value) => {
+    if (value instanceof ArrayBuffer) return {__hotbotType: 'ArrayBuffer', data: Array.from(new Uint8Array(value))};
+    if (ArrayBuffer.isView(value)) return {__hotbotType: value.constructor.name, data: Array.from(value)};
+    if (value instanceof Date) return {__hotbotType: 'Date', data: value.getTime()};
+    if (Array.isArray(value)) return value.map(encode);
+    if (value && typeof value === 'object') {
+        const result = {};
+        for (const [k, v] of Object.entries(value)) result[k] = encode(v);
+        return result;
+    }
+    return value;
+};
+const decode = (value) => {
+    if (Array.isArray(value)) return value.map(decode);
+    if (!value || typeof value !== 'object') return value;
+    if (value.__hotbotType === 'ArrayBuffer') return new Uint8Array(value.data).buffer;
+    if (value.__hotbotType === 'Date') return new Date(value.data);
+    if (value.__hotbotType) return new globalThis[value.__hotbotType](value.data);
+    const result = {};
+    for (const [k, v] of Object.entries(value)) result[k] = decode(v);
+    return result;
+};
+const request = (r) => new Promise((resolve, reject) => { r.onsuccess = () => resolve(r.result); r.onerror = () => reject(r.error); });
+"""
+
+# Binary values and Dates are tagged, so they survive JSON.
+_EXPORT_JS = """
+(async function() {
+    %s
+    const local = {};
+    for (let i = 0; i < localStorage.length; i++) {
+        const key = localStorage.key(i);
+        local[key] = localStorage.getItem(key);
+    }
+
+    const databases = [];
+    for (const info of await indexedDB.databases()) {
+        const db = await request(indexedDB.open(info.name));
+        const stores = [];
+        for (const name of db.objectStoreNames) {
+            const store = db.transaction(name, 'readonly').objectStore(name);
+            const [keys, values] = await Promise.all([request(store.getAllKeys()), request(store.getAll())]);
+            stores.push({
+                name: name,
+                keyPath: store.keyPath,
+                autoIncrement: store.autoIncrement,
+                indexes: Array.from(store.indexNames, n => {
+                    const index = store.index(n);
+                    return {name: n, keyPath: index.keyPath, unique: index.unique, multiEntry: index.multiEntry};
+                }),
+                records: keys.map((key, i) => ({key: encode(key), value: encode(values[i])})),
+            });
+        }
+        databases.push({name: db.name, version: db.version, stores: stores});
+        db.close();
+    }
+    return {localStorage: local, indexedDB: databases};
+})()
+""" % _ENCODING_JS
+
+_IMPORT_JS = """
+(async function(state) {
+    %s
+    localStorage.clear();
+    for (const [key, value] of Object.entries(state.localStorage)) localStorage.setItem(key, value);
+
+    for (const database of state.indexedDB) {
+        await request(indexedDB.deleteDatabase(database.name));
+        const open = indexedDB.open(database.name, database.version);
+        open.onupgradeneeded = () => {
+            for (const s of database.stores) {
+                const store = open.result.createObjectStore(s.name, {keyPath: s.keyPath, autoIncrement: s.autoIncrement});
+                for (const i of s.indexes) store.createIndex(i.name, i.keyPath, {unique: i.unique, multiEntry: i.multiEntry});
+            }
+        };
+        const db = await request(open);
+        if (database.stores.length) {
+            const tx = db.transaction(database.stores.map(s => s.name), 'readwrite');
+            for (const s of database.stores) {
+                const store = tx.objectStore(s.name);
+                for (const r of s.records) {
+                    if (store.keyPath === null) store.put(decode(r.value), decode(r.key));
+                    else store.put(decode(r.value));
+                }
+            }
+            await new Promise((resolve, reject) => { tx.oncomplete = resolve; tx.onerror = () => reject(tx.error); });
+        }
+        db.close();
+    }
+    return true;
+})(%s)
+"""
+
+# Fields of Network.getAllCookies results accepted by Network.setCookies
+_COOKIE_FIELDS = ["name", "value", "domain", "path", "secure", "httpOnly", "sameSite", "expires", "priority",
+                  "sourceScheme", "sourcePort"]
+
+
+def app_origin() -> str:
+    url = urlsplit(settings.HOT_URL)
+    return f"{url.scheme}://{url.netloc}"
+
+
+def restore_url() -> str:
+    return app_origin() + RESTORE_PATH
+
+
+def state_path(session_path: str) -> str:
+    return os.path.join(session_path, STORAGE_STATE_FILE)
+
+
+def has_state(session_path: str) -> bool:
+    return os.path.exists(state_path(session_path))
+
+
+def should_restore(session_path: str) -> bool:
+    """Start the session from a fresh profile and restore its snapshot (USE_STORAGE_STATE)."""
+    return settings.USE_STORAGE_STATE and has_state(session_path)
+
+
+def load(session_path: str) -> Optional[dict[str, Any]]:
+    try:
+        with open(state_path(session_path), "r") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def save(session_path: str, state: dict[str, Any]) -> None:
+    os.makedirs(session_path, exist_ok=True)
+    path = state_path(session_path)
+    with open(f"{path}.tmp", "w") as file:
+        json.dump(state, file)
+    os.replace(f"{path}.tmp", path)
+
+
+def export_expression() -> str:
+    return _EXPORT_JS
+
+
+def import_expression(state: dict[str, Any]) -> str:
+    storage = {"localStorage": state.get("localStorage", {}), "indexedDB": state.get("indexedDB", [])}
+    return _IMPORT_JS % (_ENCODING_JS, json.dumps(storage))
+
+
+def evaluate_params(expression: str, context_id: int) -> dict[str, Any]:
+    return {"expression": expression, "contextId": context_id, "awaitPromise": True, "returnByValue": True}
+
+
+def evaluate_result(response: dict[str, Any]) -> Any:
+    """Value of a Runtime.evaluate response. Raises RuntimeError if the script has thrown."""
+    if "exceptionDetails" in response:
+        details = response["exceptionDetails"]
+        description = details.get("exception", {}).get("description") or details.get("text")
+        raise RuntimeError(f"Storage script failed: {description}")
+    return response.get("result", {}).get("value")
+
+
+def app_cookies(cookies: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Cookies of the app host (including parent domain cookies), in the format of Network.setCookies."""
+    host = urlsplit(settings.HOT_URL).hostname or ""
+    result = []
+    for cookie in cookies:
+        domain = cookie.get("domain", "").lstrip(".")
+        if domain and (host == domain or host.endswith("." + domain)):
+            params = {k: cookie[k] for k in _COOKIE_FIELDS if k in cookie}
+            if cookie.get("session") or params.get("expires", -1) < 0:
+                params.pop("expires", None)
+            result.append(params)
+    return result
+
+
+def build_state(storage: dict[str, Any], cookies: list[dict[str, Any]]) -> dict[str, Any]:
+    return {
+        "origin": app_origin(),
+        "saved": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "cookies": app_cookies(cookies),
+        "localStorage": storage.get("localStorage", {}),
+        "indexedDB": storage.get("indexedDB", []),
+    }
@@ -0,0 +1,78 @@
+import random
+import time
+
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
+
+
+class WaitPolicy:
+    """Decides how SeleniumBrowser waits before element lookups, clicks and typing.
+
+    All time spent inside the policy is accumulated in `idle_seconds`.
+    """
+    name = ""
+
+    def __init__(self) -> None:
+        self.idle_seconds = 0.0
+
+    def before_lookup(self, driver) -> None:
+        pass
+
+    def before_script_action(self, driver) -> None:
+        """Before a click or typing done by a script, which checks the element itself."""
+        self.before_lookup(driver)
+
+    def _sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+        self.idle_seconds += seconds
+
+    def _wait(self, driver, timeout: float, condition) -> bool:
+        started = time.time()
+        try:
+            WebDriverWait(driver, timeout, poll_frequency=0.2).until(condition)
+            return True
+        except TimeoutException:
+            return False
+        finally:
+            self.idle_seconds += time.time() - started
+
+
+class FixedWaitPolicy(WaitPolicy):
+    """Random and fixed delays, the original behaviour."""
+    name = "fixed"
+
+    def before_lookup(self, driver) -> None:
+        if not _page_has_loaded(driver):
+            self._sleep(5) # extra delay
+
+        self._sleep(random.uniform(1, 3)) # random delay
+
+    def before_script_action(self, driver) -> None:
+        self.before_lookup(driver)
+        self._sleep(random.uniform(0.5, 1.5)) # Small delay before clicking
+
+
+class ConditionWaitPolicy(WaitPolicy):
+    """Waits only until the DOM is ready. Clicks and typing wait for the element themselves."""
+    name = "condition"
+
+    def before_lookup(self, driver) -> None:
+        if not _page_has_loaded(driver):
+            self._wait(driver, 5, _page_has_loaded)
+
+
+_POLICIES = {
+    FixedWaitPolicy.name: FixedWaitPolicy,
+    ConditionWaitPolicy.name: ConditionWaitPolicy,
+}
+
+
+def get_wait_policy(name: str) -> WaitPolicy:
+    if name not in _POLICIES:
+        raise ValueError(f"Unknown wait policy '{name}'. Available: {', '.join(_POLICIES)}")
+
+    return _POLICIES[name]()
+
+
+def _page_has_loaded(driver) -> bool:
+    return driver.execute_script("return document.readyState;") == "complete"
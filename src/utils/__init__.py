@@ -1,4 +1,10 @@
 from .logger import get_logger
 from .browser_utils import add_default_chrome_options
+from .browser_utils import DEFAULT_CHROME_ARGUMENTS
+from .browser_utils import add_lean_chrome_options
+from .browser_utils import LEAN_CHROME_ARGUMENTS
+from .browser_utils import LEAN_BLOCKED_URLS
 from .browser_utils import get_selenium_wire_proxy_options
-from . import proxy_utils
\ No newline at end of file
+from .browser_utils import get_selenium_wire_capture_options
+from . import proxy_utils
+from .proxy_forwarder import ProxyForwarder
\ No newline at end of file
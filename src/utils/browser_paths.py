@@ -0,0 +1,122 @@
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+from datetime import datetime
+from typing import Any, Optional
+
+import selenium
+from selenium.webdriver.common.selenium_manager import SeleniumManager
+
+from src.config import settings
+from src.utils.logger import get_logger
+
+logger = get_logger()
+
+"""Chrome and chromedriver are resolved once per run, in the parent process.
+
+Without CHROME_DRIVER_PATH every webdriver.Chrome(...) runs Selenium Manager, which looks up (and may download)
+a matching driver. Resolved paths are cached on disk under a key made of the platform, the Chrome version
+and the Selenium version, and are passed to workers through settings and environment variables.
+"""
+
+CACHE_FILE = "./output/browser_paths.json"
+
+_CHROME_NAMES = ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome")
+
+
+def resolve_browser_paths() -> Optional[tuple[str, str]]:
+    """Paths of chromedriver and Chrome, from settings, the cache or Selenium Manager. None if they can't be resolved."""
+    browser_path = settings.CHROME_PATH or find_chrome()
+    browser_version = _binary_version(browser_path) if browser_path else None
+
+    if settings.CHROME_DRIVER_PATH and browser_path:
+        _check_versions(settings.CHROME_DRIVER_PATH, browser_version)
+        return settings.CHROME_DRIVER_PATH, browser_path
+
+    key = f"{platform.system()}-{platform.machine()}-chrome-{browser_version}-selenium-{selenium.__version__}"
+    cache = _load_cache()
+    cached = cache.get(key)
+    if browser_version and cached and os.path.exists(cached["driver_path"]) and os.path.exists(cached["browser_path"]):
+        return cached["driver_path"], cached["browser_path"]
+
+    args = ["--browser", "chrome"]
+    if browser_path:
+        args += ["--browser-path", browser_path]
+    try:
+        result = SeleniumManager().binary_paths(args)
+    except Exception as e:
+        logger.warning(f"Could not resolve chromedriver, it will be looked up for every session. {type(e).__name__} {e}")
+        return None
+
+    driver_path = settings.CHROME_DRIVER_PATH or result["driver_path"]
+    browser_path = result.get("browser_path") or browser_path
+    browser_version = browser_version or _binary_version(browser_path)
+    _check_versions(driver_path, browser_version)
+
+    key = f"{platform.system()}-{platform.machine()}-chrome-{browser_version}-selenium-{selenium.__version__}"
+    cache[key] = {
+        "driver_path": driver_path,
+        "browser_path": browser_path,
+        "driver_version": _binary_version(driver_path),
+        "resolved": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    _save_cache(cache)
+    logger.info(f"Resolved chromedriver {driver_path} for Chrome {browser_version} ({browser_path})")
+    return driver_path, browser_path
+
+
+def use_resolved_browser_paths() -> None:
+    """Resolve chromedriver and Chrome and make workers (including spawned processes) use them."""
+    paths = resolve_browser_paths()
+    if not paths:
+        return
+
+    for key, value in zip(("CHROME_DRIVER_PATH", "CHROME_PATH"), paths):
+        setattr(settings, key, value)
+        os.environ[key] = value
+
+
+def find_chrome() -> Optional[str]:
+    """Chrome (or Chromium) executable on PATH, None if there is none."""
+    for name in _CHROME_NAMES:
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+
+def _binary_version(path: Optional[str]) -> Optional[str]:
+    """Version printed by `<binary> --version`, e.g. '129.0.6668.70'."""
+    if not path:
+        return None
+    try:
+        output = subprocess.run([path, "--version"], capture_output=True, text=True, timeout=30).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+    match = re.search(r"\d+\.\d+\.\d+\.\d+", output)
+    return match.group(0) if match else None
+
+
+def _check_versions(driver_path: str, browser_version: Optional[str]) -> None:
+    driver_version = _binary_version(driver_path)
+    if driver_version and browser_version and driver_version.split(".")[0] != browser_version.split(".")[0]:
+        logger.warning(f"chromedriver {driver_version} ({driver_path}) does not match Chrome {browser_version}")
+
+
+def _load_cache() -> dict[str, Any]:
+    try:
+        with open(CACHE_FILE, "r") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_cache(cache: dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+    with open(f"{CACHE_FILE}.tmp", "w") as file:
+        json.dump(cache, file, indent=4)
+    os.replace(f"{CACHE_FILE}.tmp", CACHE_FILE)
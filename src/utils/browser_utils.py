@@ -1,13 +1,72 @@
+from typing import Any
+
 from selenium.webdriver.chromium.options import ChromiumOptions
 
-def add_default_chrome_options(chrome_options: ChromiumOptions) -> ChromiumOptions:
-    chrome_options.add_argument("--no-sandbox")  # disables the sandbox for Chrome
-    chrome_options.add_argument("--disable-dev-shm-usage")  # disables the use of /dev/shm, useful for Docker
-    chrome_options.add_argument('--log-level=1')  # log only WARNING level logs and above
-    chrome_options.add_argument("--disable-blink-features=AutomationControlled") # Prevents detection of Selenium
-    chrome_options.add_argument("--ignore-certificate-errors") # disables SSL certificate warnings
-    chrome_options.add_argument("--allow-running-insecure-content") #  allows HTTP content on HTTPS pages
-    chrome_options.add_argument("--test-type") # bypass unnecessary warnings
+DEFAULT_CHROME_ARGUMENTS = [
+    "--no-sandbox",  # disables the sandbox for Chrome
+    "--disable-dev-shm-usage",  # disables the use of /dev/shm, useful for Docker
+    '--log-level=1',  # log only WARNING level logs and above
+    "--disable-blink-features=AutomationControlled", # Prevents detection of Selenium
+    "--allow-running-insecure-content", #  allows HTTP content on HTTPS pages
+    "--test-type", # bypass unnecessary warnings
+]
+
+# LEAN_MODE: the bot only needs DOM text and buttons
+LEAN_CHROME_ARGUMENTS = [
+    "--blink-settings=imagesEnabled=false",
+    "--autoplay-policy=user-gesture-required", # videos are not played
+    "--mute-audio",
+    "--disable-gpu",
+    "--disable-background-networking", # no update checks, safe browsing downloads, etc.
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-domain-reliability",
+    "--disable-client-side-phishing-detection",
+    "--disable-breakpad",
+    "--no-pings",
+    "--metrics-recording-only",
+    # site isolation stays on: the wallet origin holds the seed phrase and must not share a renderer with other sites
+    "--disable-features=Translate,OptimizationHints,MediaRouter,InterestFeedContentSuggestions",
+    "--renderer-process-limit=2", # fewer renderer processes, most of the memory of a session
+]
+
+_LEAN_BLOCKED_EXTENSIONS = [
+    "png", "jpg", "jpeg", "gif", "webp", "avif", "ico",
+    "woff", "woff2", "ttf", "otf",
+    "mp4", "webm", "m3u8", "mp3",
+]
+_LEAN_BLOCKED_HOSTS = [
+    "googlevideo.com", "ytimg.com",
+    "google-analytics.com", "analytics.google.com", "googletagmanager.com", "doubleclick.net",
+    "sentry.io", "mixpanel.com", "amplitude.com", "segment.io",
+]
+
+# Blocked with Network.setBlockedURLs ('*' matches any characters). Extensions are matched at the end of the path
+# and hosts with their subdomains, so that app urls which only contain these words are not blocked.
+LEAN_BLOCKED_URLS = (
+    [pattern for ext in _LEAN_BLOCKED_EXTENSIONS for pattern in (f"*.{ext}", f"*.{ext}?*")]
+    + [pattern for host in _LEAN_BLOCKED_HOSTS for pattern in (f"*://{host}/*", f"*://*.{host}/*")]
+)
+
+LEAN_CHROME_PREFS = {
+    "profile.managed_default_content_settings.images": 2,
+    "profile.managed_default_content_settings.media_stream": 2,
+}
+
+def add_default_chrome_options(chrome_options: ChromiumOptions, ignore_certificate_errors: bool = True) -> ChromiumOptions:
+    for argument in DEFAULT_CHROME_ARGUMENTS:
+        chrome_options.add_argument(argument)
+
+    if ignore_certificate_errors:
+        chrome_options.add_argument("--ignore-certificate-errors") # disables SSL certificate warnings (selenium-wire certificates)
+    return chrome_options
+
+def add_lean_chrome_options(chrome_options: ChromiumOptions) -> ChromiumOptions:
+    for argument in LEAN_CHROME_ARGUMENTS:
+        chrome_options.add_argument(argument)
+
+    chrome_options.add_experimental_option("prefs", LEAN_CHROME_PREFS)
     return chrome_options
 
 def get_selenium_wire_proxy_options(proxy_url: str) -> dict[str, dict[str, str]]:
@@ -19,4 +78,19 @@ def get_selenium_wire_proxy_options(proxy_url: str) -> dict[str, dict[str, str]]
     }
 
     return seleniumwire_options
-                
\ No newline at end of file
+
+def get_selenium_wire_capture_options(capture: bool, max_entries: int) -> dict[str, Any]:
+    """Selenium Wire stores every request and response by default. Nothing reads them, so capture is off unless enabled.
+
+    max_entries = 0 keeps Selenium Wire's own unbounded disk storage.
+    """
+    if not capture:
+        return {"disable_capture": True}
+
+    if max_entries <= 0:
+        return {}
+
+    return {
+        "request_storage": "memory",
+        "request_storage_max_size": max_entries,
+    }
@@ -0,0 +1,113 @@
+import json
+import os
+import sys
+from collections import Counter
+from datetime import datetime
+from types import FrameType
+from typing import Any, Optional
+
+from src.utils import metrics
+from src.utils.logger import get_logger
+
+logger = get_logger()
+
+PATH = "./output/traces"
+
+_SOURCE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) # ./src
+_BOT_CLASS = "HotBotFlows"
+
+
+class CommandTracer:
+    """Records every command sent to the browser (WebDriver or DevTools) of one session.
+
+    For each command: name, latency, the bot method (see HotBotFlows) it was sent from and the Python call stack
+    inside ./src. `dump()` writes a histogram per command and per bot method (JSON) and a collapsed-stack file
+    (one `frame;frame;command microseconds` line per stack) which can be rendered with flamegraph.pl, speedscope, etc.
+    """
+
+    def __init__(self, session: str) -> None:
+        self.session = session
+        self.started = datetime.now()
+        self._records: list[dict[str, Any]] = []
+        self._stacks: Counter[str] = Counter()
+
+    @staticmethod
+    def call_site(frame: Optional[FrameType]) -> tuple[str, tuple[str, ...]]:
+        """Bot method and project stack (outermost first) of the code that sent a command.
+
+        Called before the command is sent, so the frame is not kept alive while waiting for the response.
+        """
+        method = "-"
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            if code.co_filename.startswith(_SOURCE_DIR):
+                stack.append(code.co_qualname)
+                owner = frame.f_locals.get("self")
+                if method == "-" and owner is not None and _is_bot(owner):
+                    method = code.co_name
+            frame = frame.f_back
+
+        return method, tuple(reversed(stack))
+
+    def record(self, command: str, seconds: float, site: tuple[str, tuple[str, ...]]) -> None:
+        method, stack = site
+        self._records.append({"command": command, "method": method, "seconds": seconds})
+        self._stacks[";".join(stack + (command,))] += int(seconds * 1_000_000)
+
+    def histogram(self) -> dict[str, Any]:
+        return {
+            "session": self.session,
+            "started": self.started.strftime("%Y-%m-%d %H:%M:%S"),
+            "commands": len(self._records),
+            "total_seconds": round(sum(r["seconds"] for r in self._records), 3),
+            "by_command": _group(self._records, "command"),
+            "by_method": _group(self._records, "method"),
+        }
+
+    def collapsed_stacks(self) -> list[str]:
+        return [f"{stack} {microseconds}" for stack, microseconds in sorted(self._stacks.items())]
+
+    def dump(self) -> Optional[str]:
+        """Write the histogram and the collapsed stacks to ./output/traces. Returns the path without extension."""
+        if not self._records:
+            return None
+
+        os.makedirs(PATH, exist_ok=True)
+        base_path = os.path.join(PATH, f"{self.session}-{self.started.strftime('%Y%m%d-%H%M%S')}")
+
+        histogram = self.histogram()
+        with open(f"{base_path}.json", "w") as file:
+            json.dump(histogram, file, indent=4)
+        with open(f"{base_path}.folded", "w") as file:
+            file.write("\n".join(self.collapsed_stacks()) + "\n")
+
+        logger.bind(session_name=self.session).info(
+            f"{histogram['commands']} browser commands took {histogram['total_seconds']}s. Trace saved to {base_path}.json/.folded")
+        return base_path
+
+
+def caller_frame() -> Optional[FrameType]:
+    """Frame of the code which called the function that calls this one."""
+    return sys._getframe(2)
+
+
+def _is_bot(owner: Any) -> bool:
+    return any(cls.__name__ == _BOT_CLASS for cls in type(owner).__mro__)
+
+
+def _group(records: list[dict[str, Any]], key: str) -> dict[str, dict[str, Any]]:
+    groups: dict[str, list[float]] = {}
+    for r in records:
+        groups.setdefault(r[key], []).append(r["seconds"] * 1000)
+
+    result = {}
+    for name, latencies in sorted(groups.items(), key=lambda item: -sum(item[1])):
+        result[name] = {
+            "count": len(latencies),
+            "total_ms": round(sum(latencies), 1),
+            "p50_ms": round(metrics.percentile(latencies, 0.5), 1),
+            "p95_ms": round(metrics.percentile(latencies, 0.95), 1),
+            "max_ms": round(max(latencies), 1),
+        }
+    return result
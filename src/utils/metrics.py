@@ -0,0 +1,138 @@
+import asyncio
+import functools
+import threading
+import time
+from typing import Any, Optional
+
+
+class SpanCollector:
+    """Durations of session steps recorded in this process.
+
+    Worker processes drain the spans of every finished session and send them to the parent,
+    which collects the spans of the whole run. Spans of a session being prelaunched stay until it finishes.
+    """
+
+    def __init__(self) -> None:
+        self._spans: list[dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, session: str, step: str, seconds: float, ok: bool = True) -> None:
+        with self._lock:
+            self._spans.append({"session": session, "step": step, "seconds": seconds, "ok": ok})
+
+    def extend(self, spans: list[dict[str, Any]]) -> None:
+        with self._lock:
+            self._spans.extend(spans)
+
+    def drain(self, session: Optional[str] = None) -> list[dict[str, Any]]:
+        """Remove and return the recorded spans, only those of `session` if given."""
+        with self._lock:
+            if session is None:
+                spans, self._spans = self._spans, []
+            else:
+                spans = [span for span in self._spans if span["session"] == session]
+                self._spans = [span for span in self._spans if span["session"] != session]
+        return spans
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return list(self._spans)
+
+    def mark(self) -> int:
+        """Position to read spans of one session from, see `since`."""
+        with self._lock:
+            return len(self._spans)
+
+    def since(self, mark: int, session: str) -> list[dict[str, Any]]:
+        """Spans of a session recorded after `mark`, while other sessions were recording theirs."""
+        with self._lock:
+            return [span for span in self._spans[mark:] if span["session"] == session]
+
+
+spans = SpanCollector()
+
+
+def timed(step: str):
+    """Record the duration of a browser method as a span of `self.session`.
+
+    Works for both regular methods and coroutines. Failed calls are recorded with ok=False.
+    """
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(self, *args, **kwargs):
+                started, ok = time.perf_counter(), False
+                try:
+                    result = await func(self, *args, **kwargs)
+                    ok = True
+                    return result
+                finally:
+                    spans.add(self.session, step, time.perf_counter() - started, ok)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            started, ok = time.perf_counter(), False
+            try:
+                result = func(self, *args, **kwargs)
+                ok = True
+                return result
+            finally:
+                spans.add(self.session, step, time.perf_counter() - started, ok)
+        return wrapper
+    return decorator
+
+
+def percentile(values: list[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile, `q` between 0 and 1."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 1)) # ceil
+    return ordered[int(rank) - 1]
+
+
+def summarize(recorded: list[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    """Per step: count, errors, total, p50, p95 and max duration in seconds."""
+    by_step: dict[str, list[dict[str, Any]]] = {}
+    for span in recorded:
+        by_step.setdefault(span["step"], []).append(span)
+
+    summary = {}
+    for step, step_spans in sorted(by_step.items()):
+        durations = [s["seconds"] for s in step_spans]
+        summary[step] = {
+            "count": len(durations),
+            "errors": sum(1 for s in step_spans if not s["ok"]),
+            "total": round(sum(durations), 3),
+            "p50": round(percentile(durations, 0.5), 3),
+            "p95": round(percentile(durations, 0.95), 3),
+            "max": round(max(durations), 3),
+        }
+    return summary
+
+
+def to_prometheus(summary: dict[str, dict[str, Any]], prefix: str = "hotbot_step") -> str:
+    """Prometheus text exposition format of a `summarize` result."""
+    lines = [
+        f"# HELP {prefix}_seconds Duration of session steps in the last run.",
+        f"# TYPE {prefix}_seconds summary",
+    ]
+    for step, s in summary.items():
+        lines.append(f'{prefix}_seconds{{step="{step}",quantile="0.5"}} {s["p50"]}')
+        lines.append(f'{prefix}_seconds{{step="{step}",quantile="0.95"}} {s["p95"]}')
+        lines.append(f'{prefix}_seconds_sum{{step="{step}"}} {s["total"]}')
+        lines.append(f'{prefix}_seconds_count{{step="{step}"}} {s["count"]}')
+
+    lines += [
+        f"# HELP {prefix}_max_seconds Longest duration of session steps in the last run.",
+        f"# TYPE {prefix}_max_seconds gauge",
+    ]
+    lines += [f'{prefix}_max_seconds{{step="{step}"}} {s["max"]}' for step, s in summary.items()]
+
+    lines += [
+        f"# HELP {prefix}_errors Failed session steps in the last run.",
+        f"# TYPE {prefix}_errors gauge",
+    ]
+    lines += [f'{prefix}_errors{{step="{step}"}} {s["errors"]}' for step, s in summary.items()]
+    return "\n".join(lines) + "\n"
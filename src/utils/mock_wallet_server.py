@@ -0,0 +1,246 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from src.utils.logger import get_logger
+
+logger = get_logger()
+
+# Telegram page which embeds the mini app, like https://my.herewallet.app/hot
+_HOST_PAGE = """<!DOCTYPE html>
+<html>
+<head><title>HOT (mock)</title><script src="/static/analytics.js"></script></head>
+<body style="margin: 0">
+    <div>Open Wallet</div>
+    <iframe src='/' style="width: 420px; height: 900px; border: 0"></iframe>
+</body>
+</html>
+"""
+
+_VIDEO_PAGE = """<!DOCTYPE html>
+<html><head><title>Video (mock)</title></head>
+<body><p>Video</p><img src="/static/thumbnail.jpg"><video src="/static/video.mp4" autoplay muted></video></body></html>
+"""
+
+# Heavy resources like the real pages have: path -> (content type, size in bytes)
+_STATIC_FILES = {
+    "/static/banner.png": ("image/png", 300_000),
+    "/static/thumbnail.jpg": ("image/jpeg", 150_000),
+    "/static/font.woff2": ("font/woff2", 100_000),
+    "/static/video.mp4": ("video/mp4", 2_000_000),
+    "/static/analytics.js": ("application/javascript", 50_000),
+}
+
+# The mini app. Login state is kept in localStorage, so it survives browser restarts like a real session.
+# Completed tasks are kept in sessionStorage, so every browser start has the same tasks to solve.
+_APP_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<title>HOT Wallet (mock)</title>
+<style>
+    @font-face { font-family: 'Wallet'; src: url('/static/font.woff2') format('woff2'); }
+    body { font-family: 'Wallet', sans-serif; margin: 0; }
+    #modal { position: fixed; inset: 0; background: rgba(0, 0, 0, 0.4); }
+    #modal > div { position: absolute; left: 0; right: 0; bottom: 0; background: white; padding: 16px; }
+    .task { padding: 12px; margin: 4px 0; border: 1px solid #ddd; cursor: pointer; }
+</style>
+</head>
+<body>
+<img src="/static/banner.png" width="1" height="1">
+<div id="app"></div>
+<script>
+const CONFIG = __CONFIG__;
+const state = {screen: localStorage.getItem('loggedIn') ? 'home' : 'login', expanded: false, task: null, modal: null};
+
+function completed() { return JSON.parse(sessionStorage.getItem('completed') || '[]'); }
+function complete(title) { sessionStorage.setItem('completed', JSON.stringify(completed().concat([title]))); }
+
+function go(changes) {
+    document.getElementById('app').innerHTML = '<p>Loading...</p>';
+    setTimeout(() => { Object.assign(state, changes); render(); }, CONFIG.uiDelay);
+}
+
+function el(tag, attrs, children) {
+    const e = document.createElement(tag);
+    for (const [k, v] of Object.entries(attrs || {})) {
+        if (k === 'onclick') e.onclick = v; else e.setAttribute(k, v);
+    }
+    for (const c of [].concat(children || [])) e.append(c);
+    return e;
+}
+
+function screen() {
+    switch (state.screen) {
+    case 'login':
+        return [el('h1', {}, 'HOT Wallet'),
+                el('button', {onclick: () => go({screen: 'import'})}, el('p', {}, 'Import account'))];
+    case 'import': {
+        const seed = el('textarea', {rows: 4});
+        return [el('div', {}, [el('p', {}, 'Seed or private key'), seed]),
+                el('button', {onclick: () => { if (seed.value.trim()) go({screen: 'select'}); }}, 'Continue')];
+    }
+    case 'select':
+        return [el('h3', {}, 'Select account'), el('p', {}, 'mock.tg'),
+                el('button', {onclick: () => { localStorage.setItem('loggedIn', '1'); go({screen: 'home'}); }}, 'Continue')];
+    case 'home':
+        return [el('div', {class: 'task', onclick: () => go({screen: 'balance'})}, el('h4', {}, 'HOT Balance')),
+                el('div', {class: 'task'}, el('h4', {}, 'Storage'))];
+    case 'balance':
+        return [el('h4', {}, 'HOT Balance'),
+                el('div', {class: 'task', onclick: () => go({screen: 'missions'})}, el('p', {}, 'Missions'))];
+    case 'missions':
+        return [el('h2', {}, 'Missions'),
+                el('div', {class: 'task', onclick: () => go({screen: 'explore'})}, el('h3', {}, 'Explore crypto'))];
+    case 'explore':
+        return explore();
+    }
+}
+
+function explore() {
+    const done = completed();
+    const shown = state.expanded ? CONFIG.tasks : CONFIG.tasks.slice(0, 3);
+    const items = [el('div', {}, el('p', {}, done.length + ' / ' + CONFIG.tasks.length + ' videos watched'))];
+    for (const task of shown) {
+        const status = done.includes(task.title) ? 'Completed' : '+' + CONFIG.reward + ' HOT';
+        items.push(el('div', {class: 'task', onclick: () => { state.task = task; state.modal = 'watch'; render(); }},
+                      [el('p', {}, task.title), el('p', {}, status)]));
+    }
+    const toggle = state.expanded ? 'Show less videos' : 'Show all videos';
+    items.push(el('div', {onclick: () => { state.expanded = !state.expanded; render(); }}, el('p', {}, toggle)));
+
+    return [el('h3', {}, 'Explore crypto'),
+            el('p', {}, 'Watch educational videos'),
+            el('div', {}, 'Find the password in the video'),
+            el('div', {}, items)];
+}
+
+function modal() {
+    const close = el('button', {'aria-label': 'Close', onclick: closeModal}, 'x');
+    let content;
+    switch (state.modal) {
+    case 'watch':
+        content = [el('h3', {}, state.task.title),
+                   el('button', {onclick: () => { window.open('/video', '_blank'); state.modal = 'submit'; render(); }}, 'Watch the video')];
+        break;
+    case 'submit':
+        content = [el('h3', {}, state.task.title),
+                   el('button', {onclick: () => { state.modal = 'password'; render(); }}, 'Submit password')];
+        break;
+    case 'password': {
+        const input = el('input', {type: 'text'});
+        const error = el('p', {}, '');
+        content = [el('h2', {}, 'Enter the password'), el('label', {}, input), error,
+                   el('button', {onclick: () => {
+                       if (input.value.trim().toLowerCase() !== state.task.codeword) { error.textContent = 'Wrong password'; return; }
+                       setTimeout(() => { complete(state.task.title); state.modal = 'reward'; render(); }, CONFIG.uiDelay);
+                   }}, 'Submit password')];
+        break;
+    }
+    case 'reward':
+        content = [el('h3', {}, 'You got'), el('div', {}, el('div', {}, CONFIG.reward + ' HOT'))];
+        break;
+    }
+    return el('div', {id: 'modal'}, el('div', {}, [close].concat(content)));
+}
+
+function closeModal() { state.modal = null; state.task = null; render(); }
+
+function render() {
+    const app = document.getElementById('app');
+    app.replaceChildren(...screen());
+    if (state.modal) app.append(modal());
+}
+
+document.addEventListener('keydown', e => { if (e.key === 'Escape' && state.modal) closeModal(); });
+setTimeout(render, CONFIG.uiDelay);
+</script>
+</body>
+</html>
+"""
+
+
+class MockWalletServer:
+    """Local stand-in for the HOT wallet mini app, used for offline benchmarks.
+
+    Serves the same structure HotBotBrowser expects: the Telegram page with the app's iframe at `url`,
+    the 'Import account' login flow, 'HOT Balance' -> 'Missions' -> 'Explore crypto' and the video tasks
+    with 'Watch the video', 'Submit password' and 'You got' reward.
+
+    Pages load images, a font, an analytics script and a video, `bytes_sent` counts the response bodies.
+
+    `latency` delays every http response, `ui_delay` delays every screen change inside the app (seconds).
+    """
+
+    def __init__(self, tasks: dict[str, str], latency: float = 0.0, ui_delay: float = 0.0, reward: float = 0.05) -> None:
+        self.tasks = tasks
+        self.latency = latency
+        self.ui_delay = ui_delay
+        self.reward = reward
+        self.requests = 0
+        self.bytes_sent = 0
+
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        """Url of the page embedding the app, to be used instead of HOT_URL."""
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/hot"
+
+    def start(self) -> "MockWalletServer":
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        logger.debug(f"Mock wallet server started at {self.url}")
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def app_page(self) -> str:
+        config = {
+            "tasks": [{"title": title, "codeword": codeword} for title, codeword in self.tasks.items()],
+            "uiDelay": int(self.ui_delay * 1000),
+            "reward": self.reward,
+        }
+        return _APP_PAGE.replace("__CONFIG__", json.dumps(config))
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+        html = "text/html; charset=utf-8"
+        files = {
+            "/hot": (html, _HOST_PAGE.encode()),
+            "/": (html, self.app_page().encode()),
+            "/video": (html, _VIDEO_PAGE.encode()),
+        }
+        for path, (content_type, size) in _STATIC_FILES.items():
+            filler = b" " if content_type.endswith("javascript") else b"\0"
+            files[path] = (content_type, filler * size)
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if server.latency:
+                    time.sleep(server.latency)
+
+                path = self.path.split("?")[0]
+                content_type, body = files.get(path, (html, b"Not found"))
+                with server._lock:
+                    server.requests += 1
+                    server.bytes_sent += len(body)
+
+                self.send_response(200 if path in files else 404)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        return Handler
@@ -0,0 +1,147 @@
+import os
+import threading
+from typing import Optional
+
+import psutil
+
+# Orphaned processes are reparented to them
+_INIT_PROCESSES = ("init", "systemd", "launchd")
+
+
+def get_process_tree(pid: int) -> list[psutil.Process]:
+    """Process with all its descendants (chromedriver, chrome and its helpers). Empty list if it has exited."""
+    try:
+        process = psutil.Process(pid)
+        return [process] + process.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return []
+
+
+def get_tree_rss(pid: int) -> int:
+    """Total resident memory of a process tree in bytes."""
+    total = 0
+    for p in get_process_tree(pid):
+        try:
+            total += p.memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+    return total
+
+
+class ProcessTreeSampler:
+    """Samples CPU time and memory of a process tree in a background thread.
+
+    CPU time of processes that existed before `start()` is counted from that moment.
+    Processes which exit between two samples lose at most `interval` seconds of CPU time.
+    """
+
+    def __init__(self, pid: int, interval: float = 0.5) -> None:
+        self.pid = pid
+        self.interval = interval
+
+        self.peak_rss = 0
+        self._baseline: dict[int, float] = {}
+        self._latest: dict[int, float] = {}
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def cpu_seconds(self) -> float:
+        return sum(t - self._baseline.get(pid, 0.0) for pid, t in self._latest.items())
+
+    @property
+    def peak_rss_mb(self) -> float:
+        return self.peak_rss / 1024 / 1024
+
+    def start(self) -> "ProcessTreeSampler":
+        self._baseline = self._cpu_times()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._sample()
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self._sample()
+
+    def _sample(self) -> None:
+        self._latest.update(self._cpu_times())
+        self.peak_rss = max(self.peak_rss, get_tree_rss(self.pid))
+
+    def _cpu_times(self) -> dict[int, float]:
+        result = {}
+        for p in get_process_tree(self.pid):
+            try:
+                times = p.cpu_times()
+                result[p.pid] = times.user + times.system
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+        return result
+
+
+def kill_process_tree(pid: int) -> int:
+    """Kill a process with all its descendants, children first. Returns the number of killed processes."""
+    processes = get_process_tree(pid)
+    killed = []
+    for p in reversed(processes):
+        try:
+            p.kill()
+            killed.append(p)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+
+    psutil.wait_procs(killed, timeout=5)
+    return len(killed)
+
+
+def find_orphaned_browsers(user_data_roots: list[str], finished_owners: tuple[int, ...] = ()) -> list[psutil.Process]:
+    """Top processes of Chrome trees which use a user data dir under one of the roots and whose owner has exited
+    (or is one of `finished_owners`, processes which do not use their browsers any more).
+
+    Chrome started by chromedriver is owned by the process which started chromedriver, so an orphaned
+    chromedriver is returned together with its Chrome (as the top process of the tree).
+    """
+    roots = [os.path.join(os.path.realpath(r), "") for r in user_data_roots]
+    orphans = {}
+    for p in psutil.process_iter(["cmdline"]):
+        user_data_dir = _user_data_dir(p.info["cmdline"] or [])
+        if not user_data_dir or not any(os.path.join(os.path.realpath(user_data_dir), "").startswith(r) for r in roots):
+            continue
+
+        top = _tree_top(p, finished_owners)
+        if top and top.pid not in orphans:
+            orphans[top.pid] = top
+    return list(orphans.values())
+
+
+def reap_orphaned_browsers(user_data_roots: list[str], finished_owners: tuple[int, ...] = ()) -> int:
+    """Kill orphaned Chrome trees (see find_orphaned_browsers). Returns the number of killed processes."""
+    return sum(kill_process_tree(p.pid) for p in find_orphaned_browsers(user_data_roots, finished_owners))
+
+
+def _user_data_dir(cmdline: list[str]) -> Optional[str]:
+    if any(arg.startswith("--type=") for arg in cmdline): # helper processes of a browser
+        return None
+    for arg in cmdline:
+        if arg.startswith("--user-data-dir="):
+            return arg.split("=", 1)[1]
+    return None
+
+
+def _tree_top(process: psutil.Process, finished_owners: tuple[int, ...]) -> Optional[psutil.Process]:
+    """The browser (or chromedriver which started it) if nothing owns it any more, else None."""
+    try:
+        top = process
+        parent = process.parent()
+        if parent and "chromedriver" in parent.name().lower():
+            top, parent = parent, parent.parent()
+        if parent is None or parent.pid == 1 or parent.pid in finished_owners or parent.name() in _INIT_PROCESSES:
+            return top
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        pass
+    return None
@@ -0,0 +1,205 @@
+import fnmatch
+import json
+import os
+import shutil
+from datetime import datetime
+from typing import Optional
+
+from src.config import settings
+
+"""Overlay profiles: a shared base Chrome profile plus a small per-session delta.
+
+A session directory in the overlay layout holds only what differs between accounts (wallet storage, cookies,
+extension settings, proxy.txt) and the OVERLAY_MARKER file. Before Chrome starts, the base profile and the delta
+are copied into a runtime directory. After Chrome exits, the delta is copied back and the runtime directory is removed.
+"""
+
+BASE_PROFILE_PATH = "./profiles/base"
+RUNTIME_PATH = "./profiles/runtime"
+OVERLAY_MARKER = "overlay.json"
+LOGIN_PENDING_MARKER = "login_pending" # the session was created by 'tasks --with-login' and has not logged in yet
+STORAGE_STATE_FILE = "storage_state.json" # wallet storage snapshot, see services.storage_state
+
+# Paths (relative to the user data dir) which belong to the account
+DELTA_PATHS = [
+    "Local State", # holds the key cookies are encrypted with
+    "Default/Preferences",
+    "Default/Secure Preferences",
+    "Default/Local Storage",
+    "Default/Session Storage",
+    "Default/IndexedDB",
+    "Default/Cookies",
+    "Default/Cookies-journal",
+    "Default/Network/Cookies",
+    "Default/Network/Cookies-journal",
+    "Default/Local Extension Settings",
+]
+
+# Not copied into the base profile: caches, locks and files of a running browser
+_EXCLUDED_FROM_BASE = [
+    "Singleton*", "DevToolsActivePort", "proxy.txt", OVERLAY_MARKER, LOGIN_PENDING_MARKER, STORAGE_STATE_FILE,
+    "BrowserMetrics*", "Crashpad",
+    "GrShaderCache", "ShaderCache", "GraphiteDawnCache", "component_crx_cache",
+    "Default/Cache", "Default/Code Cache", "Default/GPUCache", "Default/DawnCache", "Default/DawnGraphiteCache",
+    "Default/Service Worker", "Default/blob_storage",
+]
+
+
+class ProfileOverlay:
+    """Runtime user data dir of an overlay session.
+
+    A `fresh` profile contains only the base profile: account data is restored from a storage state snapshot
+    and nothing is copied back.
+    """
+
+    def __init__(self, session_path: str, fresh: bool = False) -> None:
+        self.session_path = session_path
+        self.runtime_path = os.path.abspath(os.path.join(RUNTIME_PATH, os.path.basename(session_path)))
+        self.fresh = fresh
+        self.materialized = False
+
+    def materialize(self) -> str:
+        """Copy the base profile and the session delta into the runtime directory. Returns its path."""
+        shutil.rmtree(self.runtime_path, ignore_errors=True)
+        if os.path.isdir(BASE_PROFILE_PATH):
+            shutil.copytree(BASE_PROFILE_PATH, self.runtime_path, symlinks=True)
+        else:
+            os.makedirs(self.runtime_path)
+
+        if not self.fresh:
+            _copy_paths(self.session_path, self.runtime_path, DELTA_PATHS)
+        self.materialized = True
+        return self.runtime_path
+
+    def persist(self) -> None:
+        """Copy the delta back to the session directory. Every path is replaced only after it was copied completely."""
+        if not self.materialized or self.fresh:
+            return
+
+        for relative_path in DELTA_PATHS:
+            source = os.path.join(self.runtime_path, relative_path)
+            if not os.path.exists(source):
+                continue
+
+            target = os.path.join(self.session_path, relative_path)
+            temp = f"{target}.saving"
+            _remove(temp)
+            _copy(source, temp)
+            _remove(target)
+            os.replace(temp, target)
+
+    def cleanup(self) -> None:
+        shutil.rmtree(self.runtime_path, ignore_errors=True)
+
+
+def is_overlay(session_path: str) -> bool:
+    return os.path.exists(os.path.join(session_path, OVERLAY_MARKER))
+
+
+def is_login_pending(session_path: str) -> bool:
+    return os.path.exists(os.path.join(session_path, LOGIN_PENDING_MARKER))
+
+
+def mark_login_pending(session_path: str) -> None:
+    """Mark a session directory which exists but has not logged in yet, so that only 'tasks --with-login' runs it."""
+    if os.path.isdir(session_path) and not is_login_pending(session_path):
+        with open(os.path.join(session_path, LOGIN_PENDING_MARKER), "w") as file:
+            file.write(datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
+
+def clear_login_pending(session_path: str) -> None:
+    _remove(os.path.join(session_path, LOGIN_PENDING_MARKER))
+
+
+def open_profile(session_path: str, fresh: bool = False) -> Optional[ProfileOverlay]:
+    """ProfileOverlay of an overlay session, None for a session with a full profile.
+    With `fresh` the session always starts from the base profile.
+
+    With PROFILE_LAYOUT = 'overlay' new sessions are created in the overlay layout.
+    """
+    if fresh:
+        return ProfileOverlay(session_path, fresh=True)
+
+    is_new = not os.path.isdir(session_path) or not os.listdir(session_path)
+    if is_new and settings.PROFILE_LAYOUT == "overlay":
+        os.makedirs(session_path, exist_ok=True)
+        _write_marker(session_path)
+
+    return ProfileOverlay(session_path) if is_overlay(session_path) else None
+
+
+def build_base_profile(profile_path: str) -> None:
+    """Create the base profile from a full profile, without account data and caches."""
+    def ignore(directory: str, names: list[str]) -> list[str]:
+        relative_dir = os.path.relpath(directory, profile_path)
+        ignored = []
+        for name in names:
+            relative_path = os.path.normpath(os.path.join(relative_dir, name)).replace(os.sep, "/")
+            if any(fnmatch.fnmatch(relative_path, p) for p in DELTA_PATHS + _EXCLUDED_FROM_BASE):
+                ignored.append(name)
+        return ignored
+
+    temp = f"{BASE_PROFILE_PATH}.building"
+    shutil.rmtree(temp, ignore_errors=True)
+    shutil.copytree(profile_path, temp, symlinks=True, ignore=ignore)
+    os.replace(temp, BASE_PROFILE_PATH)
+
+
+def migrate_session(session_path: str) -> tuple[int, int]:
+    """Convert a full profile session to the overlay layout. Returns its size in bytes before and after."""
+    size_before = dir_size(session_path)
+    if not os.path.isdir(BASE_PROFILE_PATH):
+        build_base_profile(session_path)
+
+    overlay_path = f"{session_path}.overlay"
+    shutil.rmtree(overlay_path, ignore_errors=True)
+    os.makedirs(overlay_path)
+    _copy_paths(session_path, overlay_path, DELTA_PATHS + ["proxy.txt", LOGIN_PENDING_MARKER, STORAGE_STATE_FILE])
+    _write_marker(overlay_path)
+
+    full_path = f"{session_path}.full"
+    os.replace(session_path, full_path)
+    os.replace(overlay_path, session_path)
+    shutil.rmtree(full_path, ignore_errors=True)
+
+    return size_before, dir_size(session_path)
+
+
+def dir_size(path: str) -> int:
+    total = 0
+    for directory, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(directory, name))
+            except OSError:
+                pass
+    return total
+
+
+def _write_marker(session_path: str) -> None:
+    with open(os.path.join(session_path, OVERLAY_MARKER), "w") as file:
+        json.dump({"layout": "overlay", "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}, file)
+
+
+def _copy_paths(source_root: str, target_root: str, relative_paths: list[str]) -> None:
+    for relative_path in relative_paths:
+        source = os.path.join(source_root, relative_path)
+        if os.path.exists(source):
+            target = os.path.join(target_root, relative_path)
+            _remove(target)
+            _copy(source, target)
+
+
+def _copy(source: str, target: str) -> None:
+    os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+    if os.path.isdir(source):
+        shutil.copytree(source, target, symlinks=True)
+    else:
+        shutil.copy2(source, target)
+
+
+def _remove(path: str) -> None:
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,245 @@
+import asyncio
+import base64
+import os
+import struct
+import threading
+import time
+from typing import Optional
+
+from src.utils import proxy_utils
+from src.utils.logger import get_logger
+
+logger = get_logger()
+
+_BUFFER_SIZE = 64 * 1024
+_MAX_HEADER_SIZE = 64 * 1024
+_CONNECT_TIMEOUT = 30
+_IDLE_TIMEOUT = 300
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_pid: Optional[int] = None
+_loop_lock = threading.Lock()
+
+
+class ProxyForwarder:
+    """Local unauthenticated http proxy that forwards traffic to an authenticated upstream proxy.
+
+    Chrome cannot pass credentials to socks5 proxies and asks the user for http proxy credentials,
+    so it is pointed to this forwarder instead. Traffic is only tunneled, never decrypted.
+
+    All forwarders of a process share one event loop thread (see `_forwarder_loop`), so the number of
+    connections is not limited by threads or by select().
+
+    Supported upstream protocols: socks5, socks5h, http.
+    """
+
+    def __init__(self, upstream_url: str) -> None:
+        self.protocol, self.username, self.password, self.host, self.port = proxy_utils.parse_proxy(upstream_url)
+        if self.protocol not in ("socks5", "socks5h", "http"):
+            raise ValueError(f"Unsupported proxy protocol: {self.protocol}")
+
+        self._loop = _forwarder_loop()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._address: Optional[tuple[str, int]] = None
+        self._connections: set[asyncio.Task] = set()
+
+    @property
+    def url(self) -> str:
+        """Url to be passed to Chrome with --proxy-server."""
+        host, port = self._address
+        return f"http://{host}:{port}"
+
+    def start(self) -> "ProxyForwarder":
+        self._server = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self._handle_client, "127.0.0.1", 0, backlog=128, limit=_MAX_HEADER_SIZE),
+            self._loop).result()
+        self._address = self._server.sockets[0].getsockname()[:2]
+
+        logger.debug(f"Proxy forwarder {self.url} -> {self.protocol}://{self.host}:{self.port} started")
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._loop.call_soon_threadsafe(self._close)
+
+    def _close(self) -> None:
+        self._server.close()
+        for connection in self._connections:
+            connection.cancel()
+
+    async def _handle_client(self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter) -> None:
+        connection = asyncio.current_task()
+        self._connections.add(connection)
+        upstream_writer = None
+        try:
+            head = await _read_head(client_reader)
+            request_line, *headers = head.split(b"\r\n")
+            method, target, version = request_line.split(b" ", 2)
+
+            if method == b"CONNECT":
+                host, port = _split_host_port(target.decode(), 443)
+                upstream_reader, upstream_writer = await self._open_tunnel(host, port)
+                client_writer.write(b"HTTP/1.1 200 Connection established\r\n\r\n")
+            else:
+                upstream_reader, upstream_writer = await self._forward_plain_request(method, target, version, headers)
+
+            await _pipe(client_reader, client_writer, upstream_reader, upstream_writer)
+        except asyncio.CancelledError:
+            pass # the forwarder was stopped
+        except Exception as e:
+            logger.debug(f"Proxy forwarder connection failed. {type(e).__name__} {e}")
+            try:
+                client_writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\n\r\n")
+                await client_writer.drain()
+            except OSError:
+                pass
+        finally:
+            self._connections.discard(connection)
+            client_writer.close()
+            if upstream_writer:
+                upstream_writer.close()
+
+    async def _open_tunnel(self, host: str, port: int) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        return await asyncio.wait_for(self._connect(host, port), _CONNECT_TIMEOUT)
+
+    async def _connect(self, host: str, port: int) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.open_connection(self.host, self.port, limit=_MAX_HEADER_SIZE)
+        try:
+            if self.protocol == "http":
+                writer.write(
+                    f"CONNECT {host}:{port} HTTP/1.1\r\nHost: {host}:{port}\r\n".encode()
+                    + self._proxy_authorization_header() + b"\r\n")
+                response = await _read_head(reader)
+                status_line = response.split(b"\r\n")[0]
+                if status_line.split(b" ")[1:2] != [b"200"]:
+                    raise ConnectionError(f"Upstream proxy refused CONNECT: {status_line!r}")
+            else:
+                await self._socks5_connect(reader, writer, host, port)
+        except BaseException:
+            writer.close()
+            raise
+
+        return reader, writer
+
+    async def _forward_plain_request(self, method: bytes, target: bytes, version: bytes,
+                                     headers: list[bytes]) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        if self.protocol == "http":
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port, limit=_MAX_HEADER_SIZE), _CONNECT_TIMEOUT)
+            request_line = b" ".join((method, target, version))
+            extra = self._proxy_authorization_header()
+        else:
+            # socks tunnel goes directly to the origin server, which expects origin-form targets
+            url = target.decode()
+            host_port, _, path = url.split("://", 1)[-1].partition("/")
+            host, port = _split_host_port(host_port, 80)
+            reader, writer = await self._open_tunnel(host, port)
+            request_line = b" ".join((method, b"/" + path.encode(), version))
+            extra = b""
+
+        # One request per connection: a kept-alive connection could be reused by Chrome for another host
+        headers = [h for h in headers if not h.lower().startswith((b"proxy-", b"connection:"))]
+        headers.append(b"Connection: close")
+        writer.write(request_line + b"\r\n" + b"".join(h + b"\r\n" for h in headers) + extra + b"\r\n")
+        return reader, writer
+
+    def _proxy_authorization_header(self) -> bytes:
+        token = base64.b64encode(f"{self.username}:{self.password}".encode()).decode()
+        return f"Proxy-Authorization: Basic {token}\r\n".encode()
+
+    async def _socks5_connect(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, host: str, port: int) -> None:
+        writer.write(b"\x05\x01\x02") # version 5, one method: username/password
+        version, method = await _read_exact(reader, 2)
+        if version != 5 or method != 2:
+            raise ConnectionError("Socks5 proxy does not accept username/password authentication")
+
+        username, password = self.username.encode(), self.password.encode()
+        writer.write(b"\x01" + bytes([len(username)]) + username + bytes([len(password)]) + password)
+        _, status = await _read_exact(reader, 2)
+        if status != 0:
+            raise ConnectionError("Socks5 proxy authentication failed")
+
+        address = host.encode()
+        writer.write(b"\x05\x01\x00\x03" + bytes([len(address)]) + address + struct.pack(">H", port))
+        version, reply, _, address_type = await _read_exact(reader, 4)
+        if reply != 0:
+            raise ConnectionError(f"Socks5 proxy CONNECT failed with code {reply}")
+
+        # skip bound address and port
+        if address_type == 1:
+            await _read_exact(reader, 4 + 2)
+        elif address_type == 4:
+            await _read_exact(reader, 16 + 2)
+        else:
+            length = (await _read_exact(reader, 1))[0]
+            await _read_exact(reader, length + 2)
+
+
+def _forwarder_loop() -> asyncio.AbstractEventLoop:
+    """Event loop of all forwarders of this process, running in a daemon thread. Started by the first forwarder."""
+    global _loop, _loop_pid
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid(): # a forked worker does not have the parent's thread
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            threading.Thread(target=_loop.run_forever, name="proxy-forwarder", daemon=True).start()
+        return _loop
+
+
+async def _read_head(reader: asyncio.StreamReader) -> bytes:
+    """Read http message head (without the empty line). Bytes after it stay in the reader."""
+    try:
+        data = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        raise ConnectionError("Connection closed before headers were received")
+    except asyncio.LimitOverrunError:
+        raise ConnectionError("Headers are too large")
+    return data[:-4]
+
+
+async def _read_exact(reader: asyncio.StreamReader, size: int) -> bytes:
+    try:
+        return await reader.readexactly(size)
+    except asyncio.IncompleteReadError:
+        raise ConnectionError("Connection closed by proxy")
+
+
+def _split_host_port(value: str, default_port: int) -> tuple[str, int]:
+    host, _, port = value.rpartition(":")
+    if not host or not port.isdigit():
+        return value, default_port
+    return host.strip("[]"), int(port)
+
+
+async def _pipe(client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter,
+                upstream_reader: asyncio.StreamReader, upstream_writer: asyncio.StreamWriter) -> None:
+    """Copy data both ways until either side closes the connection or nothing is sent for _IDLE_TIMEOUT seconds."""
+    last_activity = [time.monotonic()]
+    copies = {
+        asyncio.ensure_future(_copy(client_reader, upstream_writer, last_activity)),
+        asyncio.ensure_future(_copy(upstream_reader, client_writer, last_activity)),
+    }
+    try:
+        while True:
+            idle = time.monotonic() - last_activity[0]
+            if idle >= _IDLE_TIMEOUT:
+                return
+            done, _ = await asyncio.wait(copies, timeout=_IDLE_TIMEOUT - idle, return_when=asyncio.FIRST_COMPLETED)
+            if done:
+                return
+    finally:
+        for copy in copies:
+            copy.cancel()
+
+
+async def _copy(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, last_activity: list[float]) -> None:
+    try:
+        while True:
+            data = await reader.read(_BUFFER_SIZE)
+            if not data:
+                return
+            writer.write(data)
+            await writer.drain()
+            last_activity[0] = time.monotonic()
+    except OSError:
+        return
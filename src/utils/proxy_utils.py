@@ -93,3 +93,23 @@ def add_socks5_protocol_if_missing(url: str) -> str:
         return url
     
     return f"socks5://{url}"
+
+def parse_proxy(url: str) -> tuple[str, str, str, str, int]:
+    """Split proxy url into its parts
+
+    Url without protocol is treated as socks5.
+
+    Returns
+    -------
+    tuple
+        (protocol, username, password, host, port)
+    """
+    ensure_valid_proxy(url)
+    url = add_socks5_protocol_if_missing(url)
+
+    protocol, rest = url.split("://")
+    credentials, host_port = rest.split('@')
+    username, password = credentials.split(':')
+    host, port = host_port.split(':')
+
+    return protocol.lower(), username, password, host, int(port)
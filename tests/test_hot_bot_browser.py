@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from src.bots.hot_bot_browser import HotBotBrowser, _AwaitableBrowser, _run
+from src.bots.hot_bot_flows import HotBotFlows
+from src.utils import get_logger
+
+
+class FakeBrowser:
+    """SeleniumBrowser with an app of one finished and one unfinished video task. Every method returns at once."""
+
+    def __init__(self) -> None:
+        self.session = "fake"
+        self.logger = get_logger()
+        self.idle_seconds = 0.0
+        self.commands_count = 0
+        self.from_storage_state = False
+        self.solved = False
+        self.calls: list[str] = []
+
+    def _call(self, name: str, result=True):
+        self.calls.append(name)
+        self.commands_count += 1
+        return result
+
+    def select_iframe(self, xpath): return self._call("select_iframe")
+    def select_iframe_and_wait(self, xpath, inside_xpath, wait_time=30): return self._call("select_iframe_and_wait")
+    def wait_for_page(self, wait_time): return self._call("wait_for_page")
+    def refresh(self): return self._call("refresh")
+    def press_escape(self): return self._call("press_escape")
+    def block_new_tabs(self): return self._call("block_new_tabs")
+    def close_tab(self): return self._call("close_tab")
+    def tabs_count(self): return self._call("tabs_count", 1)
+    def save_storage_state(self): return self._call("save_storage_state")
+    def type_text(self, xpath, text, wait_time, msg): return self._call("type_text")
+    def get_text(self, xpath, wait_time, msg): return self._call("get_text", "100 HOT")
+    def get_element(self, xpath, wait_time, msg, log_level=None): return self._call("get_element")
+
+    def move_and_click(self, xpath, wait_time, msg, log_level=None):
+        if xpath == HotBotFlows.SUBMIT_PASSWORD_XPATH:
+            self.solved = True
+        return self._call("move_and_click")
+
+    def find_visible(self, xpath, wait_time=10):
+        if xpath == HotBotFlows.TASK_MODAL_XPATH:
+            return self._call("find_visible", False)
+        return self._call("find_visible", xpath == HotBotFlows.TASKS_CONTAINER_XPATH)
+
+    def snapshot_list(self, container_xpath):
+        tasks = [
+            {"title": "Watch educational videos", "text": "", "completed": False, "handle": "header"},
+            {"title": "What is Blockchain", "text": "Completed", "completed": True, "handle": "task-1"},
+            {"title": "What is Meme coins", "text": "", "completed": self.solved, "handle": "task-2"},
+        ]
+        return self._call("snapshot_list", tasks)
+
+
+def test_run_tasks_completes_without_suspending():
+    browser = FakeBrowser()
+    bot = HotBotBrowser(browser)
+
+    bot.run_tasks()
+
+    assert bot.finished_tasks == ["What is Blockchain", "What is Meme coins"]
+    assert bot.status()["fake"]["Explore crypto"]["status"] == "OK"
+    assert "type_text" in browser.calls
+
+
+def test_login_completes_without_suspending():
+    browser = FakeBrowser()
+    bot = HotBotBrowser(browser)
+
+    assert bot.login("seed phrase")
+    assert bot.is_logged_in
+    assert browser.calls[-1] == "save_storage_state"
+
+
+def test_suspended_step_fails():
+    async def step():
+        await asyncio.sleep(0)
+
+    with pytest.raises(RuntimeError):
+        _run(step())
+
+
+def test_browser_exposes_only_listed_methods():
+    browser = _AwaitableBrowser(FakeBrowser())
+
+    assert browser.session == "fake"
+    with pytest.raises(AttributeError):
+        browser.quit